@@ -12,23 +12,51 @@ from typing import List, Dict
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHANNEL_ID = os.getenv('TELEGRAM_CHANNEL_ID', '@BrislyDealsGaming')
 TELEGRAM_CHANNEL_LINK = 'https://t.me/BrislyDealsGaming'
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', '8'))
+# Più canali con lo stesso scraping: JSON con filtri/orari/limiti/prefisso per canale
+CHANNELS_FILE = os.getenv('CHANNELS_FILE')
+TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org/bot')
 
 # ==========================================
 # POSTING SCHEDULE
 # ==========================================
-# Orari di posting (formato 24h)
+# Orari di posting (formato 24h HH:MM, separati da virgola in POSTING_TIMES)
 POSTING_TIMES = [
-    time(8, 0),   # 08:00
-    time(13, 0),  # 13:00
-    time(18, 0),  # 18:00
-    time(21, 0),  # 21:00
+    time.fromisoformat(value.strip())
+    for value in os.getenv('POSTING_TIMES', '08:00,13:00,18:00,21:00').split(',')
+    if value.strip()
 ]
 
 # Limiti posting
 MAX_POSTS_PER_DAY = 10
+DIGEST_SIZE = int(os.getenv('DIGEST_SIZE', '0'))  # Offerte per digest (0 = un post per offerta)
+
+# Rate limit Telegram usati dalla coda di invio
+TELEGRAM_GLOBAL_PER_SECOND = float(os.getenv('TELEGRAM_GLOBAL_PER_SECOND', '30'))
+TELEGRAM_CHANNEL_PER_MINUTE = float(os.getenv('TELEGRAM_CHANNEL_PER_MINUTE', '20'))
+TELEGRAM_PRIVATE_PER_SECOND = float(os.getenv('TELEGRAM_PRIVATE_PER_SECOND', '1'))
+WISHLIST_FANOUT_CHUNK = int(os.getenv('WISHLIST_FANOUT_CHUNK', '500'))  # Destinatari per blocco
+INLINE_CACHE_SECONDS = int(os.getenv('INLINE_CACHE_SECONDS', '300'))  # Cache risposte inline
+
+# Ricezione update del bot: "polling" o "webhook"
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8443')))
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '8'))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+
+# Click tracking dei pulsanti (bot/click_tracker.py)
+CLICK_TRACKER_URL = os.getenv('CLICK_TRACKER_URL')  # Vuoto = link diretti
+CLICK_TRACKER_PORT = int(os.getenv('CLICK_TRACKER_PORT', '8090'))
+CLICK_FLUSH_SECONDS = float(os.getenv('CLICK_FLUSH_SECONDS', '5'))
+
+# Eventi delle offerte su Redis Streams (database/event_bus.py)
+EVENT_BUS = os.getenv('EVENT_BUS', 'false').lower() == 'true'
+EVENT_STREAM_MAXLEN = int(os.getenv('EVENT_STREAM_MAXLEN', '10000'))
 MIN_HOURS_BETWEEN_SIMILAR = 2
-SATURDAY_PAUSE = True  # Pausa il sabato
-SUNDAY_RECAP = True    # Recap domenicale
+SATURDAY_PAUSE = os.getenv('SATURDAY_PAUSE', 'true').lower() == 'true'  # Pausa il sabato
+SUNDAY_RECAP = os.getenv('SUNDAY_RECAP', 'true').lower() == 'true'      # Recap domenicale
+RECAP_COLLAGE = os.getenv('RECAP_COLLAGE', 'false').lower() == 'true'  # Collage nel recap
 
 # ==========================================
 # SCRAPING SETTINGS
@@ -104,6 +132,14 @@ PRIORITY_RULES = {
 # ==========================================
 # MESSAGE TEMPLATES
 # ==========================================
+# 'default' (formato di TelegramPoster) o 'settings' (POST_TEMPLATE compilato)
+MESSAGE_TEMPLATE = os.getenv('MESSAGE_TEMPLATE', 'default')
+
+# Banner grafici (Pillow): render in un pool di processi, cache su disco e Redis
+POST_BANNERS = os.getenv('POST_BANNERS', 'False').lower() == 'true'
+BANNER_CACHE_DIR = os.getenv('BANNER_CACHE_DIR', 'data/banners')
+BANNER_WORKERS = int(os.getenv('BANNER_WORKERS', '0'))  # 0 = CPU disponibili (max 4)
+
 POST_TEMPLATE = """
 🔥 {discount_percent}% DI SCONTO 🔥
 {game_title} - {platform}
@@ -124,8 +160,23 @@ POST_TEMPLATE = """
 # ==========================================
 # DATABASE SETTINGS
 # ==========================================
+# Backend: 'upstash' (Redis remoto) o 'local' (store embedded con snapshot)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'upstash')
+LOCAL_STORE_PATH = os.getenv('LOCAL_STORE_PATH', 'data/brisly_store.pkl')
+LOCAL_SNAPSHOT_SECONDS = int(os.getenv('LOCAL_SNAPSHOT_SECONDS', '60'))
+
+# Formato payload: 'json' (legacy) o 'compact' (struct + epoch, zlib opzionale)
+STORAGE_ENCODING = os.getenv('STORAGE_ENCODING', 'json')
+STORAGE_COMPRESSION = os.getenv('STORAGE_COMPRESSION', 'False').lower() == 'true'
+
+# Layout offerte postate: 'keys' (chiave + TTL per offerta) o 'buckets' (hash per shard)
+# ('buckets' richiede STORAGE_ENCODING=compact per restare sotto hash-max-listpack-value)
+POSTED_LAYOUT = os.getenv('POSTED_LAYOUT', 'keys')
+POSTED_BUCKETS = int(os.getenv('POSTED_BUCKETS', '16384'))
+
 REDIS_URL = os.getenv('UPSTASH_REDIS_URL')
 REDIS_TOKEN = os.getenv('UPSTASH_REDIS_TOKEN')
+REDIS_PREFIX = os.getenv('REDIS_PREFIX', 'brisly:gaming:')
 CACHE_EXPIRY_HOURS = 24
 
 # ==========================================
@@ -0,0 +1,90 @@
+"""
+Benchmark Inline
+Latenza delle risposte inline sotto raffica di query
+
+Uso:
+    python src/benchmark_inline.py [numero_offerte] [numero_query]   # default 2000 20000
+
+Simula una raffica di query inline (vuote, tier, piattaforme, generi,
+titoli con e senza errori, pagine successive) e misura p50/p99/max del
+calcolo della risposta, escluso l'invio HTTP.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import random
+import logging
+
+# Il Bot non si connette finché non viene inizializzato: basta un token fittizio
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:benchmark')
+
+from bot.telegram_poster import TelegramPoster
+from bot.inline_pages import InlinePages
+from utils.search_index import DealSearchIndex
+from benchmark_render import _deals
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    logging.disable(logging.INFO)
+
+    deals = _deals(count)
+    for i, deal in enumerate(deals):
+        deal['brislyscore'] = deal['brislyscore_data']['score']
+        deal['product_id'] = f"deal-{i}"
+
+    poster = TelegramPoster()
+    index = DealSearchIndex()
+    pages = InlinePages(index, poster)
+
+    start = time.perf_counter()
+    index.update(deals)
+    pages.rebuild()
+    print(f"\n📑 Costruzione ({count:,} offerte): {time.perf_counter() - start:.2f}s")
+
+    # Query realistiche: molte ripetute (popolari), alcune uniche
+    rng = random.Random(42)
+    titles = [deal['title'].split('#')[0].strip() for deal in deals[:50]]
+    fixed = ['', 'super', 'ottima', 'steam', 'gog', 'rpg', 'action']
+    mix = []
+    for _ in range(queries):
+        roll = rng.random()
+        if roll < 0.4:
+            mix.append((rng.choice(fixed), rng.choice(['', '', '20'])))
+        elif roll < 0.8:
+            title = rng.choice(titles)
+            mix.append((title[:rng.randint(3, len(title))], ''))
+        else:
+            title = list(rng.choice(titles).lower())
+            i = rng.randrange(len(title) - 1)
+            title[i], title[i + 1] = title[i + 1], title[i]
+            mix.append((''.join(title), ''))
+
+    latencies = []
+    for query, offset in mix:
+        begin = time.perf_counter()
+        pages.page(query, offset)
+        latencies.append(time.perf_counter() - begin)
+
+    latencies.sort()
+    ms = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"⚡ {queries:,} query: p50 {ms(0.5):.3f}ms | p99 {ms(0.99):.3f}ms | "
+          f"max {latencies[-1] * 1000:.2f}ms")
+    print(f"   Cache: {pages.hits:,} hit, {pages.misses:,} miss "
+          f"({pages.hits / max(1, pages.hits + pages.misses):.0%})")
+
+    # Nuovo scraping con prezzi cambiati per il 10% delle offerte
+    for deal in deals[::10]:
+        deal['discounted_price'] = round(deal['discounted_price'] * 0.9, 2)
+    start = time.perf_counter()
+    index.update(deals)
+    pages.rebuild()
+    print(f"🔄 Ricostruzione incrementale: {time.perf_counter() - start:.2f}s\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark Render
+Misura i render/secondo dei messaggi Telegram su un set di offerte sintetiche
+
+Uso:
+    python src/benchmark_render.py [numero_offerte]   # default 100000
+
+Confronta:
+- format_deal_message + create_keyboard a ogni invio (nessuna cache)
+- MessageRenderer al primo render (miss) e ai render successivi (hit)
+- POST_TEMPLATE con str.format contro il template pre-compilato
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import logging
+from typing import Callable, Dict, List
+
+# Il Bot non si connette finché non viene inizializzato: basta un token fittizio
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:benchmark')
+
+from scrapers.mock_data import MockDataProvider
+from utils.brislyscore import BrislyScore
+from bot.telegram_poster import TelegramPoster
+from bot.message_renderer import (
+    CompiledTemplate, MessageRenderer, load_settings_template, template_values
+)
+
+
+def _deals(count: int) -> List[Dict]:
+    """Offerte tutte diverse (titolo e prezzo variano) con BrislyScore"""
+    scorer = BrislyScore()
+    base = MockDataProvider().mock_deals
+    scores = [scorer.calculate(deal) for deal in base]
+
+    deals = []
+    for i in range(count):
+        template = base[i % len(base)]
+        deal = dict(
+            template,
+            title=f"{template['title']} #{i}",
+            url=template.get('url') or f"https://example.com/deal/{i}",
+            discounted_price=round(template['discounted_price'] + (i % 100) / 100, 2),
+        )
+        deal['brislyscore_data'] = scores[i % len(base)]
+        deals.append(deal)
+    return deals
+
+
+def _rate(label: str, deals: List[Dict], render: Callable[[Dict], object]) -> float:
+    start = time.perf_counter()
+    for deal in deals:
+        render(deal)
+    elapsed = time.perf_counter() - start
+    rate = len(deals) / elapsed
+    print(f"  {label:34} {rate:12,.0f} render/s  ({elapsed:.2f}s)")
+    return rate
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    logging.disable(logging.INFO)
+
+    poster = TelegramPoster()
+    deals = _deals(count)
+
+    print("\n" + "="*60)
+    print(f"🖨️ RENDER MESSAGGI ({count:,} offerte)")
+    print("="*60)
+
+    print("\nFormato standard:")
+    _rate("senza cache", deals, lambda d: (
+        poster.format_deal_message(d, d['brislyscore_data']), poster.create_keyboard(d)
+    ))
+    renderer = MessageRenderer(poster, max_size=count)
+    _rate("cache - primo render (miss)", deals, lambda d: renderer.render(d, d['brislyscore_data']))
+    _rate("cache - render ripetuto (hit)", deals, lambda d: renderer.render(d, d['brislyscore_data']))
+
+    template = load_settings_template()
+    compiled = CompiledTemplate(template)
+    tags = {id(d): poster._generate_tags(d) for d in deals}
+
+    print("\nPOST_TEMPLATE (solo testo):")
+    _rate("str.format (righe vuote incluse)", deals, lambda d: template.format(
+        **template_values(d, d['brislyscore_data'], tags[id(d)])
+    ))
+    _rate("template compilato", deals, lambda d: compiled.render(
+        template_values(d, d['brislyscore_data'], tags[id(d)])
+    ))
+
+    print("\n" + "="*60)
+
+
+if __name__ == "__main__":
+    main()
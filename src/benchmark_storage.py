@@ -0,0 +1,181 @@
+"""
+Benchmark Storage
+Misura lo spazio occupato dai record salvati su Redis
+
+Uso:
+    python src/benchmark_storage.py encoding   # bytes per record JSON vs compatto
+    python src/benchmark_storage.py layout     # memoria Redis: chiavi vs bucket
+
+Il benchmark "layout" scrive su un Redis reale (BENCH_REDIS_URL, default
+redis://localhost:6379/15) sotto il prefisso "bench:layout:" e lo ripulisce.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import redis
+
+from scrapers.mock_data import MockDataProvider
+from database.codec import encode_posted, decode_posted, encode_price, decode_price
+
+
+def _posted_records() -> List[Dict]:
+    """Record 'posted' come li scrive RedisClient.mark_deal_posted"""
+    records = []
+    for i, deal in enumerate(MockDataProvider().mock_deals):
+        records.append({
+            'title': deal.get('title'),
+            'platform': deal.get('platform'),
+            'source': deal.get('source'),
+            'price': deal.get('discounted_price'),
+            'discount': deal.get('discount_percent'),
+            'posted_at': datetime.now().replace(microsecond=0).isoformat(),
+            'message_id': 1000 + i,
+            'brislyscore': 27.4,
+        })
+    return records
+
+
+def _price_records() -> List[Dict]:
+    """Record della cache prezzi"""
+    return [
+        {
+            'original_price': deal.get('original_price'),
+            'discounted_price': deal.get('discounted_price'),
+            'discount_percent': deal.get('discount_percent'),
+            'cached_at': datetime.now().replace(microsecond=0).isoformat(),
+        }
+        for deal in MockDataProvider().mock_deals
+    ]
+
+
+def _avg_size(records: List[Dict], encoder, **kwargs) -> float:
+    sizes = []
+    for record in records:
+        value = encoder(record, **kwargs)
+        sizes.append(len(value.encode('utf-8') if isinstance(value, str) else value))
+    return sum(sizes) / len(sizes)
+
+
+def benchmark_encoding():
+    """Confronta i bytes per record dei formati disponibili"""
+    print("\n" + "="*60)
+    print("📦 BYTES PER RECORD")
+    print("="*60)
+
+    for name, records, encoder, decoder in (
+        ('posted', _posted_records(), encode_posted, decode_posted),
+        ('price', _price_records(), encode_price, decode_price),
+    ):
+        # Verifica round-trip prima di misurare
+        for record in records:
+            assert decoder(encoder(record)) == decoder(json.dumps(record))
+
+        legacy = _avg_size(records, encoder, compact=False)
+        compact = _avg_size(records, encoder, compact=True)
+        compressed = _avg_size(records, encoder, compact=True, compress=True)
+
+        print(f"\n{name}:")
+        print(f"  JSON legacy:      {legacy:6.1f} B")
+        print(f"  Compatto:         {compact:6.1f} B  ({compact / legacy:.0%})")
+        print(f"  Compatto + zlib:  {compressed:6.1f} B  ({compressed / legacy:.0%})")
+
+    print("\n" + "="*60)
+
+
+BENCH_PREFIX = "bench:layout:"
+
+
+def _clear(client: redis.Redis):
+    """Cancella le chiavi del benchmark"""
+    pipe = client.pipeline(transaction=False)
+    for key in client.scan_iter(match=f"{BENCH_PREFIX}*", count=1000):
+        pipe.unlink(key)
+        if len(pipe) >= 1000:
+            pipe.execute()
+    pipe.execute()
+
+
+def _used_memory(client: redis.Redis) -> int:
+    return int(client.info('memory')['used_memory'])
+
+
+def _fill(client: redis.Redis, layout: str, count: int, buckets: int, compact: bool):
+    """Scrive count offerte postate con lo stesso schema di RedisClient"""
+    template = _posted_records()
+    pipe = client.pipeline(transaction=False)
+    touched = set()
+
+    for i in range(count):
+        record = dict(template[i % len(template)], message_id=i)
+        deal_id = f"{record['title'].lower().replace(' ', '-')}-{i}-steam"
+        payload = encode_posted(record, compact=compact)
+
+        if layout == 'buckets':
+            shard = zlib.crc32(deal_id.encode('utf-8')) % buckets
+            bucket = f"{BENCH_PREFIX}posted:bucket:{shard}"
+            pipe.hset(bucket, deal_id, payload)
+            if shard not in touched:
+                touched.add(shard)
+                pipe.expire(bucket, timedelta(days=31))
+        else:
+            pipe.setex(f"{BENCH_PREFIX}posted:{deal_id}", timedelta(days=30), payload)
+
+        if len(pipe) >= 5000:
+            pipe.execute()
+    pipe.execute()
+
+
+def benchmark_layout(counts=(100_000, 1_000_000)):
+    """Confronta la memoria Redis dei due layout per le offerte postate"""
+    url = os.getenv('BENCH_REDIS_URL', 'redis://localhost:6379/15')
+    buckets = int(os.getenv('POSTED_BUCKETS', '16384'))
+    compact = os.getenv('STORAGE_ENCODING', 'json').lower() == 'compact'
+
+    client = redis.from_url(url)
+    try:
+        client.ping()
+    except Exception as e:
+        print(f"❌ Redis non raggiungibile su {url}: {e}")
+        return
+
+    print("\n" + "="*60)
+    print(f"🧠 MEMORIA OFFERTE POSTATE ({'compatto' if compact else 'JSON'}, {buckets} bucket)")
+    print("="*60)
+
+    for count in counts:
+        print(f"\n{count:,} offerte:")
+        for layout in ('keys', 'buckets'):
+            _clear(client)
+            before = _used_memory(client)
+            start = time.perf_counter()
+            _fill(client, layout, count, buckets, compact)
+            elapsed = time.perf_counter() - start
+            used = _used_memory(client) - before
+            print(f"  {layout:8} {used / 1024 / 1024:8.1f} MB  "
+                  f"{used / count:6.1f} B/offerta  ({elapsed:.1f}s)")
+        _clear(client)
+
+    print("\n" + "="*60)
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'encoding'
+
+    if mode == 'encoding':
+        benchmark_encoding()
+    elif mode == 'layout':
+        benchmark_layout()
+    else:
+        print(f"❌ Modalità sconosciuta: {mode}")
+
+
+if __name__ == "__main__":
+    main()
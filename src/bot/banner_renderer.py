@@ -0,0 +1,425 @@
+"""
+Banner Renderer
+Genera il banner grafico di un'offerta con Pillow
+
+Il banner (copertina, badge sconto, prezzo, BrislyScore) viene composto in
+un pool di processi, fuori dal loop asyncio, e salvato su disco e su Redis
+con chiave l'impronta dell'offerta. Dopo il primo invio Telegram restituisce
+un file_id: i reinvii usano quello e non ricaricano più i bytes.
+"""
+
+import io
+import os
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple, Union
+
+import httpx
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from database.redis_client import RedisClient
+
+logger = logging.getLogger(__name__)
+
+# Da incrementare a ogni modifica grafica
+BANNER_VERSION = 2
+
+WIDTH, HEIGHT = 1280, 640
+BANNER_TTL = timedelta(days=7)
+MAX_COVER_BYTES = 5 * 1024 * 1024
+# Offerte nel collage del recap settimanale
+COLLAGE_MAX = 6
+
+# Colori
+BACKGROUND = (18, 20, 32)
+ACCENT = (255, 61, 87)
+TEXT = (255, 255, 255)
+MUTED = (180, 184, 200)
+# Soglie dei tier BrislyScore (SUPER/OTTIMA/BUONA/OK)
+SCORE_COLORS = [(36, 'gold'), (26, (46, 204, 113)), (16, (52, 152, 219)), (0, (127, 140, 141))]
+
+BANNER_FIELDS = (
+    'title', 'platform', 'source', 'original_price', 'discounted_price',
+    'discount_percent', 'image_url',
+)
+
+# Un banner = caricamento da bytes (primo invio) o file_id Telegram (reinvii)
+Banner = Union[str, bytes]
+
+
+# ==========================================
+# RENDERING (eseguito nei processi del pool)
+# ==========================================
+
+def _font(size: int, bold: bool = True) -> ImageFont.ImageFont:
+    """Font TrueType (BANNER_FONT o DejaVu), altrimenti il font di default"""
+    names = [os.getenv('BANNER_FONT')] if os.getenv('BANNER_FONT') else []
+    names += ['DejaVuSans-Bold.ttf' if bold else 'DejaVuSans.ttf']
+    for name in names:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def _wrap(draw: ImageDraw.ImageDraw, text: str, font, width: int, max_lines: int) -> List[str]:
+    """Divide il testo in righe che stanno nella larghezza data"""
+    lines, current = [], ''
+    for word in text.split():
+        candidate = f"{current} {word}".strip()
+        if draw.textlength(candidate, font=font) <= width:
+            current = candidate
+            continue
+        if current:
+            lines.append(current)
+        current = word
+    if current:
+        lines.append(current)
+
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        while lines[-1] and draw.textlength(lines[-1] + '…', font=font) > width:
+            lines[-1] = lines[-1][:-1]
+        lines[-1] += '…'
+    return lines
+
+
+def _background(cover: Optional[bytes], width: int = WIDTH, height: int = HEIGHT) -> Image.Image:
+    """Copertina ritagliata e scurita, o gradiente se manca"""
+    if cover:
+        try:
+            image = Image.open(io.BytesIO(cover)).convert('RGB')
+            scale = max(width / image.width, height / image.height)
+            image = image.resize((int(image.width * scale) + 1, int(image.height * scale) + 1))
+            left = (image.width - width) // 2
+            top = (image.height - height) // 2
+            image = image.crop((left, top, left + width, top + height))
+            image = image.filter(ImageFilter.GaussianBlur(2))
+            return Image.blend(image, Image.new('RGB', (width, height), BACKGROUND), 0.55)
+        except Exception:
+            pass  # Formato non supportato (es. SVG): gradiente
+
+    image = Image.new('RGB', (width, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    for y in range(height):
+        shade = int(30 * y / height)
+        draw.line([(0, y), (width, y)], fill=(18 + shade, 20 + shade // 2, 32 + shade * 2))
+    return image
+
+
+def render_banner(spec: Dict, cover: Optional[bytes] = None) -> bytes:
+    """
+    Compone il banner di un'offerta
+
+    Args:
+        spec: Campi dell'offerta (BANNER_FIELDS + 'score', 'source_name')
+        cover: Bytes della copertina (opzionale)
+
+    Returns:
+        JPEG
+    """
+    image = _background(cover)
+    draw = ImageDraw.Draw(image)
+    margin = 56
+
+    # Badge sconto in alto a destra
+    badge_font = _font(72)
+    badge = f"-{spec['discount_percent']}%"
+    badge_width = draw.textlength(badge, font=badge_font) + 64
+    draw.rounded_rectangle(
+        [WIDTH - margin - badge_width, margin, WIDTH - margin, margin + 120],
+        radius=28, fill=ACCENT
+    )
+    draw.text((WIDTH - margin - badge_width / 2, margin + 60), badge,
+              font=badge_font, fill=TEXT, anchor='mm')
+
+    # BrislyScore in alto a sinistra
+    score = spec.get('score')
+    if score is not None:
+        color = next(c for threshold, c in SCORE_COLORS if score >= threshold)
+        score_font = _font(34)
+        label = f"BrislyScore {score}/45"
+        label_width = draw.textlength(label, font=score_font) + 48
+        draw.rounded_rectangle([margin, margin, margin + label_width, margin + 64],
+                               radius=32, fill=color)
+        draw.text((margin + label_width / 2, margin + 32), label,
+                  font=score_font, fill=BACKGROUND, anchor='mm')
+
+    # Titolo (max 2 righe)
+    title_font = _font(64)
+    lines = _wrap(draw, spec['title'], title_font, WIDTH - 2 * margin - 380, 2)
+    y = HEIGHT - margin - 110 - 76 * len(lines)
+    for line in lines:
+        draw.text((margin, y), line, font=title_font, fill=TEXT)
+        y += 76
+
+    # Piattaforma e store
+    info_font = _font(36, bold=False)
+    draw.text((margin, HEIGHT - margin - 70),
+              f"{spec.get('platform') or ''} · {spec.get('source_name') or ''}",
+              font=info_font, fill=MUTED)
+
+    # Prezzi in basso a destra
+    price_font = _font(96)
+    old_font = _font(44, bold=False)
+    price = f"{spec['discounted_price']:.2f}€"
+    old = f"{spec['original_price']:.2f}€"
+    draw.text((WIDTH - margin, HEIGHT - margin), price, font=price_font, fill=TEXT, anchor='rs')
+    old_y = HEIGHT - margin - 116
+    draw.text((WIDTH - margin, old_y), old, font=old_font, fill=MUTED, anchor='rs')
+    old_width = draw.textlength(old, font=old_font)
+    draw.line([(WIDTH - margin - old_width, old_y - 16), (WIDTH - margin, old_y - 16)],
+              fill=ACCENT, width=4)
+
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=85, optimize=True)
+    return out.getvalue()
+
+
+def render_collage(entries: List[Dict], heading: str, covers: List[Optional[bytes]] = ()) -> bytes:
+    """
+    Compone il collage del recap settimanale (griglia 2 colonne, max 6 offerte)
+
+    Args:
+        entries: Offerte del recap (BANNER_FIELDS + 'score'), in ordine di classifica
+        heading: Sottotitolo (es. settimana del recap)
+        covers: Copertine nello stesso ordine di entries (opzionali)
+
+    Returns:
+        JPEG
+    """
+    entries = entries[:COLLAGE_MAX]
+    tile_w, tile_h, header = WIDTH // 2, 300, 140
+    rows = max(1, (len(entries) + 1) // 2)
+    image = Image.new('RGB', (WIDTH, header + rows * tile_h), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+
+    draw.text((40, 32), "RECAP SETTIMANALE", font=_font(56), fill=TEXT)
+    draw.text((40, 98), heading, font=_font(28, bold=False), fill=MUTED)
+
+    title_font, info_font, badge_font = _font(34), _font(24, bold=False), _font(40)
+    covers = list(covers) + [None] * (len(entries) - len(covers))
+    for position, (entry, cover) in enumerate(zip(entries, covers)):
+        x = (position % 2) * tile_w
+        y = header + (position // 2) * tile_h
+        image.paste(_background(cover, tile_w, tile_h), (x, y))
+
+        # Posizione in classifica e badge sconto
+        draw.text((x + 24, y + 20), f"#{position + 1}", font=badge_font, fill=TEXT)
+        badge = f"-{entry['discount_percent']}%"
+        badge_width = draw.textlength(badge, font=badge_font) + 36
+        draw.rounded_rectangle([x + tile_w - 24 - badge_width, y + 20, x + tile_w - 24, y + 80],
+                               radius=18, fill=ACCENT)
+        draw.text((x + tile_w - 24 - badge_width / 2, y + 50), badge,
+                  font=badge_font, fill=TEXT, anchor='mm')
+
+        lines = _wrap(draw, entry['title'], title_font, tile_w - 48, 2)
+        line_y = y + tile_h - 84 - 42 * len(lines)
+        for line in lines:
+            draw.text((x + 24, line_y), line, font=title_font, fill=TEXT)
+            line_y += 42
+
+        score = entry.get('score')
+        score_text = f" · BrislyScore {score}" if score is not None else ""
+        draw.text((x + 24, y + tile_h - 60),
+                  f"{entry['discounted_price']:.2f}€ · {entry.get('platform') or ''}{score_text}",
+                  font=info_font, fill=MUTED)
+
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=85, optimize=True)
+    return out.getvalue()
+
+
+# ==========================================
+# CACHE E POOL
+# ==========================================
+
+def banner_fingerprint(deal: Dict, score_data: Optional[Dict] = None) -> str:
+    """Impronta dei campi che finiscono nel banner"""
+    payload = [BANNER_VERSION] + [deal.get(field) for field in BANNER_FIELDS]
+    payload.append(score_data.get('score') if score_data else None)
+    raw = json.dumps(payload, separators=(',', ':'), default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=10).hexdigest()
+
+
+class BannerRenderer:
+    """Banner con cache a tre livelli: file_id Telegram → disco → Redis"""
+
+    def __init__(self, db: RedisClient, cache_dir: str = 'data/banners',
+                 workers: Optional[int] = None, source_names: Optional[Dict] = None):
+        """
+        Args:
+            db: Client database
+            cache_dir: Cartella dei banner renderizzati
+            workers: Processi del pool (default: CPU disponibili, max 4)
+            source_names: Nomi visualizzati delle fonti
+        """
+        self.db = db
+        self.cache_dir = cache_dir
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.source_names = source_names or {}
+
+        self.file_ids_key = f"{db.prefix}banner:file_ids"
+        self.image_prefix = f"{db.prefix}banner:img:"
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: niente fork di un processo con thread e loop attivi
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._pool
+
+    def _http_client(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            # Un solo client per tutta la vita del renderer: connessioni riusate
+            self._http = httpx.AsyncClient(timeout=10.0, follow_redirects=True)
+        return self._http
+
+    def close(self):
+        """Chiude il pool di processi"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def aclose(self):
+        """Chiude il client HTTP delle copertine e il pool di processi"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        await asyncio.to_thread(self.close)
+
+    def _path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, f"{fingerprint}.jpg")
+
+    # ==========================================
+    # API
+    # ==========================================
+
+    async def get(self, deal: Dict, score_data: Optional[Dict] = None) -> Tuple[str, Banner]:
+        """
+        Banner di un'offerta, dalla cache se possibile
+
+        Returns:
+            (impronta, file_id Telegram o bytes JPEG)
+        """
+        fingerprint = banner_fingerprint(deal, score_data)
+
+        file_id = await asyncio.to_thread(self.db.client.hget, self.file_ids_key, fingerprint)
+        if file_id:
+            return fingerprint, file_id
+
+        # Render concorrenti della stessa offerta: uno solo lavora, gli altri attendono
+        pending = self._inflight.get(fingerprint)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load_or_render(fingerprint, deal, score_data))
+            self._inflight[fingerprint] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(fingerprint, None))
+        return fingerprint, await asyncio.shield(pending)
+
+    async def prefetch(self, deals: List[Dict]):
+        """Prepara in anticipo i banner delle offerte selezionate"""
+        results = await asyncio.gather(
+            *(self.get(deal, deal.get('brislyscore_data')) for deal in deals),
+            return_exceptions=True
+        )
+        for deal, result in zip(deals, results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Banner non generato per {deal.get('title')}: {result}")
+
+    async def collage(self, entries: List[Dict], heading: str) -> bytes:
+        """Collage del recap: copertine scaricate in parallelo, render nel pool"""
+        entries = entries[:COLLAGE_MAX]
+        covers = await asyncio.gather(*(self._fetch_cover(e.get('image_url')) for e in entries))
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor(), render_collage,
+                                              entries, heading, covers)
+        except BrokenProcessPool:
+            self._pool = None
+            raise
+
+    def remember_file_id(self, fingerprint: str, file_id: str):
+        """Salva il file_id restituito da Telegram dopo il primo upload"""
+        pipe = self.db.client.pipeline(transaction=True)
+        pipe.hset(self.file_ids_key, fingerprint, file_id)
+        pipe.expire(self.file_ids_key, BANNER_TTL)
+        pipe.execute()
+
+    # ==========================================
+    # CACHE DISCO / REDIS / RENDER
+    # ==========================================
+
+    async def _load_or_render(self, fingerprint: str, deal: Dict,
+                              score_data: Optional[Dict]) -> bytes:
+        path = self._path(fingerprint)
+
+        data = await asyncio.to_thread(self._read_disk, path)
+        if data:
+            return data
+
+        data = await asyncio.to_thread(self.db.binary.get, f"{self.image_prefix}{fingerprint}")
+        if data:
+            await asyncio.to_thread(self._write_disk, path, data)
+            return data
+
+        cover = await self._fetch_cover(deal.get('image_url'))
+        spec = {field: deal.get(field) for field in BANNER_FIELDS}
+        spec['score'] = score_data.get('score') if score_data else None
+        spec['source_name'] = self.source_names.get(deal.get('source'), deal.get('source'))
+
+        loop = asyncio.get_running_loop()
+        try:
+            data = await loop.run_in_executor(self._executor(), render_banner, spec, cover)
+        except BrokenProcessPool:
+            # Un worker è morto: il pool verrà ricreato al prossimo banner
+            self._pool = None
+            raise
+
+        await asyncio.to_thread(self._write_disk, path, data)
+        await asyncio.to_thread(self.db.binary.set, f"{self.image_prefix}{fingerprint}",
+                                data, ex=BANNER_TTL)
+        logger.info(f"🖼️ Banner generato: {deal.get('title')} ({len(data) // 1024} KB)")
+        return data
+
+    @staticmethod
+    def _read_disk(path: str) -> Optional[bytes]:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_disk(path: str, data: bytes):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    async def _fetch_cover(self, url: Optional[str]) -> Optional[bytes]:
+        """Scarica la copertina (nessuna copertina in caso di errore)"""
+        if not url:
+            return None
+        try:
+            response = await self._http_client().get(url)
+            response.raise_for_status()
+            if len(response.content) > MAX_COVER_BYTES:
+                return None
+            return response.content
+        except Exception as e:
+            logger.debug(f"Copertina non disponibile ({url}): {e}")
+            return None
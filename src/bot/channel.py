@@ -0,0 +1,277 @@
+"""
+Channel Runtime
+Un canale Telegram servito dallo scraping condiviso
+
+Ogni canale ha filtri, orari, limiti e namespace Redis propri (storico
+postati, outbox, buffer, post attivi, statistiche), ma riceve le offerte
+dallo stesso passaggio di scraping e scoring dello scheduler e pubblica con
+lo stesso Bot e la stessa coda di invio (i limiti di Telegram sono per bot).
+
+Configurazione: CHANNELS_FILE punta a un JSON con una lista di canali
+(vedi config/channels.example.json); senza file c'è un solo canale
+configurato dalle variabili d'ambiente, come prima.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from database.redis_client import RedisClient
+from bot.outbox import DealOutbox
+from bot.ready_buffer import ReadyBuffer
+from bot.price_updater import PriceUpdater
+from utils.canonical import normalize_platform
+
+logger = logging.getLogger(__name__)
+
+
+def load_settings():
+    """Modulo config/settings.py (valori letti dalle variabili d'ambiente)"""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if root not in sys.path:
+        sys.path.append(root)
+    from config import settings
+    return settings
+
+
+def load_posting_times() -> List[str]:
+    """Legge POSTING_TIMES da config/settings.py (env POSTING_TIMES)"""
+    return [posting_time.strftime('%H:%M') for posting_time in load_settings().POSTING_TIMES]
+
+
+def default_channel_config() -> Dict:
+    """Canale unico dalle variabili d'ambiente (comportamento storico)"""
+    return {
+        'name': 'gaming',
+        'channel_id': os.getenv('TELEGRAM_CHANNEL_ID', '@BrislyDealsGaming'),
+        'prefix': os.getenv('REDIS_PREFIX', 'brisly:gaming:'),
+        'posting_times': load_posting_times(),
+        'max_posts_per_session': 2,
+        'max_posts_per_day': 10,
+        'digest_size': int(os.getenv('DIGEST_SIZE', '0')),
+        'saturday_pause': load_settings().SATURDAY_PAUSE,
+        'min_score': 15,
+        'min_discount': 30,
+    }
+
+
+def load_channel_configs(path: Optional[str] = None) -> List[Dict]:
+    """
+    Configurazioni dei canali
+
+    Args:
+        path: File JSON (default: env CHANNELS_FILE)
+
+    Returns:
+        Lista di configurazioni; ogni canale eredita i valori di default
+        per le chiavi non specificate
+    """
+    path = path or os.getenv('CHANNELS_FILE')
+    if not path:
+        return [default_channel_config()]
+
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+
+    configs = []
+    for entry in entries:
+        config = dict(default_channel_config(), **entry)
+        if not config.get('channel_id'):
+            raise ValueError(f"❌ Canale senza channel_id: {entry}")
+        configs.append(config)
+
+    names = [config['name'] for config in configs]
+    prefixes = [config['prefix'] for config in configs]
+    if len(set(names)) != len(names) or len(set(prefixes)) != len(prefixes):
+        raise ValueError("❌ Nomi e prefissi dei canali devono essere unici")
+    return configs
+
+
+class ChannelRuntime:
+    """Stato e posting di un singolo canale"""
+
+    def __init__(self, config: Dict, db: RedisClient, poster, scraping_interval: int,
+                 ingest: Callable[[], Awaitable]):
+        """
+        Args:
+            config: Configurazione del canale (vedi default_channel_config)
+            db: Client database condiviso (il canale usa il suo prefisso)
+            poster: TelegramPoster condiviso (bot, coda, renderer)
+            scraping_interval: Secondi tra due ingest (scadenza del buffer)
+            ingest: Ingest condiviso, usato se il buffer è vuoto al posting
+        """
+        self.config = config
+        self.name = config['name']
+        self.db = db.for_prefix(config['prefix'])
+        self.poster = poster.for_channel(config['channel_id'])
+        self.ingest = ingest
+
+        # Orari e limiti
+        self.posting_times = list(config['posting_times'])
+        self.max_posts_per_session = int(config['max_posts_per_session'])
+        self.max_posts_per_day = int(config['max_posts_per_day'])
+        # Digest: N offerte in un solo messaggio per slot (0 = un post per offerta);
+        # in questa modalità il limite giornaliero conta i messaggi, non le offerte
+        self.digest_size = int(config['digest_size'])
+        self.saturday_pause = bool(config['saturday_pause'])
+
+        # Filtri
+        self.min_score = float(config['min_score'])
+        self.min_discount = float(config['min_discount'])
+        self.max_price = config.get('max_price')
+        self.platforms = {normalize_platform(p) for p in config.get('platforms') or []}
+        self.sources = set(config.get('sources') or [])
+
+        self.outbox = DealOutbox(self.db, self.poster)
+        self.buffer = ReadyBuffer(self.db, max_age=scraping_interval * 3)
+        self.updater = PriceUpdater(self.db, self.poster)
+
+        # Sender dell'outbox in background (None = esecuzione singola)
+        self.sender = None
+
+    # ==========================================
+    # FILTRI
+    # ==========================================
+
+    def accepts(self, deal: Dict) -> bool:
+        """Filtri qualità e di pubblico del canale"""
+        if deal['brislyscore'] < self.min_score:
+            return False
+        if deal.get('discount_percent', 0) < self.min_discount:
+            return False
+        if self.max_price is not None and deal.get('discounted_price', 0) > self.max_price:
+            return False
+        if self.platforms and normalize_platform(deal.get('platform', '')) not in self.platforms:
+            return False
+        if self.sources and deal.get('source') not in self.sources:
+            return False
+        return True
+
+    def filter_postable(self, all_deals: List[Dict]) -> List[Dict]:
+        """Filtra solo offerte valide e non già postate su questo canale"""
+        filtered = []
+        for deal in all_deals:
+            if not self.accepts(deal):
+                continue
+            # Skip se già postata (storico del canale)
+            deal_id = self.db._generate_deal_id(deal)
+            if self.db.is_deal_posted(deal_id):
+                continue
+            filtered.append(deal)
+
+        logger.info(f"✅ [{self.name}] {len(filtered)} offerte valide trovate")
+        return filtered
+
+    # ==========================================
+    # POSTING
+    # ==========================================
+
+    async def post_scheduled_deals(self):
+        """Posta le offerte negli orari schedulati"""
+        if self.digest_size:
+            await self.post_digest()
+            return
+
+        try:
+            # Check limite giornaliero (inclusi i post ancora in outbox);
+            # Redis sincrono sempre fuori dal loop, come filter_postable
+            posted_today = await asyncio.to_thread(
+                lambda: self.db.get_posted_count_today() + self.outbox.pending_count()
+            )
+            if posted_today >= self.max_posts_per_day:
+                logger.warning(f"⚠️ [{self.name}] Limite giornaliero raggiunto "
+                               f"({posted_today}/{self.max_posts_per_day})")
+                return
+
+            slots = min(self.max_posts_per_session, self.max_posts_per_day - posted_today)
+
+            # Buffer vuoto o scaduto (primo avvio, esecuzione singola): ingest ora
+            if not len(self.buffer):
+                logger.info(f"📭 [{self.name}] Buffer vuoto, raccolta immediata...")
+                await self.ingest()
+
+            # Migliori offerte già pronte, escluse quelle postate nel frattempo
+            to_post = await asyncio.to_thread(self.buffer.pop_best, slots, self.db.is_deal_posted)
+
+            if not to_post:
+                logger.info(f"📭 [{self.name}] Nessuna nuova offerta da postare")
+                return
+
+            # Render una volta sola: retry e reinvii riusano la cache
+            self.poster.renderer.prerender(to_post)
+            if self.poster.banners:
+                await self.poster.banners.prefetch(to_post)
+
+            logger.info(f"📤 [{self.name}] Posting {len(to_post)} offerte...")
+
+            # Outbox persistente: pubblicazione + marcatura con message_id in un
+            # solo commit, sicura anche se il processo si ferma a metà
+            await asyncio.to_thread(self.outbox.enqueue, to_post)
+            if self.sender is None:
+                # Nessun sender in background (esecuzione singola): svuota ora
+                published = await self.outbox.drain()
+                logger.info(f"✅ [{self.name}] Pubblicate {published} offerte")
+
+            # Log statistiche
+            stats = await asyncio.to_thread(self.db.get_all_stats)
+            logger.info(f"📊 [{self.name}] Stats - Totale posts: {stats.get('total_posts', 0)}")
+
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] Errore in post_scheduled_deals: {e}")
+
+    async def post_digest(self):
+        """Posta un digest con le migliori offerte del buffer"""
+        try:
+            # Check limite giornaliero (inclusi i digest ancora in outbox)
+            digests_today = await asyncio.to_thread(
+                lambda: self.db.get_digest_count_today() + self.outbox.pending_count()
+            )
+            if digests_today >= self.max_posts_per_day:
+                logger.warning(f"⚠️ [{self.name}] Limite giornaliero digest raggiunto "
+                               f"({digests_today}/{self.max_posts_per_day})")
+                return
+
+            if not len(self.buffer):
+                logger.info(f"📭 [{self.name}] Buffer vuoto, raccolta immediata...")
+                await self.ingest()
+
+            deals = await asyncio.to_thread(self.buffer.pop_best, self.digest_size,
+                                            self.db.is_deal_posted)
+            if not deals:
+                logger.info(f"📭 [{self.name}] Nessuna nuova offerta da postare")
+                return
+
+            # Le offerte che non entrano nel messaggio tornano nel buffer
+            _, _, included = self.poster.pack_digest(deals, self.digest_size)
+            packed = {id(deal) for deal in included}
+            await asyncio.to_thread(self.buffer.put_back,
+                                    [deal for deal in deals if id(deal) not in packed])
+            if not included:
+                return
+
+            logger.info(f"📤 [{self.name}] Digest con {len(included)} offerte...")
+
+            # Stessa outbox dei post singoli: invio e marcatura in un solo commit
+            await asyncio.to_thread(self.outbox.enqueue_digest, included)
+            if self.sender is None:
+                published = await self.outbox.drain()
+                logger.info(f"✅ [{self.name}] Pubblicati {published} digest")
+
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] Errore in post_digest: {e}")
+
+    async def post_weekly_recap(self, collage: bool = False):
+        """Recap settimanale dagli aggregati precalcolati (nessuna scansione)"""
+        try:
+            recap = await asyncio.to_thread(self.db.get_weekly_recap)
+            if not recap['posts']:
+                logger.info(f"📭 [{self.name}] Nessuna offerta questa settimana, niente recap")
+                return
+            logger.info(f"📊 [{self.name}] Recap {recap['week']}: {recap['posts']} offerte")
+            await self.poster.publish_recap(recap, collage=collage)
+
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] Errore in post_weekly_recap: {e}")
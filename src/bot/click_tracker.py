@@ -0,0 +1,369 @@
+"""
+Click Tracker
+Redirect dei pulsanti dei post con conteggio dei click (CTR)
+
+I pulsanti puntano a CLICK_TRACKER_URL/c/<offerta>/<pulsante>?u=<destinazione>&s=<firma>:
+- la destinazione viaggia nel link, firmata con HMAC (niente open redirect,
+  nessuna lettura da Redis per rispondere)
+- il click finisce in un buffer in memoria e si risponde subito con 302
+- un task svuota il buffer ogni CLICK_FLUSH_SECONDS (o quando si riempie) in
+  un'unica pipeline: contatori per pulsante, visitatori unici con
+  HyperLogLog, eventi grezzi (vedi RedisClient.record_clicks)
+
+Il visitatore è identificato da un cookie, inizializzato con l'impronta di
+IP e User-Agent.
+
+Servizio:
+    python src/bot/click_tracker.py
+
+Self-test (storage locale in memoria, nessuna rete):
+    python src/bot/click_tracker.py --self-test --clicks 20000 --visitors 3000
+"""
+
+import os
+import sys
+import hmac
+import time
+import base64
+import random
+import signal
+import asyncio
+import hashlib
+import logging
+import argparse
+import secrets
+from collections import Counter
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+
+from database.redis_client import RedisClient
+
+logger = logging.getLogger(__name__)
+
+VISITOR_COOKIE = 'bid'
+VISITOR_COOKIE_AGE = 365 * 24 * 3600
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class ClickLinks:
+    """Link firmati verso il click tracker"""
+
+    def __init__(self, base_url: str, secret: str):
+        """
+        Args:
+            base_url: Indirizzo pubblico del tracker (es. https://go.brislydeals.com)
+            secret: Chiave HMAC condivisa tra bot e tracker
+        """
+        self.base_url = base_url.rstrip('/')
+        self._key = secret.encode()
+
+    @classmethod
+    def from_env(cls) -> Optional['ClickLinks']:
+        """Link da CLICK_TRACKER_URL/CLICK_TRACKER_SECRET (None = tracking disattivo)"""
+        base_url = os.getenv('CLICK_TRACKER_URL')
+        if not base_url:
+            return None
+        secret = os.getenv('CLICK_TRACKER_SECRET')
+        if not secret:
+            raise ValueError("❌ CLICK_TRACKER_SECRET non configurato!")
+        return cls(base_url, secret)
+
+    def _sign(self, deal_id: str, button: str, target: str) -> str:
+        message = f"{deal_id}\n{button}\n{target}".encode()
+        return _b64encode(hmac.new(self._key, message, hashlib.sha256).digest()[:12])
+
+    def wrap(self, target: str, deal_id: str, button: str) -> str:
+        """Link tracciato verso target"""
+        return (
+            f"{self.base_url}/c/{quote(deal_id, safe='')}/{quote(button, safe='')}"
+            f"?u={_b64encode(target.encode())}&s={self._sign(deal_id, button, target)}"
+        )
+
+    def verify(self, deal_id: str, button: str, encoded: str, signature: str) -> Optional[str]:
+        """Destinazione di un link tracciato (None se la firma non è valida)"""
+        try:
+            target = _b64decode(encoded).decode()
+        except (ValueError, UnicodeDecodeError):
+            return None
+        if not hmac.compare_digest(signature, self._sign(deal_id, button, target)):
+            return None
+        return target
+
+
+class ClickTracker:
+    """Server di redirect con scritture a blocchi"""
+
+    def __init__(
+        self,
+        db: RedisClient,
+        links: ClickLinks,
+        flush_seconds: float = 5.0,
+        flush_size: int = 1000,
+        max_pending: int = 100_000,
+    ):
+        """
+        Args:
+            db: Client database in cui salvare i click
+            links: Verifica delle firme (stessa chiave dei link nei post)
+            flush_seconds: Intervallo massimo tra due scritture
+            flush_size: Click in buffer che anticipano la scrittura
+            max_pending: Click tenuti in memoria se Redis non risponde
+        """
+        self.db = db
+        self.links = links
+        self.flush_seconds = flush_seconds
+        self.flush_size = flush_size
+        self.max_pending = max_pending
+
+        self._buffer: List[Tuple[float, str, str, str]] = []
+        self._wakeup = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._runner: Optional[web.AppRunner] = None
+
+        self.stats: Counter = Counter()
+
+        self.app = web.Application()
+        self.app.router.add_get('/c/{deal_id}/{button}', self._redirect)
+        self.app.router.add_get('/health', self._health)
+
+    # ==========================================
+    # AVVIO / ARRESTO
+    # ==========================================
+
+    async def start(self, host: str = '0.0.0.0', port: int = 8090) -> int:
+        """
+        Avvia scrittore e server HTTP
+
+        Returns:
+            Porta effettiva (utile con port=0)
+        """
+        self._flusher = asyncio.create_task(self._flush_loop())
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        port = self._runner.addresses[0][1]
+        logger.info(f"🖱️ Click tracker in ascolto su {host}:{port}")
+        return port
+
+    async def stop(self):
+        """Smette di accettare click e salva quelli in buffer"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._flusher:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+    # ==========================================
+    # RICHIESTE
+    # ==========================================
+
+    async def _health(self, request: web.Request) -> web.Response:
+        return web.json_response({'ok': True, 'pending': len(self._buffer), **self.stats})
+
+    def _visitor(self, request: web.Request) -> Tuple[str, bool]:
+        """(ID visitatore, True se il cookie va impostato)"""
+        visitor = request.cookies.get(VISITOR_COOKIE)
+        if visitor:
+            return visitor, False
+        fingerprint = f"{request.remote}|{request.headers.get('User-Agent', '')}"
+        return hashlib.blake2b(fingerprint.encode(), digest_size=8).hexdigest(), True
+
+    async def _redirect(self, request: web.Request) -> web.Response:
+        deal_id = request.match_info['deal_id']
+        button = request.match_info['button']
+        target = self.links.verify(deal_id, button, request.query.get('u', ''),
+                                   request.query.get('s', ''))
+        if target is None:
+            self.stats['rejected'] += 1
+            return web.Response(status=404)
+
+        visitor, new_visitor = self._visitor(request)
+        if len(self._buffer) < self.max_pending:
+            self._buffer.append((time.time(), deal_id, button, visitor))
+            if len(self._buffer) >= self.flush_size:
+                self._wakeup.set()
+        else:
+            self.stats['dropped'] += 1
+        self.stats['clicks'] += 1
+
+        response = web.Response(status=302, headers={
+            'Location': target,
+            'Cache-Control': 'no-store',
+        })
+        if new_visitor:
+            response.set_cookie(VISITOR_COOKIE, visitor, max_age=VISITOR_COOKIE_AGE,
+                                httponly=True, samesite='Lax')
+        return response
+
+    # ==========================================
+    # SCRITTURA A BLOCCHI
+    # ==========================================
+
+    async def flush(self) -> int:
+        """Scrive i click in buffer (rimessi in coda se Redis fallisce)"""
+        events, self._buffer = self._buffer, []
+        if not events:
+            return 0
+        try:
+            # Client Redis sincrono: fuori dal loop, i redirect non aspettano
+            saved = await asyncio.to_thread(self.db.record_clicks, events)
+            self.stats['flushed'] += saved
+            return saved
+        except Exception as e:
+            logger.error(f"❌ Errore salvataggio di {len(events)} click: {e}")
+            self._buffer = (events + self._buffer)[-self.max_pending:]
+            return 0
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+# ==========================================
+# SERVIZIO E SELF-TEST
+# ==========================================
+
+async def serve():
+    """Tracker standalone fino a SIGTERM/SIGINT"""
+    links = ClickLinks.from_env()
+    if links is None:
+        raise ValueError("❌ CLICK_TRACKER_URL non configurato!")
+
+    tracker = ClickTracker(
+        RedisClient(),
+        links,
+        flush_seconds=float(os.getenv('CLICK_FLUSH_SECONDS', '5')),
+    )
+    await tracker.start(
+        os.getenv('CLICK_TRACKER_HOST', '0.0.0.0'),
+        int(os.getenv('CLICK_TRACKER_PORT', os.getenv('PORT', '8090')))
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    await stop.wait()
+    await tracker.stop()
+
+
+async def self_test(clicks: int, visitors: int, deals: int, concurrency: int):
+    """
+    Raffica di click sul tracker locale: latenza dei redirect e conteggi
+
+    Ogni visitatore ha il suo cookie; alla fine si confrontano i click salvati
+    e i visitatori unici stimati con HyperLogLog con i valori reali.
+    """
+    from aiohttp import ClientSession, DummyCookieJar
+
+    os.environ['LOCAL_STORE_PATH'] = ''
+    db = RedisClient(backend='local', prefix='selftest:')
+    links = ClickLinks('http://127.0.0.1', secrets.token_hex(16))
+    tracker = ClickTracker(db, links, flush_seconds=0.5)
+
+    # Tempo di risposta del server, senza la coda lato client
+    handled = []
+
+    @web.middleware
+    async def timing(request, handler):
+        begin = time.perf_counter()
+        response = await handler(request)
+        handled.append(time.perf_counter() - begin)
+        return response
+
+    tracker.app.middlewares.append(timing)
+    port = await tracker.start('127.0.0.1', 0)
+
+    base = f"http://127.0.0.1:{port}"
+    urls = [
+        links.wrap(f"https://example.com/deal/{i}?ref=brisly", f"deal-{i}", button).replace('http://127.0.0.1', base)
+        for i in range(deals) for button in ('offer', 'alt1', 'site')
+    ]
+    rng = random.Random(42)
+    plan = [(rng.choice(urls), rng.randrange(visitors)) for _ in range(clicks)]
+
+    latencies = []
+    statuses = Counter()
+    async with ClientSession(cookie_jar=DummyCookieJar()) as session:
+        async with session.get(base + '/c/deal-0/offer?u=aGk&s=wrong', allow_redirects=False) as response:
+            statuses[f"firma-errata:{response.status}"] += 1
+
+        async def lane(items):
+            for url, visitor in items:
+                begin = time.perf_counter()
+                async with session.get(url, allow_redirects=False,
+                                       cookies={VISITOR_COOKIE: f"v{visitor}"}) as response:
+                    statuses[response.status] += 1
+                latencies.append(time.perf_counter() - begin)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(lane(plan[i::concurrency]) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    await tracker.stop()
+
+    saved = db.get_stat('total_clicks')
+    unique = db.get_unique_visitors()
+    real_unique = len({visitor for _, visitor in plan})
+    per_deal = db.get_click_stats('deal-0')
+
+    latencies.sort()
+    handled.sort()
+    ms = lambda values, q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    print("\n" + "="*60)
+    print("📊 SELF-TEST CLICK TRACKER")
+    print("="*60)
+    print(f"  Click:         {clicks:,} su {deals} offerte, {concurrency} in parallelo")
+    print(f"  Throughput:    {clicks / elapsed:,.0f} redirect/s ({elapsed:.2f}s)")
+    print(f"  Server:        p50 {ms(handled, 0.5):.3f}ms | p99 {ms(handled, 0.99):.3f}ms | "
+          f"max {handled[-1] * 1000:.2f}ms")
+    print(f"  Client:        p50 {ms(latencies, 0.5):.2f}ms | p99 {ms(latencies, 0.99):.2f}ms "
+          f"(include la coda di {concurrency} richieste in parallelo)")
+    print(f"  Risposte HTTP: {dict(statuses)}")
+    print(f"  Salvati:       {saved:,} click ({tracker.stats['flushed']:,} scritti a blocchi)")
+    print(f"  Unici:         {unique:,} stimati / {real_unique:,} reali")
+    print(f"  deal-0:        {per_deal}")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+    parser = argparse.ArgumentParser(description="Click tracker (redirect con conteggio click)")
+    parser.add_argument('--self-test', action='store_true', help="Raffica di click in locale")
+    parser.add_argument('--clicks', type=int, default=20000)
+    parser.add_argument('--visitors', type=int, default=3000)
+    parser.add_argument('--deals', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.self_test:
+        logging.getLogger().setLevel(logging.WARNING)
+        asyncio.run(self_test(args.clicks, args.visitors, args.deals, args.concurrency))
+    else:
+        asyncio.run(serve())
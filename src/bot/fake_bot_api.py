@@ -0,0 +1,266 @@
+"""
+Fake Bot API
+Server locale che imita la Bot API di Telegram per test end-to-end e load test
+
+Registra i messaggi ricevuti e può iniettare:
+- latenza (fissa + jitter)
+- 429 Too Many Requests con retry_after (casuali o da flood per chat)
+- errori 5xx casuali
+
+Uso standalone:
+    python src/bot/fake_bot_api.py --port 8081 --latency 40 --rate-429 0.02
+    TELEGRAM_API_BASE_URL=http://127.0.0.1:8081/bot python src/scheduler.py
+"""
+
+import json
+import time
+import zlib
+import random
+import asyncio
+import logging
+import argparse
+import itertools
+from collections import Counter, defaultdict, deque
+from typing import Deque, Dict, List, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Metodi che creano un nuovo messaggio
+SEND_METHODS = {'sendMessage', 'sendPhoto'}
+# Metodi di modifica (rispondono con il messaggio aggiornato)
+EDIT_METHODS = {'editMessageText', 'editMessageCaption', 'editMessageReplyMarkup', 'editMessageMedia'}
+
+
+class FakeBotAPI:
+    """Bot API finta con iniezione di latenza ed errori"""
+
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        rate_429: float = 0.0,
+        retry_after: int = 1,
+        rate_5xx: float = 0.0,
+        flood_per_minute: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            latency_ms: Latenza fissa per richiesta
+            jitter_ms: Latenza aggiuntiva casuale (0..jitter_ms)
+            rate_429: Probabilità di rispondere 429 a un invio
+            retry_after: Secondi di retry_after nelle risposte 429 casuali
+            rate_5xx: Probabilità di rispondere 502 a una richiesta
+            flood_per_minute: Se impostato, 429 reali oltre N messaggi/minuto per chat
+            seed: Seed per errori riproducibili
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rate_5xx = rate_5xx
+        self.flood_per_minute = flood_per_minute
+        self.random = random.Random(seed)
+
+        self.messages: Dict[str, List[Dict]] = defaultdict(list)
+        self.stats: Counter = Counter()
+        self._ids: Dict[str, itertools.count] = defaultdict(lambda: itertools.count(1))
+        self._recent: Dict[str, Deque[float]] = defaultdict(deque)
+
+        self.app = web.Application()
+        self.app.router.add_route('*', '/bot{token}/{method}', self._handle)
+        self._runner: Optional[web.AppRunner] = None
+
+    # ==========================================
+    # AVVIO / ARRESTO
+    # ==========================================
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """
+        Avvia il server
+
+        Returns:
+            Base URL da passare al Bot (es. http://127.0.0.1:8081/bot)
+        """
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        logger.info(f"🧪 Fake Bot API su http://{host}:{port}")
+        return f"http://{host}:{port}/bot"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # ==========================================
+    # RICHIESTE
+    # ==========================================
+
+    async def _params(self, request: web.Request) -> Dict:
+        """Parametri da JSON, form o multipart (come li invia PTB)"""
+        if request.content_type == 'application/json':
+            return await request.json()
+        params = dict(request.query)
+        if request.can_read_body:
+            for key, value in (await request.post()).items():
+                if isinstance(value, web.FileField):
+                    params[key] = {'filename': value.filename, 'size': len(value.file.read())}
+                else:
+                    params[key] = value
+        return params
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        params = await self._params(request)
+        self.stats[f"calls:{method}"] += 1
+
+        delay = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        if self.rate_5xx and self.random.random() < self.rate_5xx:
+            self.stats['502'] += 1
+            return web.json_response(
+                {'ok': False, 'error_code': 502, 'description': 'Bad Gateway'}, status=502
+            )
+
+        if method in SEND_METHODS or method in EDIT_METHODS:
+            chat = str(params.get('chat_id'))
+            retry = self._flood_retry(chat)
+            if retry is None and self.rate_429 and self.random.random() < self.rate_429:
+                retry = self.retry_after
+            if retry is not None:
+                self.stats['429'] += 1
+                return web.json_response({
+                    'ok': False,
+                    'error_code': 429,
+                    'description': f"Too Many Requests: retry after {retry}",
+                    'parameters': {'retry_after': retry},
+                }, status=429)
+
+        handler = getattr(self, f"_api_{method}", None)
+        result = handler(params) if handler else True
+        self.stats['ok'] += 1
+        return web.json_response({'ok': True, 'result': result})
+
+    def _flood_retry(self, chat: str) -> Optional[int]:
+        """429 come Telegram: troppi messaggi nell'ultimo minuto nella stessa chat"""
+        if not self.flood_per_minute:
+            return None
+        now = time.monotonic()
+        recent = self._recent[chat]
+        while recent and recent[0] <= now - 60:
+            recent.popleft()
+        if len(recent) >= self.flood_per_minute:
+            return max(1, int(recent[0] + 60 - now) + 1)
+        recent.append(now)
+        return None
+
+    # ==========================================
+    # METODI BOT API
+    # ==========================================
+
+    @staticmethod
+    def _chat(chat_id) -> Dict:
+        chat_id = str(chat_id)
+        if chat_id.startswith('@'):
+            return {'id': -1000000000000 - zlib.crc32(chat_id.encode()) % 10**9,
+                    'type': 'channel', 'username': chat_id[1:], 'title': chat_id[1:]}
+        value = int(chat_id)
+        return {'id': value, 'type': 'private' if value > 0 else 'channel', 'title': 'chat'}
+
+    def _message(self, params: Dict, **fields) -> Dict:
+        chat = str(params.get('chat_id'))
+        message = {
+            'message_id': next(self._ids[chat]),
+            'date': int(time.time()),
+            'chat': self._chat(chat),
+            **fields,
+        }
+        if params.get('reply_markup'):
+            markup = params['reply_markup']
+            message['reply_markup'] = json.loads(markup) if isinstance(markup, str) else markup
+        self.messages[chat].append(message)
+        return message
+
+    def _api_getMe(self, params: Dict) -> Dict:
+        return {'id': 1, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_bot'}
+
+    def _api_sendMessage(self, params: Dict) -> Dict:
+        return self._message(params, text=params.get('text', ''))
+
+    def _api_sendPhoto(self, params: Dict) -> Dict:
+        photo = params.get('photo')
+        file_id = photo if isinstance(photo, str) else f"fake-file-{self.stats['ok']}"
+        return self._message(params, caption=params.get('caption', ''), photo=[{
+            'file_id': file_id, 'file_unique_id': file_id[-16:], 'width': 1280, 'height': 640,
+        }])
+
+    def _find(self, params: Dict) -> Optional[Dict]:
+        chat = str(params.get('chat_id'))
+        message_id = int(params.get('message_id', 0))
+        for message in self.messages.get(chat, []):
+            if message['message_id'] == message_id:
+                return message
+        return None
+
+    def _edit(self, params: Dict, **fields):
+        message = self._find(params)
+        if message is None:
+            return True
+        message.update({k: v for k, v in fields.items() if v is not None})
+        message['edit_date'] = int(time.time())
+        return message
+
+    def _api_editMessageText(self, params: Dict):
+        return self._edit(params, text=params.get('text'))
+
+    def _api_editMessageCaption(self, params: Dict):
+        return self._edit(params, caption=params.get('caption'))
+
+    def _api_editMessageReplyMarkup(self, params: Dict):
+        return self._edit(params)
+
+    def _api_editMessageMedia(self, params: Dict):
+        return self._edit(params)
+
+
+async def _serve(args):
+    api = FakeBotAPI(
+        latency_ms=args.latency, jitter_ms=args.jitter, rate_429=args.rate_429,
+        retry_after=args.retry_after, rate_5xx=args.rate_5xx,
+        flood_per_minute=args.flood_per_minute, seed=args.seed
+    )
+    base_url = await api.start(args.host, args.port)
+    print(f"TELEGRAM_API_BASE_URL={base_url}")
+    try:
+        while True:
+            await asyncio.sleep(30)
+            logger.info(f"📊 {dict(api.stats)}")
+    finally:
+        await api.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0, help="ms per richiesta")
+    parser.add_argument('--jitter', type=float, default=0, help="ms casuali aggiuntivi")
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--rate-5xx', type=float, default=0.0)
+    parser.add_argument('--flood-per-minute', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
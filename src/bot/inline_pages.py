@@ -0,0 +1,173 @@
+"""
+Inline Pages
+Risposte pre-calcolate per la modalità inline (@BrislyGamingBot <gioco>)
+
+Telegram scarta le risposte inline lente, quindi nulla viene calcolato alla
+richiesta: a ogni aggiornamento dell'indice di ricerca si costruiscono
+- gli articoli inline delle offerte (riusati se l'offerta non è cambiata)
+- le pagine fisse: migliori offerte, per tier, per piattaforma, per genere
+Le ricerche per titolo passano dall'indice in memoria e finiscono in una
+cache LRU svuotata a ogni aggiornamento. Le pagine sono servite a blocchi
+con next_offset.
+"""
+
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent
+from telegram.constants import ParseMode
+
+from bot.message_renderer import deal_fingerprint
+from utils.canonical import normalize_platform
+from utils.search_index import DealSearchIndex, words
+
+logger = logging.getLogger(__name__)
+
+# Massimo risultati per risposta inline consentito da Telegram
+INLINE_MAX_PAGE = 50
+
+# Tier BrislyScore → chiave della pagina inline (es. "@bot super")
+TIER_PAGES = {
+    'SUPER_OFFERTA': 'super',
+    'OTTIMA_OFFERTA': 'ottima',
+    'BUONA_OFFERTA': 'buona',
+    'OFFERTA_OK': 'ok',
+}
+
+
+def _result_id(deal_id: str) -> str:
+    """ID risultato (Telegram accetta al massimo 64 byte)"""
+    return hashlib.blake2b(deal_id.encode(), digest_size=16).hexdigest()
+
+
+class InlinePages:
+    """Pagine di risultati inline pronte all'uso"""
+
+    def __init__(self, index: DealSearchIndex, poster, page_size: int = 20,
+                 max_results: int = 100, search_cache: int = 512):
+        """
+        Args:
+            index: Indice di ricerca delle offerte correnti
+            poster: TelegramPoster (renderer dei messaggi)
+            page_size: Risultati per risposta (max 50)
+            max_results: Risultati massimi per query (tutte le pagine)
+            search_cache: Ricerche per titolo tenute in cache
+        """
+        self.index = index
+        self.poster = poster
+        self.page_size = min(page_size, INLINE_MAX_PAGE)
+        self.max_results = max_results
+        self.search_cache = search_cache
+
+        self._articles: Dict[str, Tuple[str, InlineQueryResultArticle]] = {}
+        self._pages: Dict[str, List[InlineQueryResultArticle]] = {}
+        self._searches: OrderedDict = OrderedDict()
+        self._ids: Dict[int, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    # ==========================================
+    # COSTRUZIONE
+    # ==========================================
+
+    def _article(self, deal_id: str, deal: Dict) -> InlineQueryResultArticle:
+        """Articolo inline di un'offerta (ricostruito solo se l'offerta cambia)"""
+        score = deal.get('brislyscore_data')
+        fingerprint = deal_fingerprint(deal, score)
+        cached = self._articles.get(deal_id)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+
+        text, keyboard = self.poster.renderer.render(deal, score)
+        score_text = f" · {score['emoji']} {score['score']}" if score else ""
+        article = InlineQueryResultArticle(
+            id=_result_id(deal_id),
+            title=f"{deal['title']} - {deal['discounted_price']}€ (-{deal['discount_percent']}%)",
+            description=f"{deal.get('platform', 'Steam')} · era {deal['original_price']}€{score_text}",
+            input_message_content=InputTextMessageContent(text, parse_mode=ParseMode.MARKDOWN),
+            reply_markup=keyboard,
+            thumbnail_url=deal.get('image_url') or None,
+        )
+        self._articles[deal_id] = (fingerprint, article)
+        return article
+
+    def rebuild(self, deals: List[Dict] = None):
+        """
+        Ricostruisce le pagine dall'indice (listener dell'ingest, dopo l'indice)
+
+        Args:
+            deals: Ignorato, le offerte correnti sono lette dall'indice
+        """
+        articles = {deal_id: self._article(deal_id, deal) for deal_id, deal in self.index.deals.items()}
+        # Offerte sparite: articoli non più validi
+        for deal_id in [d for d in self._articles if d not in articles]:
+            del self._articles[deal_id]
+
+        self._ids = {id(deal): deal_id for deal_id, deal in self.index.deals.items()}
+        ranked = self.index.top(len(self.index))
+
+        pages: Dict[str, List[InlineQueryResultArticle]] = {'': []}
+        for deal in ranked:
+            article = articles[self._ids[id(deal)]]
+            score = deal.get('brislyscore_data') or {}
+            keys = ['']
+            if score.get('tier') in TIER_PAGES:
+                keys.append(TIER_PAGES[score['tier']])
+            keys.append(normalize_platform(deal.get('platform', '')))
+            if deal.get('genre'):
+                keys.append(' '.join(words(deal['genre'])))
+            for key in keys:
+                page = pages.setdefault(key, [])
+                if len(page) < self.max_results:
+                    page.append(article)
+
+        self._pages = pages
+        self._searches.clear()
+        logger.info(f"📑 Pagine inline: {len(pages)} pagine, {len(articles)} offerte")
+
+    # ==========================================
+    # RISPOSTE
+    # ==========================================
+
+    def lookup(self, query: str) -> List[InlineQueryResultArticle]:
+        """Tutti i risultati (fino a max_results) per una query inline"""
+        key = ' '.join(words(query))
+        page = self._pages.get(key)
+        if page is not None:
+            self.hits += 1
+            return page
+
+        cached = self._searches.get(key)
+        if cached is not None:
+            self._searches.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        results = []
+        for deal in self.index.search(key, self.max_results):
+            entry = self._articles.get(self._ids.get(id(deal)))
+            if entry:
+                results.append(entry[1])
+        self._searches[key] = results
+        if len(self._searches) > self.search_cache:
+            self._searches.popitem(last=False)
+        return results
+
+    def page(self, query: str, offset: str = '') -> Tuple[List[InlineQueryResultArticle], str]:
+        """
+        Una pagina di risultati
+
+        Args:
+            query: Testo della query inline
+            offset: Offset ricevuto da Telegram ('' per la prima pagina)
+
+        Returns:
+            (risultati, next_offset - '' se è l'ultima pagina)
+        """
+        results = self.lookup(query)
+        start = int(offset) if offset and offset.isdigit() else 0
+        end = start + self.page_size
+        return results[start:end], (str(end) if end < len(results) else '')
@@ -3,14 +3,46 @@
 BrislyDeals Gaming Bot - Main Entry Point
 Telegram: @BrislyGamingBot
 Channel: @BrislyDealsGaming
+
+Un unico processo asyncio: scheduler dei post (scraping, canale, wishlist)
+e comandi interattivi del bot.
+
+Comandi:
+- /deals [piattaforma]  migliori offerte correnti
+- /search <gioco>       ricerca nelle offerte correnti (anche con errori di battitura)
+- /wishlist [add|remove <gioco>]  gestione wishlist
+- /alert [<gioco> <prezzo>|remove <gioco>]  avviso quando il prezzo scende
+- /stats                statistiche del canale
+- @BrislyGamingBot <gioco|tier|piattaforma|genere> in qualsiasi chat (inline)
+
+Le risposte arrivano dall'indice in memoria aggiornato a ogni scraping:
+nessun comando avvia uno scraping o una scansione di Redis per cercare.
+
+BOT_MODE=webhook riceve gli update con un server HTTP locale (bot/webhook.py)
+invece del long polling; WEBHOOK_URL è l'indirizzo pubblico HTTPS.
 """
 
 import os
 import sys
+import secrets
+import asyncio
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+from telegram.constants import ParseMode
+from telegram.ext import Application, CommandHandler, ContextTypes, InlineQueryHandler
+from telegram.helpers import escape_markdown
+
+from scheduler import BotScheduler
+from bot.inline_pages import InlinePages
+from bot.webhook import WebhookServer
+from utils.canonical import normalize_platform
+from utils.search_index import DealSearchIndex, words
+
 # Carica le variabili d'ambiente
 load_dotenv()
 
@@ -21,37 +53,271 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Risultati per risposta
+RESULTS_LIMIT = 8
+
+HELP_TEXT = (
+    "🎮 *BrislyGaming Bot*\n\n"
+    "/deals - Migliori offerte del momento\n"
+    "/deals steam - Solo una piattaforma\n"
+    "/search <gioco> - Cerca tra le offerte\n"
+    "/wishlist - La tua wishlist\n"
+    "/wishlist add <gioco> - Avvisami quando è in offerta\n"
+    "/wishlist remove <gioco> - Rimuovi dalla wishlist\n"
+    "/alert <gioco> <prezzo> - Avvisami sotto un prezzo\n"
+    "/alert remove <gioco> - Rimuovi un avviso\n"
+    "/stats - Statistiche del canale"
+)
+
 class BrislyGamingBot:
     """Main bot class per gestire le operazioni"""
-    
+
     def __init__(self):
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.channel_id = os.getenv('TELEGRAM_CHANNEL_ID')
-        
+
         if not self.bot_token:
             logger.error("❌ TELEGRAM_BOT_TOKEN non trovato!")
             sys.exit(1)
-            
+
+        # Scheduler dei post: il bot riceve le offerte di ogni ingest
+        self.scheduler = BotScheduler()
+        self.db = self.scheduler.db
+        self.poster = self.scheduler.poster
+
+        self.index = DealSearchIndex(key=self.db._generate_deal_id)
+        self.scheduler.ingest_listeners.append(self.index.update)
+
+        # Modalità inline: pagine ricostruite dopo l'indice, a ogni ingest
+        self.inline = InlinePages(self.index, self.poster)
+        self.inline_cache_time = int(os.getenv('INLINE_CACHE_SECONDS', '300'))
+        self.scheduler.ingest_listeners.append(self.inline.rebuild)
+
+        base_url = os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org/bot')
+        self.application = (
+            Application.builder()
+            .token(self.bot_token)
+            .base_url(base_url)
+            .base_file_url(base_url.replace('/bot', '/file/bot', 1))
+            .build()
+        )
+        self._register_handlers()
+
+        # Ricezione update: "polling" (default) o "webhook"
+        self.mode = os.getenv('BOT_MODE', 'polling').lower()
+        self.webhook: WebhookServer = None
+
         logger.info("✅ BrislyGaming Bot inizializzato")
         logger.info(f"📢 Canale target: {self.channel_id}")
-        
+
+    def _register_handlers(self):
+        app = self.application
+        app.add_handler(CommandHandler(['start', 'help'], self.cmd_help))
+        app.add_handler(CommandHandler('deals', self.cmd_deals))
+        app.add_handler(CommandHandler('search', self.cmd_search))
+        app.add_handler(CommandHandler('wishlist', self.cmd_wishlist))
+        app.add_handler(CommandHandler('alert', self.cmd_alert))
+        app.add_handler(CommandHandler('stats', self.cmd_stats))
+        app.add_handler(InlineQueryHandler(self.on_inline_query))
+
+    # ==========================================
+    # COMANDI
+    # ==========================================
+
+    async def _reply_deals(self, update: Update, deals, header: str):
+        """Lista compatta di offerte con un pulsante per offerta"""
+        text, keyboard, _ = self.poster.pack_digest(deals, RESULTS_LIMIT, header=header, footer="")
+        await update.message.reply_text(
+            text,
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=keyboard,
+            disable_web_page_preview=True
+        )
+
+    async def cmd_help(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        await update.message.reply_text(HELP_TEXT, parse_mode=ParseMode.MARKDOWN)
+
+    async def cmd_deals(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not len(self.index):
+            await update.message.reply_text("⏳ Offerte in aggiornamento, riprova tra poco!")
+            return
+
+        where = None
+        header = "🔥 *MIGLIORI OFFERTE DEL MOMENTO*\n\n"
+        if context.args:
+            platform = normalize_platform(' '.join(context.args))
+            where = lambda deal: normalize_platform(deal.get('platform', '')) == platform
+            header = f"🔥 *MIGLIORI OFFERTE {escape_markdown(platform.upper())}*\n\n"
+
+        deals = self.index.top(RESULTS_LIMIT, where)
+        if not deals:
+            await update.message.reply_text("😕 Nessuna offerta per questa piattaforma")
+            return
+        await self._reply_deals(update, deals, header)
+
+    async def cmd_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = ' '.join(context.args).strip()
+        if not query:
+            await update.message.reply_text("🔎 Uso: /search <gioco>")
+            return
+
+        deals = self.index.search(query, RESULTS_LIMIT)
+        if not deals:
+            await update.message.reply_text(
+                f"😕 Nessuna offerta per \"{query}\"\n"
+                f"Usa /wishlist add {query} per essere avvisato!"
+            )
+            return
+        await self._reply_deals(update, deals, f"🔎 *Risultati per* _{escape_markdown(query)}_\n\n")
+
+    async def cmd_wishlist(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user_id = update.effective_user.id
+        args = context.args
+
+        if args and args[0].lower() in ('add', 'remove') and len(args) > 1:
+            title = ' '.join(args[1:])
+            if args[0].lower() == 'add':
+                added = self.db.add_to_wishlist(user_id, title)
+                reply = f"💙 Aggiunto: {title}" if added else f"ℹ️ {title} è già in wishlist"
+            else:
+                removed = self.db.remove_from_wishlist(user_id, title)
+                reply = f"🗑️ Rimosso: {title}" if removed else f"ℹ️ {title} non è in wishlist"
+            await update.message.reply_text(reply)
+            return
+
+        wishlist = sorted(self.db.get_wishlist(user_id))
+        if not wishlist:
+            await update.message.reply_text("💙 Wishlist vuota\nUsa /wishlist add <gioco>")
+            return
+        lines = '\n'.join(f"• {title}" for title in wishlist)
+        await update.message.reply_text(f"💙 La tua wishlist:\n{lines}")
+
+    async def cmd_alert(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user_id = update.effective_user.id
+        args = context.args
+
+        if not args:
+            alerts = self.db.get_price_alerts(user_id)
+            if not alerts:
+                await update.message.reply_text("📉 Nessun avviso di prezzo\nUsa /alert <gioco> <prezzo>")
+                return
+            lines = '\n'.join(f"• {a['title']} sotto {a['target']:.2f}€"
+                              for a in sorted(alerts.values(), key=lambda a: a['title']))
+            await update.message.reply_text(f"📉 I tuoi avvisi:\n{lines}")
+            return
+
+        if args[0].lower() == 'remove' and len(args) > 1:
+            query = ' '.join(words(' '.join(args[1:])))
+            for product_id, alert in self.db.get_price_alerts(user_id).items():
+                if query in ' '.join(words(alert['title'])):
+                    self.db.remove_price_alert(user_id, product_id)
+                    await update.message.reply_text(f"🗑️ Avviso rimosso: {alert['title']}")
+                    return
+            await update.message.reply_text(f"ℹ️ Nessun avviso per {' '.join(args[1:])}")
+            return
+
+        try:
+            target = float(args[-1].replace('€', '').replace(',', '.'))
+        except ValueError:
+            target = 0
+        if len(args) < 2 or target <= 0:
+            await update.message.reply_text("📉 Uso: /alert <gioco> <prezzo>\nEs: /alert elden ring 25")
+            return
+
+        # Offerta corrente più vicina: stesso prodotto canonico e piattaforma
+        title, platform = ' '.join(args[:-1]), None
+        found = self.index.search(title, 1)
+        if found:
+            title, platform = found[0]['title'], found[0].get('platform')
+            if found[0]['discounted_price'] <= target:
+                await self._reply_deals(update, found, f"🎯 *Già sotto {target:.2f}€!*\n\n")
+                return
+
+        self.db.add_price_alert(user_id, title, target, platform)
+        await update.message.reply_text(f"📉 Ti avviso quando {title} scende sotto {target:.2f}€")
+
+    async def cmd_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        stats = self.db.get_all_stats()
+        await update.message.reply_text(
+            "📊 *Statistiche*\n\n"
+            f"Offerte pubblicate: {stats.get('total_posts', 0)}\n"
+            f"Oggi: {self.db.get_posted_count_today()}\n"
+            f"Notifiche wishlist: {stats.get('wishlist_notifications', 0)}\n"
+            f"Avvisi di prezzo inviati: {stats.get('alert_notifications', 0)}\n"
+            f"Click sulle offerte: {stats.get('total_clicks', 0)} "
+            f"({self.db.get_unique_visitors()} visitatori unici oggi)\n"
+            f"Offerte correnti: {len(self.index)}",
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+    async def on_inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Risposta inline dalle pagine pre-calcolate (nessun Redis, nessuno scraping)"""
+        query = update.inline_query
+        results, next_offset = self.inline.page(query.query, query.offset)
+        await query.answer(
+            results,
+            cache_time=self.inline_cache_time,
+            is_personal=False,
+            next_offset=next_offset
+        )
+
+    # ==========================================
+    # AVVIO
+    # ==========================================
+
+    async def _start_webhook(self):
+        """Server webhook locale + registrazione dell'URL pubblico su Telegram"""
+        url = os.getenv('WEBHOOK_URL')
+        if not url:
+            raise RuntimeError("WEBHOOK_URL non impostato (richiesto con BOT_MODE=webhook)")
+
+        # Senza segreto configurato se ne genera uno a ogni avvio
+        secret = os.getenv('WEBHOOK_SECRET') or secrets.token_urlsafe(32)
+        path = os.getenv('WEBHOOK_PATH', '/telegram')
+        self.webhook = WebhookServer(
+            self.application,
+            secret,
+            path=path,
+            workers=int(os.getenv('WEBHOOK_WORKERS', '8')),
+            queue_size=int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+        )
+        await self.webhook.start(
+            os.getenv('WEBHOOK_HOST', '0.0.0.0'),
+            int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', '8443')))
+        )
+        await self.application.bot.set_webhook(
+            url.rstrip('/') + path,
+            secret_token=secret,
+            allowed_updates=Update.ALL_TYPES,
+            max_connections=int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+        )
+        logger.info(f"🔗 Webhook registrato: {url.rstrip('/')}{path}")
+
+    async def run_async(self):
+        """Comandi (polling o webhook) e scheduler nello stesso loop"""
+        await self.application.initialize()
+        await self.application.start()
+        if self.mode == 'webhook':
+            await self._start_webhook()
+        else:
+            await self.application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        logger.info(f"🚀 Bot avviato alle {datetime.now()} ({self.mode})")
+
+        try:
+            # Termina su SIGTERM/SIGINT (gestiti dallo scheduler)
+            await self.scheduler.run_async()
+        finally:
+            if self.webhook:
+                # Il webhook resta registrato: Telegram conserva gli update fino al riavvio
+                await self.webhook.stop()
+            else:
+                await self.application.updater.stop()
+            await self.application.stop()
+            await self.application.shutdown()
+
     def run(self):
         """Avvia il bot"""
-        logger.info(f"🚀 Bot avviato alle {datetime.now()}")
-        logger.info("🔄 In attesa di implementazione scraper...")
-        
-        # TODO: Implementare logica principale
-        # - Avviare scrapers
-        # - Schedulare posting
-        # - Gestire comandi
-        
-        print("\n" + "="*50)
-        print("🎮 BRISLY GAMING BOT - READY")
-        print("="*50)
-        print(f"Channel: {self.channel_id}")
-        print(f"Time: {datetime.now()}")
-        print("Status: Waiting for implementation")
-        print("="*50 + "\n")
+        asyncio.run(self.run_async())
 
 def main():
     """Entry point principale"""
@@ -65,4 +331,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,187 @@
+"""
+Message Renderer
+Cache dei messaggi e delle tastiere già renderizzati per ogni offerta
+
+Un'offerta viene renderizzata una volta sola (alla selezione) e il risultato
+è riusato da test mode, invio reale e retry. La chiave è l'impronta dei campi
+che finiscono nel post più la versione del template: se cambia il prezzo o
+il template, il messaggio viene rigenerato.
+
+Supporta anche settings.POST_TEMPLATE, compilato una volta in blocchi di
+righe (MESSAGE_TEMPLATE=settings).
+"""
+
+import os
+import sys
+import json
+import zlib
+import hashlib
+import logging
+from collections import OrderedDict
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+
+from telegram import InlineKeyboardMarkup
+
+logger = logging.getLogger(__name__)
+
+# Da incrementare a ogni modifica del formato dei messaggi
+TEMPLATE_VERSION = 1
+
+# Campi dell'offerta che compaiono nel post o nella tastiera
+RENDER_FIELDS = (
+    'source', 'title', 'platform', 'url', 'discount_percent', 'original_price',
+    'discounted_price', 'alternatives', 'metacritic_score', 'release_year', 'genre',
+    'early_access', 'is_historical_low', 'is_aaa',
+)
+SCORE_FIELDS = ('emoji', 'score', 'tier', 'recommendation')
+
+# Campi disponibili in POST_TEMPLATE
+TEMPLATE_FIELDS = {
+    'discount_percent', 'game_title', 'platform', 'original_price', 'discounted_price',
+    'savings', 'metacritic', 'year', 'genre', 'tags', 'source', 'brislyscore', 'tier',
+}
+# Campi che possono mancare: la riga che li contiene viene omessa
+OPTIONAL_FIELDS = {'metacritic', 'year', 'genre', 'brislyscore', 'tier'}
+
+Rendered = Tuple[str, InlineKeyboardMarkup]
+
+
+def deal_fingerprint(deal: Dict, score_data: Optional[Dict] = None) -> str:
+    """
+    Impronta dei soli campi renderizzati
+
+    Returns:
+        Hash esadecimale (16 caratteri)
+    """
+    payload = [deal.get(field) for field in RENDER_FIELDS]
+    if score_data:
+        payload.extend(score_data.get(field) for field in SCORE_FIELDS)
+    raw = json.dumps(payload, separators=(',', ':'), default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+
+def load_settings_template() -> str:
+    """Legge POST_TEMPLATE da config/settings.py"""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if root not in sys.path:
+        sys.path.append(root)
+    from config.settings import POST_TEMPLATE
+    return POST_TEMPLATE
+
+
+class CompiledTemplate:
+    """
+    Template pre-compilato in blocchi di righe
+
+    Le righe consecutive con soli campi sempre presenti vengono fuse in un
+    unico blocco (una sola format_map); le righe con campi opzionali
+    (es. Metacritic) restano separate e vengono omesse se i campi mancano.
+    """
+
+    def __init__(self, template: str):
+        self.source = template
+        # (stringa di formato, campi opzionali della riga)
+        self.blocks: List[Tuple[str, Tuple[str, ...]]] = []
+
+        unknown = set()
+        pending: List[str] = []
+        for line in template.strip('\n').split('\n'):
+            fields = [field for _, field, _, _ in Formatter().parse(line) if field is not None]
+            unknown.update(f for f in fields if f not in TEMPLATE_FIELDS)
+
+            optional = tuple(f for f in fields if f in OPTIONAL_FIELDS)
+            if optional:
+                if pending:
+                    self.blocks.append(('\n'.join(pending), ()))
+                    pending = []
+                self.blocks.append((line, optional))
+            else:
+                pending.append(line)
+        if pending:
+            self.blocks.append(('\n'.join(pending), ()))
+
+        if unknown:
+            raise ValueError(f"Campi sconosciuti nel template: {', '.join(sorted(unknown))}")
+
+    def render(self, values: Dict) -> str:
+        out = []
+        for fmt, optional in self.blocks:
+            if optional and all(values.get(field) is None for field in optional):
+                continue
+            out.append(fmt.format_map(values))
+        return '\n'.join(out)
+
+
+def template_values(deal: Dict, score_data: Optional[Dict], tags: List[str]) -> Dict:
+    """Valori di un'offerta per POST_TEMPLATE"""
+    return {
+        'discount_percent': deal['discount_percent'],
+        'game_title': deal['title'],
+        'platform': deal.get('platform', ''),
+        'original_price': deal['original_price'],
+        'discounted_price': deal['discounted_price'],
+        'savings': f"{deal['original_price'] - deal['discounted_price']:.2f}",
+        'metacritic': deal.get('metacritic_score') or None,
+        'year': deal.get('release_year'),
+        'genre': deal.get('genre'),
+        'tags': ' '.join(tags),
+        'source': deal.get('source'),
+        'brislyscore': score_data['score'] if score_data else None,
+        'tier': score_data['tier'].replace('_', ' ') if score_data else None,
+    }
+
+
+class MessageRenderer:
+    """Cache LRU di (testo, tastiera) per impronta offerta + versione template"""
+
+    def __init__(self, poster, template: Optional[str] = None, max_size: int = 2048):
+        """
+        Args:
+            poster: TelegramPoster (formattazione, tag e tastiera)
+            template: Template stile POST_TEMPLATE (None = formato standard)
+            max_size: Messaggi massimi in cache
+        """
+        self.poster = poster
+        self.compiled = CompiledTemplate(template) if template else None
+        self.max_size = max_size
+
+        template_id = zlib.crc32(template.encode()) if template else 0
+        self.version = f"{TEMPLATE_VERSION}:{template_id:08x}"
+
+        self._cache: 'OrderedDict[str, Rendered]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, deal: Dict, score_data: Optional[Dict] = None) -> Rendered:
+        """
+        Messaggio e tastiera di un'offerta (dalla cache se già renderizzati)
+
+        Returns:
+            (testo, InlineKeyboardMarkup)
+        """
+        key = f"{self.version}:{deal_fingerprint(deal, score_data)}"
+        rendered = self._cache.get(key)
+        if rendered is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return rendered
+
+        self.misses += 1
+        if self.compiled:
+            tags = self.poster._generate_tags(deal)
+            text = self.compiled.render(template_values(deal, score_data, tags))
+        else:
+            text = self.poster.format_deal_message(deal, score_data)
+        rendered = (text, self.poster.create_keyboard(deal))
+
+        self._cache[key] = rendered
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return rendered
+
+    def prerender(self, deals: List[Dict]) -> int:
+        """Renderizza in anticipo le offerte selezionate"""
+        for deal in deals:
+            self.render(deal, deal.get('brislyscore_data'))
+        return len(deals)
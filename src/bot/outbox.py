@@ -0,0 +1,304 @@
+"""
+Deal Outbox
+Coda persistente dei post da pubblicare, sicura in caso di crash
+
+Flusso:
+1. enqueue(): le offerte selezionate entrano nell'outbox con una chiave di
+   idempotenza (ID canonico del prodotto); doppioni e già postate sono ignorati
+2. drain()/run(): il sender sposta una chiave pending → processing, pubblica,
+   e in un'unica transazione MULTI/EXEC marca l'offerta come postata (con
+   message_id), aggiorna le statistiche e rimuove la chiave dall'outbox
+3. recover(): all'avvio le chiavi rimaste in processing tornano in coda,
+   a meno che l'offerta risulti già postata
+
+I digest sono un solo item (chiave digest:<hash delle offerte>) con tutte
+le offerte del messaggio: il commit li marca tutte con lo stesso message_id.
+
+L'unica finestra residua è tra l'accettazione del messaggio da parte di
+Telegram e il commit della transazione.
+"""
+
+import json
+import hashlib
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from database.redis_client import RedisClient
+
+logger = logging.getLogger(__name__)
+
+
+class DealOutbox:
+    """Outbox persistente su Redis per la pubblicazione sul canale"""
+
+    def __init__(self, db: RedisClient, poster, max_attempts: int = 3):
+        """
+        Args:
+            db: Client database
+            poster: TelegramPoster usato per pubblicare
+            max_attempts: Tentativi prima di spostare il post nella dead letter
+        """
+        self.db = db
+        self.poster = poster
+        self.max_attempts = max_attempts
+
+        self.items_key = f"{db.prefix}outbox:items"
+        self.pending_key = f"{db.prefix}outbox:pending"
+        self.processing_key = f"{db.prefix}outbox:processing"
+        self.dead_key = f"{db.prefix}outbox:dead"
+
+        self._wakeup = asyncio.Event()
+        # Loop del sender: enqueue() può girare in asyncio.to_thread
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._recovered = False
+
+    # ==========================================
+    # ACCODAMENTO
+    # ==========================================
+
+    def enqueue(self, deals: List[Dict]) -> int:
+        """
+        Aggiunge offerte all'outbox
+
+        Args:
+            deals: Offerte selezionate (con 'brislyscore_data')
+
+        Returns:
+            Numero di offerte effettivamente accodate
+        """
+        added = 0
+        for deal in deals:
+            key = self.db._generate_deal_id(deal)
+            if self.db.is_deal_posted(key):
+                continue
+
+            payload = json.dumps({
+                'deal': deal,
+                'enqueued_at': datetime.now().isoformat(),
+                'attempts': 0,
+            })
+            # HSETNX = chiave di idempotenza: la stessa offerta entra una volta sola
+            if not self.db.client.hsetnx(self.items_key, key, payload):
+                continue
+            self.db.client.lpush(self.pending_key, key)
+            added += 1
+
+        if added:
+            logger.info(f"📥 Outbox: {added} offerte accodate")
+            self._notify()
+        return added
+
+    def enqueue_digest(self, deals: List[Dict]) -> bool:
+        """
+        Aggiunge un digest all'outbox (un item per messaggio)
+
+        Args:
+            deals: Offerte del digest, già impacchettate e ordinate
+
+        Returns:
+            True se il digest è stato accodato
+        """
+        ids = sorted(self.db._generate_deal_id(deal) for deal in deals)
+        if not ids:
+            return False
+        key = f"digest:{hashlib.sha1('|'.join(ids).encode()).hexdigest()[:16]}"
+
+        payload = json.dumps({
+            'digest': deals,
+            'enqueued_at': datetime.now().isoformat(),
+            'attempts': 0,
+        })
+        if not self.db.client.hsetnx(self.items_key, key, payload):
+            return False
+        self.db.client.lpush(self.pending_key, key)
+
+        logger.info(f"📥 Outbox: digest di {len(deals)} offerte accodato")
+        self._notify()
+        return True
+
+    def _notify(self):
+        """Sveglia il sender (asyncio.Event non è thread-safe)"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        else:
+            self._wakeup.set()
+
+    def pending_count(self) -> int:
+        """Offerte in attesa di pubblicazione (pending + processing)"""
+        return self.db.client.llen(self.pending_key) + self.db.client.llen(self.processing_key)
+
+    # ==========================================
+    # RECUPERO DOPO CRASH
+    # ==========================================
+
+    def recover(self) -> int:
+        """
+        Rimette in coda le chiavi rimaste in processing e gli item orfani
+
+        Returns:
+            Numero di chiavi ripristinate
+        """
+        restored = 0
+
+        # Chiavi lasciate in processing da un crash
+        while True:
+            key = self.db.client.rpoplpush(self.processing_key, self.pending_key)
+            if key is None:
+                break
+            restored += 1
+
+        # Item senza chiave in coda (crash tra HSETNX e LPUSH)
+        queued = set(self.db.client.lrange(self.pending_key, 0, -1))
+        for key in self.db.client.hkeys(self.items_key):
+            if key not in queued:
+                self.db.client.lpush(self.pending_key, key)
+                restored += 1
+
+        self._recovered = True
+        if restored:
+            logger.info(f"♻️ Outbox: {restored} post ripristinati dopo il riavvio")
+        return restored
+
+    # ==========================================
+    # INVIO
+    # ==========================================
+
+    async def drain(self) -> int:
+        """
+        Pubblica tutto ciò che è in coda in questo momento
+        (i post falliti e rimessi in coda aspettano il giro successivo)
+
+        Returns:
+            Numero di post pubblicati
+        """
+        if not self._recovered:
+            self.recover()
+
+        published = 0
+        for _ in range(self.db.client.llen(self.pending_key)):
+            key = self.db.client.rpoplpush(self.pending_key, self.processing_key)
+            if key is None:
+                break
+            if await self._process(key):
+                published += 1
+        return published
+
+    async def run(self, stop: asyncio.Event, poll_seconds: float = 30):
+        """
+        Sender in background: svuota l'outbox quando arrivano nuovi post
+
+        Args:
+            stop: Evento di arresto
+            poll_seconds: Controllo periodico anche senza notifiche
+        """
+        logger.info("📮 Sender outbox avviato")
+        self._loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            self._wakeup.clear()
+            try:
+                await self.drain()
+            except Exception as e:
+                logger.error(f"❌ Errore sender outbox: {e}")
+
+            wakeup = asyncio.create_task(self._wakeup.wait())
+            stopped = asyncio.create_task(stop.wait())
+            await asyncio.wait(
+                {wakeup, stopped},
+                timeout=poll_seconds,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            wakeup.cancel()
+            stopped.cancel()
+        logger.info("📮 Sender outbox fermato")
+
+    async def _process(self, key: str) -> bool:
+        """Pubblica un singolo post e ne fa il commit atomico"""
+        raw = self.db.client.hget(self.items_key, key)
+        if raw is None:
+            self.db.client.lrem(self.processing_key, 1, key)
+            return False
+
+        item = json.loads(raw)
+        if 'digest' in item:
+            return await self._process_digest(key, item)
+        deal = item['deal']
+
+        # Già postata (es. crash dopo il commit di un altro processo)
+        if self.db.is_deal_posted(key):
+            self._discard(key)
+            return False
+
+        message_id, media = await self.poster.publish_deal_media(deal, deal.get('brislyscore_data'))
+
+        if message_id is None:
+            self._failed(key, item)
+            return False
+
+        # Commit: postata + message_id + post attivo + stats + rimozione dall'outbox
+        pipe = self.db.pipeline()
+        self.db.mark_deal_posted(deal, message_id, pipe=pipe)
+        self.db.track_live_post(deal, message_id, media=media, pipe=pipe)
+        self.db.increment_stat('total_posts', pipe=pipe)
+        self.db.increment_stat(f"posts_{deal['source']}", pipe=pipe)
+        pipe.lrem(self.processing_key, 1, key)
+        pipe.hdel(self.items_key, key)
+        pipe.execute()
+
+        logger.info(f"✅ Outbox: pubblicata {deal['title']} (message_id {message_id})")
+        return True
+
+    async def _process_digest(self, key: str, item: Dict) -> bool:
+        """Pubblica un digest e marca tutte le sue offerte nello stesso commit"""
+        # Offerte postate nel frattempo (es. da un altro processo) escono dal digest
+        deals = [deal for deal in item['digest']
+                 if not self.db.is_deal_posted(self.db._generate_deal_id(deal))]
+        if not deals:
+            self._discard(key)
+            return False
+
+        message_id, included = await self.poster.publish_digest(deals, len(deals))
+
+        if message_id is None:
+            self._failed(key, item)
+            return False
+
+        pipe = self.db.pipeline()
+        self.db.mark_digest_posted(included, message_id, pipe=pipe)
+        pipe.lrem(self.processing_key, 1, key)
+        pipe.hdel(self.items_key, key)
+        pipe.execute()
+
+        logger.info(f"✅ Outbox: pubblicato digest di {len(included)} offerte (message_id {message_id})")
+        return True
+
+    @staticmethod
+    def _describe(item: Dict) -> str:
+        if 'digest' in item:
+            return f"digest di {len(item['digest'])} offerte"
+        return item['deal']['title']
+
+    def _discard(self, key: str):
+        pipe = self.db.client.pipeline(transaction=True)
+        pipe.lrem(self.processing_key, 1, key)
+        pipe.hdel(self.items_key, key)
+        pipe.execute()
+
+    def _failed(self, key: str, item: Dict):
+        """Ritenta più tardi o sposta nella dead letter"""
+        item['attempts'] += 1
+        pipe = self.db.client.pipeline(transaction=True)
+        pipe.lrem(self.processing_key, 1, key)
+
+        if item['attempts'] >= self.max_attempts:
+            logger.error(f"💀 Outbox: {self._describe(item)} scartata dopo {item['attempts']} tentativi")
+            pipe.hdel(self.items_key, key)
+            pipe.lpush(self.dead_key, json.dumps(item))
+        else:
+            logger.warning(f"🔁 Outbox: {self._describe(item)} ritentata più tardi "
+                           f"({item['attempts']}/{self.max_attempts})")
+            pipe.hset(self.items_key, key, json.dumps(item))
+            # In fondo alla coda: le altre offerte non restano bloccate
+            pipe.lpush(self.pending_key, key)
+        pipe.execute()
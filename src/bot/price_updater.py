@@ -0,0 +1,147 @@
+"""
+Price Updater
+Aggiorna i post già pubblicati invece di ripubblicarli
+
+A ogni ingest le offerte appena raccolte vengono confrontate con i post
+attivi (ultimi 7 giorni): si rigenera il messaggio con i dati nuovi e
+- se cambia il testo (prezzo, sconto, store migliore) → edit del messaggio
+- se cambia solo la tastiera (prezzi alternativi) → edit della tastiera
+- se l'offerta non è più scontata, o manca da troppi ingest → post scaduto
+Le modifiche passano dalla coda di invio, quindi rispettano i limiti del canale.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List
+
+from database.redis_client import RedisClient, LIVE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class PriceUpdater:
+    """Confronta scraping e post attivi e modifica i messaggi cambiati"""
+
+    def __init__(self, db: RedisClient, poster, misses_to_expire: int = 6):
+        """
+        Args:
+            db: Client database
+            poster: TelegramPoster usato per le modifiche
+            misses_to_expire: Ingest consecutivi senza l'offerta prima di
+                              considerarla scaduta (gli scraper leggono solo
+                              le prime pagine, un'assenza singola non basta)
+        """
+        self.db = db
+        self.poster = poster
+        self.misses_to_expire = misses_to_expire
+
+    def _is_expired(self, deal: Dict) -> bool:
+        """Offerta presente ma non più scontata"""
+        return (
+            deal.get('discount_percent', 0) <= 0
+            or deal.get('discounted_price', 0) >= deal.get('original_price', 0)
+        )
+
+    async def apply(self, fresh_deals: List[Dict]) -> Dict[str, int]:
+        """
+        Applica le modifiche ai post attivi
+
+        Args:
+            fresh_deals: Offerte dell'ultimo ingest (unite e valutate, non filtrate)
+
+        Returns:
+            Conteggi {'edited', 'keyboard', 'expired', 'failed'}
+        """
+        stats = {'edited': 0, 'keyboard': 0, 'expired': 0, 'failed': 0}
+        # Scraping fallito: nessun confronto (non deve far scadere tutti i post)
+        if not fresh_deals:
+            return stats
+
+        # Redis sincrono fuori dal loop: gli altri job non restano fermi
+        live = await asyncio.to_thread(self.db.get_live_posts)
+        if not live:
+            return stats
+
+        fresh = {deal.get('product_id') or self.db._generate_deal_id(deal): deal
+                 for deal in fresh_deals}
+        cutoff = datetime.now() - LIVE_TTL
+
+        changed: Dict[str, Dict] = {}
+        removed: List[str] = []
+        jobs = []
+
+        for deal_id, entry in live.items():
+            if datetime.fromisoformat(entry['posted_at']) < cutoff:
+                removed.append(deal_id)
+                continue
+
+            old = entry['deal']
+            new = fresh.get(deal_id)
+
+            if new is None:
+                entry['misses'] += 1
+                if entry['misses'] >= self.misses_to_expire:
+                    jobs.append(('expired', deal_id, entry, old))
+                else:
+                    changed[deal_id] = entry
+                continue
+
+            if entry['misses']:
+                entry['misses'] = 0
+                changed[deal_id] = entry
+
+            if self._is_expired(new):
+                jobs.append(('expired', deal_id, entry, old))
+                continue
+
+            old_text, old_keyboard = self.poster.renderer.render(old, old.get('brislyscore_data'))
+            new_text, new_keyboard = self.poster.renderer.render(new, new.get('brislyscore_data'))
+            if new_text != old_text:
+                jobs.append(('edited', deal_id, entry, new))
+            elif new_keyboard.to_dict() != old_keyboard.to_dict():
+                jobs.append(('keyboard', deal_id, entry, new))
+
+        results = await asyncio.gather(*(self._run(kind, entry, deal) for kind, _, entry, deal in jobs))
+
+        for (kind, deal_id, entry, deal), ok in zip(jobs, results):
+            if not ok:
+                stats['failed'] += 1
+                continue
+            stats[kind] += 1
+            if kind == 'expired':
+                removed.append(deal_id)
+                changed.pop(deal_id, None)
+            else:
+                entry['deal'] = deal
+                changed[deal_id] = entry
+
+        await asyncio.to_thread(self.db.save_live_posts, changed, removed)
+
+        expired = [(entry, deal) for (kind, _, entry, deal), ok in zip(jobs, results)
+                   if ok and kind == 'expired']
+        if expired and self.db.events:
+            await asyncio.to_thread(self._publish_expired, expired)
+
+        if jobs:
+            logger.info(f"✏️ Aggiornamento post: {stats['edited']} prezzi, {stats['keyboard']} tastiere, "
+                        f"{stats['expired']} scaduti, {stats['failed']} errori")
+        return stats
+
+    def _publish_expired(self, expired: List):
+        """Eventi 'expired' dei post scaduti (una pipeline)"""
+        pipe = self.db.client.pipeline(transaction=False)
+        for entry, deal in expired:
+            self.db.events.publish('expired', [deal], pipe=pipe, channel=self.db.prefix,
+                                   message_id=entry['message_id'])
+        pipe.execute()
+
+    async def _run(self, kind: str, entry: Dict, deal: Dict) -> bool:
+        score_data = deal.get('brislyscore_data')
+        message_id = entry['message_id']
+        # Formato del post originale (i post attivi più vecchi lo hanno sull'offerta)
+        media = entry.get('media') or entry['deal'].get('media') or 'text'
+        if kind == 'expired':
+            return await self.poster.expire_deal(message_id, deal, score_data, media=media)
+        return await self.poster.edit_deal(message_id, deal, score_data,
+                                           keyboard_only=(kind == 'keyboard'), media=media)
@@ -0,0 +1,153 @@
+"""
+Ready Buffer
+Buffer delle offerte già raccolte, valutate e filtrate, pronte per il posting
+
+Lo scraping gira in background ogni SCRAPING_INTERVAL_MINUTES e sostituisce
+il contenuto del buffer; agli orari di posting basta prendere le offerte
+con BrislyScore più alto, senza attendere scraping e scoring.
+
+Il buffer vive in memoria (percorso caldo) ed è replicato su Redis
+(sorted set score + hash offerte) per ripartire subito dopo un riavvio.
+"""
+
+import json
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+from database.redis_client import RedisClient
+
+logger = logging.getLogger(__name__)
+
+
+class ReadyBuffer:
+    """Offerte pronte da postare, ordinate per BrislyScore"""
+
+    def __init__(self, db: RedisClient, max_age: float = 3 * 3600):
+        """
+        Args:
+            db: Client database
+            max_age: Secondi oltre i quali il buffer è considerato scaduto
+                     (prezzi potenzialmente cambiati)
+        """
+        self.db = db
+        self.max_age = max_age
+
+        self.scores_key = f"{db.prefix}ready:scores"
+        self.items_key = f"{db.prefix}ready:items"
+        self.meta_key = f"{db.prefix}ready:meta"
+
+        self._deals: Dict[str, Dict] = {}
+        self._refreshed_at = 0.0
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._deals) if self.is_fresh() else 0
+
+    def is_fresh(self) -> bool:
+        """True se l'ultimo ingest è abbastanza recente"""
+        return time.time() - self._refreshed_at < self.max_age
+
+    # ==========================================
+    # PERSISTENZA
+    # ==========================================
+
+    def load(self):
+        """Ripristina il buffer da Redis (es. dopo un riavvio)"""
+        try:
+            refreshed_at = self.db.client.hget(self.meta_key, 'refreshed_at')
+            if refreshed_at is None:
+                return
+            self._refreshed_at = float(refreshed_at)
+            self._deals = {
+                key: json.loads(raw)
+                for key, raw in self.db.client.hgetall(self.items_key).items()
+            }
+            if self._deals and self.is_fresh():
+                logger.info(f"📦 Buffer ripristinato: {len(self._deals)} offerte pronte")
+        except Exception as e:
+            logger.error(f"❌ Errore caricamento buffer: {e}")
+
+    def refresh(self, deals: List[Dict]):
+        """
+        Sostituisce il buffer con il risultato dell'ultimo ingest
+
+        Args:
+            deals: Offerte filtrate, con 'brislyscore' e 'product_id'
+        """
+        fresh: Dict[str, Dict] = {}
+        for deal in deals:
+            key = deal.get('product_id') or self.db._generate_deal_id(deal)
+            # Dedup: per lo stesso prodotto resta lo score più alto
+            if key not in fresh or deal['brislyscore'] > fresh[key]['brislyscore']:
+                fresh[key] = deal
+
+        now = time.time()
+        pipe = self.db.client.pipeline(transaction=True)
+        pipe.delete(self.scores_key, self.items_key)
+        if fresh:
+            pipe.zadd(self.scores_key, {key: deal['brislyscore'] for key, deal in fresh.items()})
+            pipe.hset(self.items_key, mapping={key: json.dumps(deal) for key, deal in fresh.items()})
+        pipe.hset(self.meta_key, 'refreshed_at', now)
+        for key in (self.scores_key, self.items_key, self.meta_key):
+            pipe.expire(key, int(self.max_age))
+        pipe.execute()
+
+        self._deals = fresh
+        self._refreshed_at = now
+        logger.info(f"📦 Buffer aggiornato: {len(fresh)} offerte pronte")
+
+    # ==========================================
+    # PRELIEVO
+    # ==========================================
+
+    def pop_best(self, count: int, skip: Optional[Callable[[str], bool]] = None) -> List[Dict]:
+        """
+        Preleva le migliori offerte dal buffer
+
+        Args:
+            count: Numero massimo di offerte
+            skip: Filtro opzionale sulla chiave (es. già postata nel frattempo)
+
+        Returns:
+            Offerte ordinate per BrislyScore decrescente
+        """
+        if count <= 0 or not self.is_fresh():
+            return []
+
+        ranked = sorted(self._deals, key=lambda k: self._deals[k]['brislyscore'], reverse=True)
+        taken, dropped = [], []
+        for key in ranked:
+            if len(taken) >= count:
+                break
+            dropped.append(key)
+            if skip and skip(key):
+                continue
+            taken.append(self._deals[key])
+
+        if dropped:
+            for key in dropped:
+                self._deals.pop(key, None)
+            pipe = self.db.client.pipeline(transaction=True)
+            pipe.zrem(self.scores_key, *dropped)
+            pipe.hdel(self.items_key, *dropped)
+            pipe.execute()
+
+        return taken
+
+    def put_back(self, deals: List[Dict]):
+        """
+        Rimette nel buffer offerte prelevate ma non pubblicate
+
+        Args:
+            deals: Offerte restituite (es. escluse da un digest pieno)
+        """
+        if not deals or not self.is_fresh():
+            return
+
+        returned = {deal.get('product_id') or self.db._generate_deal_id(deal): deal for deal in deals}
+        self._deals.update(returned)
+        pipe = self.db.client.pipeline(transaction=True)
+        pipe.zadd(self.scores_key, {key: deal['brislyscore'] for key, deal in returned.items()})
+        pipe.hset(self.items_key, mapping={key: json.dumps(deal) for key, deal in returned.items()})
+        pipe.execute()
@@ -0,0 +1,249 @@
+"""
+Send Queue
+Coda di invio verso Telegram con rate limiting a token bucket
+
+- Limite globale del bot (~30 messaggi/secondo)
+- Limite per chat: canali/gruppi ~20 messaggi/minuto, chat private ~1/secondo
+- RetryAfter rispettato esattamente, errori transitori ritentati con backoff
+- Ogni chat ha il suo worker: più chat si svuotano in parallelo
+"""
+
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Deque, Dict, Union
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+logger = logging.getLogger(__name__)
+
+ChatId = Union[int, str]
+
+
+class TokenBucket:
+    """Token bucket asincrono"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Token ricaricati al secondo
+            capacity: Token massimi (burst)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Attende finché un token è disponibile e lo consuma"""
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def idle_in(self) -> float:
+        """Secondi prima che il bucket torni pieno e sbloccato (<= 0 = inattivo)"""
+        now = time.monotonic()
+        tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        return max(self.blocked_until - now, (self.capacity - tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Blocca il bucket (es. dopo un RetryAfter) e ne azzera i token"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class _Job:
+    """Invio in coda"""
+
+    __slots__ = ('send', 'future', 'attempts', 'description')
+
+    def __init__(self, send: Callable[[], Awaitable], future: asyncio.Future, description: str):
+        self.send = send
+        self.future = future
+        self.attempts = 0
+        self.description = description
+
+
+def _retry_seconds(error: RetryAfter) -> float:
+    value = error.retry_after
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value)
+
+
+class SendQueue:
+    """Coda di invio con limiti per chat e globali"""
+
+    def __init__(
+        self,
+        global_per_second: float = 30,
+        group_per_minute: float = 20,
+        private_per_second: float = 1,
+        max_retries: int = 5,
+        base_backoff: float = 1.0,
+    ):
+        """
+        Args:
+            global_per_second: Messaggi/secondo totali del bot
+            group_per_minute: Messaggi/minuto per canale o gruppo
+            private_per_second: Messaggi/secondo per chat privata
+            max_retries: Tentativi massimi per errori transitori
+            base_backoff: Secondi del primo backoff (poi esponenziale)
+        """
+        self.global_bucket = TokenBucket(global_per_second, global_per_second)
+        self.group_per_minute = group_per_minute
+        self.private_per_second = private_per_second
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+
+        self._queues: Dict[ChatId, Deque[_Job]] = {}
+        self._buckets: Dict[ChatId, TokenBucket] = {}
+        self._workers: Dict[ChatId, asyncio.Task] = {}
+
+        self.stats = {'sent': 0, 'failed': 0, 'retry_after': 0, 'retries': 0}
+
+    def _chat_bucket(self, chat_id: ChatId) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            # ID positivi = chat private; canali/gruppi hanno ID negativi o @username
+            is_private = isinstance(chat_id, int) and chat_id > 0
+            if is_private:
+                bucket = TokenBucket(self.private_per_second, 1)
+            else:
+                bucket = TokenBucket(self.group_per_minute / 60, min(3, self.group_per_minute))
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def submit_nowait(self, chat_id: ChatId, send: Callable[[], Awaitable],
+                      description: str = '') -> asyncio.Future:
+        """
+        Accoda un invio senza attendere
+
+        Args:
+            chat_id: Chat di destinazione (per il limite per-chat)
+            send: Funzione che ritorna la coroutine di invio (rieseguibile)
+            description: Testo per i log
+
+        Returns:
+            Future con il risultato dell'invio
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(chat_id, deque()).append(_Job(send, future, description))
+
+        worker = self._workers.get(chat_id)
+        if worker is None or worker.done():
+            self._workers[chat_id] = asyncio.create_task(self._drain(chat_id))
+        return future
+
+    async def submit(self, chat_id: ChatId, send: Callable[[], Awaitable],
+                     description: str = '') -> Any:
+        """Accoda un invio e ne attende il risultato (solleva l'ultimo errore)"""
+        return await self.submit_nowait(chat_id, send, description)
+
+    async def join(self):
+        """Attende lo svuotamento di tutte le code"""
+        while self._workers:
+            workers = [w for w in self._workers.values() if not w.done()]
+            if not workers:
+                break
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def pending(self) -> int:
+        """Invii ancora in coda"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def _drain(self, chat_id: ChatId):
+        """Worker di una chat: invia in ordine FIFO rispettando i limiti"""
+        queue = self._queues[chat_id]
+        bucket = self._chat_bucket(chat_id)
+
+        while queue:
+            job = queue[0]
+            if job.future.cancelled():
+                queue.popleft()
+                continue
+
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+
+            try:
+                result = await job.send()
+            except RetryAfter as e:
+                # Flood wait: aspetta esattamente quanto chiesto e riprova lo stesso job
+                wait = _retry_seconds(e)
+                self.stats['retry_after'] += 1
+                logger.warning(f"⏳ Flood wait {wait}s su {chat_id} ({job.description})")
+                bucket.pause(wait)
+                continue
+            except (BadRequest, Forbidden) as e:
+                # Errori definitivi: inutile riprovare
+                queue.popleft()
+                self.stats['failed'] += 1
+                if not job.future.cancelled():
+                    job.future.set_exception(e)
+                continue
+            except (TimedOut, NetworkError) as e:
+                job.attempts += 1
+                if job.attempts > self.max_retries:
+                    queue.popleft()
+                    self.stats['failed'] += 1
+                    if not job.future.cancelled():
+                        job.future.set_exception(e)
+                    continue
+                delay = self.base_backoff * 2 ** (job.attempts - 1) * (1 + random.random() / 2)
+                self.stats['retries'] += 1
+                logger.warning(f"🔁 Retry {job.attempts}/{self.max_retries} tra {delay:.1f}s "
+                               f"({job.description}): {e}")
+                await asyncio.sleep(delay)
+                continue
+            except Exception as e:
+                queue.popleft()
+                self.stats['failed'] += 1
+                if not job.future.cancelled():
+                    job.future.set_exception(e)
+                continue
+
+            queue.popleft()
+            self.stats['sent'] += 1
+            if not job.future.cancelled():
+                job.future.set_result(result)
+
+        self._workers.pop(chat_id, None)
+        self._release(chat_id)
+
+    def _release(self, chat_id: ChatId):
+        """
+        Libera coda e bucket di una chat inattiva
+
+        Il fan-out scrive a migliaia di chat private: senza pulizia i
+        dizionari crescerebbero per tutta la vita del processo. Il bucket
+        resta finché non torna pieno, così il limite per chat vale anche
+        per un invio subito successivo.
+        """
+        if chat_id in self._workers or self._queues.get(chat_id):
+            return
+        self._queues.pop(chat_id, None)
+
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            return
+        wait = bucket.idle_in()
+        if wait <= 0:
+            del self._buckets[chat_id]
+        else:
+            asyncio.get_running_loop().call_later(wait, self._release, chat_id)
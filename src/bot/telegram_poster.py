@@ -4,29 +4,136 @@ Gestisce l'invio dei post al canale Telegram
 """
 
 import os
+import copy
+import sys
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import asyncio
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
 from telegram.constants import ParseMode
-from telegram.error import TelegramError
+from telegram.error import BadRequest, TelegramError
+from telegram.request import HTTPXRequest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.send_queue import SendQueue
+from bot.message_renderer import MessageRenderer, load_settings_template
+from bot.banner_renderer import BannerRenderer, render_collage
+from bot.click_tracker import ClickLinks
+from utils.canonical import normalize_platform, normalize_title
 
 logger = logging.getLogger(__name__)
 
+# Limiti Telegram: testo di un messaggio e didascalia di una foto
+MESSAGE_LIMIT = 4096
+CAPTION_LIMIT = 1024
+
+# Digest: intestazione, chiusura e lunghezza massima del testo dei pulsanti
+DIGEST_HEADER = "🔥 *LE MIGLIORI OFFERTE* 🔥\n\n"
+DIGEST_FOOTER = "⚡ *OFFERTE LIMITATE* ⚡"
+DIGEST_BUTTON_TITLE = 22
+
+# Intestazione dei post di offerte non più disponibili
+EXPIRED_HEADER = "❌ *OFFERTA SCADUTA*\n\n"
+
+# Recap settimanale: intestazione e offerte in classifica
+RECAP_HEADER = "📊 *RECAP SETTIMANALE* 📊\n"
+RECAP_TOP = 5
+
+# Nomi visualizzati delle fonti
+SOURCE_NAMES = {
+    'instant_gaming': 'INSTANT GAMING',
+    'gamivo': 'GAMIVO',
+}
+
 class TelegramPoster:
     """Gestisce posting su Telegram"""
     
-    def __init__(self):
+    def __init__(self, db=None):
+        """
+        Args:
+            db: RedisClient (necessario per i banner, POST_BANNERS=true)
+        """
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.channel_id = os.getenv('TELEGRAM_CHANNEL_ID', '@BrislyDealsGaming')
         
         if not self.bot_token:
             raise ValueError("❌ TELEGRAM_BOT_TOKEN non configurato!")
             
-        self.bot = Bot(token=self.bot_token)
+        # Pool HTTP condiviso: le connessioni TLS restano aperte tra un invio e l'altro.
+        # TELEGRAM_API_BASE_URL punta a un Bot API alternativo (es. fake_bot_api.py)
+        base_url = os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org/bot')
+        self.bot = Bot(
+            token=self.bot_token,
+            base_url=base_url,
+            base_file_url=base_url.replace('/bot', '/file/bot', 1),
+            request=HTTPXRequest(
+                connection_pool_size=int(os.getenv('TELEGRAM_POOL_SIZE', '8')),
+                connect_timeout=10.0,
+                read_timeout=15.0,
+                write_timeout=15.0,
+                pool_timeout=5.0,
+            )
+        )
+        self._started = False
+        
+        # Coda di invio con i limiti di Telegram (sostituisce i sleep fissi)
+        self.queue = SendQueue(
+            global_per_second=float(os.getenv('TELEGRAM_GLOBAL_PER_SECOND', '30')),
+            group_per_minute=float(os.getenv('TELEGRAM_CHANNEL_PER_MINUTE', '20')),
+            private_per_second=float(os.getenv('TELEGRAM_PRIVATE_PER_SECOND', '1')),
+        )
+        
+        # Cache dei messaggi renderizzati (MESSAGE_TEMPLATE=settings usa POST_TEMPLATE)
+        template = load_settings_template() if os.getenv('MESSAGE_TEMPLATE') == 'settings' else None
+        self.renderer = MessageRenderer(self, template)
+        
+        # Banner grafici (cache file_id/disco/Redis, render in un pool di processi)
+        self.banners = None
+        if db is not None and os.getenv('POST_BANNERS', 'false').lower() == 'true':
+            self.banners = BannerRenderer(
+                db,
+                cache_dir=os.getenv('BANNER_CACHE_DIR', 'data/banners'),
+                workers=int(os.getenv('BANNER_WORKERS', '0')) or None,
+                source_names=SOURCE_NAMES
+            )
+        
+        # Link tracciati per il CTR (CLICK_TRACKER_URL, vedi click_tracker.py)
+        self.db = db
+        self.links = ClickLinks.from_env()
         logger.info(f"✅ TelegramPoster inizializzato per {self.channel_id}")
     
+    def for_channel(self, channel_id: str) -> 'TelegramPoster':
+        """
+        Poster per un altro canale
+        
+        Condivide Bot, coda di invio (i limiti di Telegram sono per bot),
+        renderer e banner; start/stop vanno chiamati sul poster originale.
+        """
+        if channel_id == self.channel_id:
+            return self
+        poster = copy.copy(self)
+        poster.channel_id = channel_id
+        return poster
+    
+    async def start(self):
+        """Inizializza il Bot una volta sola (da chiamare nel loop persistente)"""
+        if not self._started:
+            await self.bot.initialize()
+            self._started = True
+            logger.info(f"🔌 Bot inizializzato: @{self.bot.username}")
+    
+    async def stop(self):
+        """Svuota la coda di invio e chiude il pool HTTP"""
+        await self.queue.join()
+        if self.banners:
+            await self.banners.aclose()
+        if self._started:
+            await self.bot.shutdown()
+            self._started = False
+            logger.info("🔌 Bot chiuso")
+    
     def format_deal_message(self, deal: Dict, score_data: Dict = None) -> str:
         """
         Formatta il messaggio per un'offerta
@@ -42,49 +149,54 @@ class TelegramPoster:
         source_emoji = "🎮" if deal['source'] == 'instant_gaming' else "🌐"
         
         # Titolo e sconto
-        message = f"{source_emoji} *{deal['discount_percent']}% DI SCONTO* {source_emoji}\n"
-        message += f"*{deal['title']}* - {deal['platform']}\n\n"
+        parts = [
+            f"{source_emoji} *{deal['discount_percent']}% DI SCONTO* {source_emoji}\n",
+            f"*{deal['title']}* - {deal['platform']}\n\n",
+            # Prezzi e risparmio
+            f"💰 Era: ~{deal['original_price']}€~\n",
+            f"🎯 Ora: *{deal['discounted_price']}€*\n",
+            f"📈 Risparmi: *{deal['original_price'] - deal['discounted_price']:.2f}€*\n\n",
+        ]
         
-        # Prezzi
-        message += f"💰 Era: ~{deal['original_price']}€~\n"
-        message += f"🎯 Ora: *{deal['discounted_price']}€*\n"
-        
-        # Calcola risparmio
-        savings = deal['original_price'] - deal['discounted_price']
-        message += f"📈 Risparmi: *{savings:.2f}€*\n\n"
+        # Prezzi sugli altri store (dal merge cross-store)
+        if deal.get('alternatives'):
+            parts.append("🔁 Altri store:\n")
+            for alt in deal['alternatives'][:3]:
+                name = SOURCE_NAMES.get(alt['source'], alt['source'])
+                parts.append(f"   • {name}: {alt['price']}€\n")
+            parts.append("\n")
         
         # Metacritic se disponibile
         if deal.get('metacritic_score', 0) > 0:
-            message += f"🏆 Metacritic: {deal['metacritic_score']}/100\n"
+            parts.append(f"🏆 Metacritic: {deal['metacritic_score']}/100\n")
         
         # Anno e genere
         if deal.get('release_year'):
-            message += f"📅 Anno: {deal['release_year']}\n"
+            parts.append(f"📅 Anno: {deal['release_year']}\n")
         if deal.get('genre'):
-            message += f"🎮 Genere: {deal['genre']}\n"
+            parts.append(f"🎮 Genere: {deal['genre']}\n")
         
         # Early Access o caratteristiche speciali
         if deal.get('early_access'):
-            message += f"⚠️ *EARLY ACCESS*\n"
+            parts.append("⚠️ *EARLY ACCESS*\n")
         if deal.get('is_historical_low'):
-            message += f"🔥 *MINIMO STORICO!*\n"
+            parts.append("🔥 *MINIMO STORICO!*\n")
         
-        message += "\n"
+        parts.append("\n")
         
         # BrislyScore se disponibile
         if score_data:
-            message += f"{score_data['emoji']} *BrislyScore™: {score_data['score']}/45*\n"
-            message += f"_{score_data['tier'].replace('_', ' ')}_\n"
-            message += f"💬 {score_data['recommendation']}\n\n"
+            parts.append(f"{score_data['emoji']} *BrislyScore™: {score_data['score']}/45*\n")
+            parts.append(f"_{score_data['tier'].replace('_', ' ')}_\n")
+            parts.append(f"💬 {score_data['recommendation']}\n\n")
         
         # Tags
-        tags = self._generate_tags(deal)
-        message += f"#️⃣ {' '.join(tags)}\n\n"
+        parts.append(f"#️⃣ {' '.join(self._generate_tags(deal))}\n\n")
         
         # Footer
-        message += "⚡ *OFFERTA LIMITATA* ⚡"
+        parts.append("⚡ *OFFERTA LIMITATA* ⚡")
         
-        return message
+        return ''.join(parts)
     
     def _generate_tags(self, deal: Dict) -> List[str]:
         """Genera hashtag per il post"""
@@ -127,6 +239,16 @@ class TelegramPoster:
             
         return tags
     
+    def _link(self, url: str, deal: Dict, button: str) -> str:
+        """URL del pulsante, tramite il click tracker se configurato"""
+        if self.links is None:
+            return url
+        if self.db is not None:
+            deal_id = self.db._generate_deal_id(deal)
+        else:
+            deal_id = f"{normalize_title(deal.get('title', ''))}-{normalize_platform(deal.get('platform', ''))}"
+        return self.links.wrap(url, deal_id, button)
+    
     def create_keyboard(self, deal: Dict) -> InlineKeyboardMarkup:
         """
         Crea tastiera inline per il post
@@ -140,19 +262,30 @@ class TelegramPoster:
         keyboard = []
         
         # Prima riga - Link all'offerta
-        source_name = "INSTANT GAMING" if deal['source'] == 'instant_gaming' else "GAMIVO"
+        source_name = SOURCE_NAMES.get(deal['source'], "GAMIVO")
         keyboard.append([
             InlineKeyboardButton(
                 f"🎮 SCOPRI L'OFFERTA SU {source_name}",
-                url=deal['url']
+                url=self._link(deal['url'], deal, 'offer')
             )
         ])
         
+        # Link agli store alternativi
+        alternatives = [alt for alt in deal.get('alternatives', [])[:2] if alt.get('url')]
+        if alternatives:
+            keyboard.append([
+                InlineKeyboardButton(
+                    f"🔁 {SOURCE_NAMES.get(alt['source'], alt['source'])} {alt['price']}€",
+                    url=self._link(alt['url'], deal, f"alt_{alt['source']}")
+                )
+                for alt in alternatives
+            ])
+        
         # Seconda riga - Link BrislyDeals
         keyboard.append([
             InlineKeyboardButton(
                 "🌐 VISITA BRISLYDEALS",
-                url="https://www.brislydeals.com"
+                url=self._link("https://www.brislydeals.com", deal, 'site')
             )
         ])
         
@@ -178,61 +311,417 @@ class TelegramPoster:
         Returns:
             True se inviato con successo
         """
+        if test_mode:
+            logger.info("🧪 TEST MODE - Messaggio che verrebbe inviato:")
+            logger.info(f"\n{self.renderer.render(deal, score_data)[0]}")
+            return True
+        
+        return await self.publish_deal(deal, score_data) is not None
+    
+    async def publish_deal(self, deal: Dict, score_data: Dict = None) -> Optional[int]:
+        """
+        Invia un'offerta al canale e ritorna l'ID del messaggio
+        
+        Args:
+            deal: Dati dell'offerta
+            score_data: Dati BrislyScore (opzionale)
+            
+        Returns:
+            message_id Telegram, None se l'invio è fallito
+        """
+        message_id, _ = await self.publish_deal_media(deal, score_data)
+        return message_id
+    
+    async def publish_deal_media(self, deal: Dict,
+                                 score_data: Dict = None) -> Tuple[Optional[int], str]:
+        """
+        Come publish_deal, ma ritorna anche il tipo di messaggio inviato
+        
+        Returns:
+            (message_id o None se l'invio è fallito, 'photo' o 'text');
+            il tipo serve all'aggiornamento prezzi e va salvato col post attivo,
+            non sull'offerta (condivisa tra buffer e canali)
+        """
         try:
-            message = self.format_deal_message(deal, score_data)
-            keyboard = self.create_keyboard(deal)
+            # Dalla cache se già renderizzato alla selezione o in un tentativo precedente
+            message, keyboard = self.renderer.render(deal, score_data)
             
-            if test_mode:
-                logger.info("🧪 TEST MODE - Messaggio che verrebbe inviato:")
-                logger.info(f"\n{message}")
-                return True
+            if self.banners and len(message) <= CAPTION_LIMIT:
+                banner = await self._get_banner(deal, score_data)
+                if banner:
+                    return await self._publish_with_banner(deal, banner, message, keyboard), 'photo'
             
-            # Invia messaggio
-            result = await self.bot.send_message(
-                chat_id=self.channel_id,
-                text=message,
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=keyboard,
-                disable_web_page_preview=False
+            # Invia messaggio (rate limit, RetryAfter e retry gestiti dalla coda)
+            result = await self.queue.submit(
+                self.channel_id,
+                lambda: self.bot.send_message(
+                    chat_id=self.channel_id,
+                    text=message,
+                    parse_mode=ParseMode.MARKDOWN,
+                    reply_markup=keyboard,
+                    disable_web_page_preview=False
+                ),
+                description=deal['title']
             )
             
             logger.info(f"✅ Offerta inviata: {deal['title']} - Message ID: {result.message_id}")
-            return True
+            return result.message_id, 'text'
             
         except TelegramError as e:
             logger.error(f"❌ Errore Telegram: {e}")
-            return False
+            return None, 'text'
         except Exception as e:
             logger.error(f"❌ Errore generico: {e}")
-            return False
+            return None, 'text'
+    
+    async def _get_banner(self, deal: Dict, score_data: Optional[Dict]) -> Optional[tuple]:
+        """Banner dalla cache o appena generato (None = invio solo testo)"""
+        try:
+            return await self.banners.get(deal, score_data)
+        except Exception as e:
+            logger.warning(f"⚠️ Banner non disponibile, invio solo testo: {e}")
+            return None
+    
+    async def _publish_with_banner(self, deal: Dict, banner: tuple, message: str,
+                                   keyboard: InlineKeyboardMarkup) -> int:
+        """Invia il banner con il messaggio come didascalia"""
+        fingerprint, photo = banner
+        
+        # file_id già noto: nessun upload; altrimenti bytes (riusabili nei retry)
+        result = await self.queue.submit(
+            self.channel_id,
+            lambda: self.bot.send_photo(
+                chat_id=self.channel_id,
+                photo=photo,
+                caption=message,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=keyboard
+            ),
+            description=deal['title']
+        )
+        
+        if isinstance(photo, bytes) and result.photo:
+            await asyncio.to_thread(self.banners.remember_file_id, fingerprint,
+                                    result.photo[-1].file_id)
+        
+        logger.info(f"✅ Offerta inviata con banner: {deal['title']} - Message ID: {result.message_id}")
+        return result.message_id
+    
+    # ==========================================
+    # DIGEST (più offerte in un messaggio)
+    # ==========================================
+    
+    def format_digest_entry(self, deal: Dict, position: int) -> str:
+        """Blocco compatto di un'offerta nel digest"""
+        source = SOURCE_NAMES.get(deal['source'], deal['source'])
+        score = deal.get('brislyscore_data')
+        score_text = f" · {score['emoji']} {score['score']}" if score else ""
+        return (
+            f"{position}. *{deal['title']}* ({deal.get('platform', 'Steam')})\n"
+            f"   ~{deal['original_price']}€~ → *{deal['discounted_price']}€* "
+            f"(-{deal['discount_percent']}%) · {source}{score_text}\n\n"
+        )
+    
+    def pack_digest(self, deals: List[Dict], max_deals: int = 10, limit: int = MESSAGE_LIMIT,
+                    header: str = DIGEST_HEADER,
+                    footer: str = DIGEST_FOOTER) -> Tuple[str, InlineKeyboardMarkup, List[Dict]]:
+        """
+        Impacchetta le offerte in un messaggio (greedy per lunghezza renderizzata)
+        
+        Le offerte sono provate in ordine di ranking: se una non entra nello
+        spazio rimasto si passa alla successiva, che può essere più corta.
+        
+        Args:
+            deals: Offerte ordinate per BrislyScore
+            max_deals: Offerte massime nel digest
+            limit: Lunghezza massima del messaggio
+            header: Intestazione (anche per le risposte ai comandi del bot)
+            footer: Chiusura del messaggio
+            
+        Returns:
+            (testo, tastiera con un pulsante per offerta, offerte incluse)
+        """
+        parts = [header]
+        used = len(header) + len(footer)
+        included = []
+        
+        for deal in deals:
+            if len(included) >= max_deals:
+                break
+            entry = self.format_digest_entry(deal, len(included) + 1)
+            if used + len(entry) > limit:
+                continue
+            parts.append(entry)
+            used += len(entry)
+            included.append(deal)
+        
+        parts.append(footer)
+        
+        # Un pulsante per offerta, due per riga
+        buttons = []
+        for position, deal in enumerate(included, 1):
+            title = deal['title']
+            if len(title) > DIGEST_BUTTON_TITLE:
+                title = title[:DIGEST_BUTTON_TITLE - 1].rstrip() + '…'
+            buttons.append(InlineKeyboardButton(
+                f"{position}. {title} {deal['discounted_price']}€",
+                url=self._link(deal['url'], deal, 'digest')
+            ))
+        keyboard = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+        
+        return ''.join(parts), InlineKeyboardMarkup(keyboard), included
     
-    async def send_multiple_deals(self, deals: List[Dict], delay_seconds: int = 5) -> int:
+    async def publish_digest(self, deals: List[Dict],
+                             max_deals: int = 10) -> Tuple[Optional[int], List[Dict]]:
         """
-        Invia multiple offerte con delay
+        Pubblica un digest con le migliori offerte
         
         Args:
-            deals: Lista di offerte
-            delay_seconds: Secondi tra un post e l'altro
+            deals: Offerte ordinate per BrislyScore
+            max_deals: Offerte massime nel digest
             
         Returns:
-            Numero di offerte inviate con successo
+            (message_id o None se l'invio è fallito, offerte incluse)
         """
-        sent_count = 0
+        message, keyboard, included = self.pack_digest(deals, max_deals)
+        if not included:
+            return None, []
         
-        for i, deal in enumerate(deals, 1):
-            logger.info(f"📤 Invio offerta {i}/{len(deals)}: {deal['title']}")
+        try:
+            result = await self.queue.submit(
+                self.channel_id,
+                lambda: self.bot.send_message(
+                    chat_id=self.channel_id,
+                    text=message,
+                    parse_mode=ParseMode.MARKDOWN,
+                    reply_markup=keyboard,
+                    disable_web_page_preview=True
+                ),
+                description=f"digest di {len(included)} offerte"
+            )
+            logger.info(f"✅ Digest inviato: {len(included)} offerte - Message ID: {result.message_id}")
+            return result.message_id, included
+        
+        except TelegramError as e:
+            logger.error(f"❌ Errore Telegram (digest): {e}")
+            return None, included
+    
+    # ==========================================
+    # RECAP SETTIMANALE
+    # ==========================================
+    
+    def format_recap(self, recap: Dict, top: int = RECAP_TOP) -> str:
+        """
+        Testo del recap settimanale dagli aggregati di RedisClient.get_weekly_recap
+        
+        Args:
+            recap: Aggregati della settimana
+            top: Offerte in classifica da mostrare
+        """
+        parts = [RECAP_HEADER, f"_Settimana {recap['week']}_\n\n"]
+        
+        if recap['top'][:top]:
+            parts.append("🏆 *Migliori offerte della settimana*\n")
+            for position, entry in enumerate(recap['top'][:top], 1):
+                score = f" · {entry.get('emoji') or '⭐'} {entry['score']}" if entry.get('score') else ""
+                parts.append(
+                    f"{position}. *{entry['title']}* ({entry.get('platform') or 'Steam'}) "
+                    f"{entry['discounted_price']}€ (-{entry['discount_percent']}%){score}\n"
+                )
+            parts.append("\n")
+        
+        best = recap.get('best_discount')
+        if best:
+            parts.append(f"💥 *Sconto più alto:* {best['title']} -{best['discount_percent']}%\n")
+        if recap['sources']:
+            sources = ' · '.join(
+                f"{SOURCE_NAMES.get(source, source)} {count}"
+                for source, count in sorted(recap['sources'].items(), key=lambda item: -item[1])
+            )
+            parts.append(f"🛒 *Offerte per store:* {sources}\n")
+        parts.append(f"💰 *Risparmio totale:* {recap['savings']:.2f}€ su {recap['posts']} offerte")
+        return ''.join(parts)
+    
+    async def publish_recap(self, recap: Dict, collage: bool = False) -> Optional[int]:
+        """
+        Pubblica il recap settimanale
+        
+        Args:
+            recap: Aggregati della settimana (RedisClient.get_weekly_recap)
+            collage: Allega il collage delle migliori offerte
+            
+        Returns:
+            message_id o None se l'invio è fallito
+        """
+        entries = recap['top'][:RECAP_TOP]
+        buttons = [
+            [InlineKeyboardButton(f"{position}. {entry['title'][:DIGEST_BUTTON_TITLE]}",
+                                  url=self._link(entry['url'], entry, 'recap'))]
+            for position, entry in enumerate(entries, 1) if entry.get('url')
+        ]
+        keyboard = InlineKeyboardMarkup(buttons)
+        
+        image = None
+        if collage and entries:
+            heading = f"Settimana {recap['week']}"
+            try:
+                if self.banners:
+                    image = await self.banners.collage(recap['top'], heading)
+                else:
+                    image = await asyncio.to_thread(render_collage, recap['top'], heading)
+            except Exception as e:
+                logger.warning(f"⚠️ Collage non generato, recap solo testo: {e}")
+        
+        # Con il collage il testo diventa didascalia: meno offerte finché non entra
+        top = RECAP_TOP
+        message = self.format_recap(recap, top)
+        while image and len(message) > CAPTION_LIMIT and top > 0:
+            top -= 1
+            message = self.format_recap(recap, top)
+        
+        if image and len(message) <= CAPTION_LIMIT:
+            send = lambda: self.bot.send_photo(
+                chat_id=self.channel_id,
+                photo=image,
+                caption=message,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=keyboard
+            )
+        else:
+            message = self.format_recap(recap)
+            send = lambda: self.bot.send_message(
+                chat_id=self.channel_id,
+                text=message,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=keyboard,
+                disable_web_page_preview=True
+            )
+        
+        try:
+            result = await self.queue.submit(self.channel_id, send,
+                                             description=f"recap {recap['week']}")
+            logger.info(f"✅ Recap settimanale inviato - Message ID: {result.message_id}")
+            return result.message_id
+        except TelegramError as e:
+            logger.error(f"❌ Errore Telegram (recap): {e}")
+            return None
+    
+    # ==========================================
+    # MODIFICA POST ESISTENTI
+    # ==========================================
+    
+    async def edit_deal(self, message_id: int, deal: Dict, score_data: Dict = None,
+                        keyboard_only: bool = False, media: str = 'text') -> bool:
+        """
+        Aggiorna un post già pubblicato (prezzo cambiato)
+        
+        Args:
+            message_id: Messaggio da modificare
+            deal: Offerta aggiornata
+            score_data: Dati BrislyScore aggiornati
+            keyboard_only: Modifica solo la tastiera (testo invariato)
+            media: Tipo del post originale ('photo' se pubblicato con banner)
             
-            success = await self.send_deal(deal)
-            if success:
-                sent_count += 1
+        Returns:
+            True se il post è aggiornato (o non c'era nulla da cambiare)
+        """
+        message, keyboard = self.renderer.render(deal, score_data)
+        
+        if keyboard_only:
+            send = lambda: self.bot.edit_message_reply_markup(
+                chat_id=self.channel_id, message_id=message_id, reply_markup=keyboard
+            )
+        elif media == 'photo':
+            banner = None
+            if self.banners and len(message) <= CAPTION_LIMIT:
+                banner = await self._get_banner(deal, score_data)
+            if banner:
+                # Nuovo banner col prezzo aggiornato (file_id se già caricato)
+                send = lambda: self.bot.edit_message_media(
+                    chat_id=self.channel_id, message_id=message_id, reply_markup=keyboard,
+                    media=InputMediaPhoto(banner[1], caption=message, parse_mode=ParseMode.MARKDOWN)
+                )
+            else:
+                send = lambda: self.bot.edit_message_caption(
+                    chat_id=self.channel_id, message_id=message_id, reply_markup=keyboard,
+                    caption=message[:CAPTION_LIMIT], parse_mode=ParseMode.MARKDOWN
+                )
+        else:
+            send = lambda: self.bot.edit_message_text(
+                chat_id=self.channel_id, message_id=message_id, text=message,
+                parse_mode=ParseMode.MARKDOWN, reply_markup=keyboard,
+                disable_web_page_preview=False
+            )
+        
+        return await self._submit_edit(deal['title'], send)
+    
+    async def expire_deal(self, message_id: int, deal: Dict, score_data: Dict = None,
+                          media: str = 'text') -> bool:
+        """
+        Segna un post come scaduto e rimuove i pulsanti
+        
+        Args:
+            media: Tipo del post originale ('photo' se pubblicato con banner)
+        
+        Returns:
+            True se il post è aggiornato (o non più modificabile)
+        """
+        message = EXPIRED_HEADER + self.renderer.render(deal, score_data)[0]
+        
+        if media == 'photo':
+            if len(message) > CAPTION_LIMIT:
+                message = f"{EXPIRED_HEADER}*{deal['title']}*"
+            send = lambda: self.bot.edit_message_caption(
+                chat_id=self.channel_id, message_id=message_id, caption=message,
+                parse_mode=ParseMode.MARKDOWN, reply_markup=None
+            )
+        else:
+            send = lambda: self.bot.edit_message_text(
+                chat_id=self.channel_id, message_id=message_id, text=message,
+                parse_mode=ParseMode.MARKDOWN, reply_markup=None,
+                disable_web_page_preview=True
+            )
+        
+        return await self._submit_edit(deal['title'], send)
+    
+    async def _submit_edit(self, description: str, send) -> bool:
+        """Modifica tramite la coda di invio (le modifiche contano nei limiti del canale)"""
+        try:
+            await self.queue.submit(self.channel_id, send, description=f"modifica {description}")
+            logger.info(f"✏️ Post aggiornato: {description}")
+            return True
+        except BadRequest as e:
+            text = str(e).lower()
+            if 'not modified' in text:
+                return True
+            if 'not found' in text or "can't be edited" in text:
+                logger.warning(f"⚠️ Post non più modificabile: {description} ({e})")
+                return True
+            logger.error(f"❌ Errore modifica post {description}: {e}")
+            return False
+        except TelegramError as e:
+            logger.error(f"❌ Errore modifica post {description}: {e}")
+            return False
+    
+    async def send_multiple_deals(self, deals: List[Dict]) -> List[bool]:
+        """
+        Invia multiple offerte (il ritmo lo decide la coda di invio)
+        
+        Args:
+            deals: Lista di offerte (con 'brislyscore_data' opzionale)
             
-            # Delay tra i post (tranne l'ultimo)
-            if i < len(deals) and delay_seconds > 0:
-                logger.info(f"⏰ Attendo {delay_seconds} secondi...")
-                await asyncio.sleep(delay_seconds)
+        Returns:
+            Esito di ogni invio, nello stesso ordine
+        """
+        logger.info(f"📤 Accodate {len(deals)} offerte")
+        
+        results = await asyncio.gather(*(
+            self.send_deal(deal, deal.get('brislyscore_data'))
+            for deal in deals
+        ))
         
-        logger.info(f"📊 Inviate {sent_count}/{len(deals)} offerte")
-        return sent_count
+        logger.info(f"📊 Inviate {sum(results)}/{len(deals)} offerte")
+        return list(results)
     
     async def send_test_message(self) -> bool:
         """Invia messaggio di test al canale"""
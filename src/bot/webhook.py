@@ -0,0 +1,295 @@
+"""
+Webhook Server
+Riceve gli update di Telegram via webhook invece del long polling
+
+- Verifica dell'header X-Telegram-Bot-Api-Secret-Token
+- Code limitate, una per worker: gli update di uno stesso utente finiscono
+  sempre nella stessa coda e sono elaborati in ordine, utenti diversi in
+  parallelo
+- Backpressure: se la coda è piena si attende al massimo enqueue_timeout,
+  poi si risponde 503 e Telegram ritenterà la consegna
+
+Self-test (Bot API finta, nessuna rete):
+    python src/bot/webhook.py --updates 5000 --users 300 --workers 16 --work-ms 5
+"""
+
+import os
+import sys
+import time
+import zlib
+import json
+import hmac
+import random
+import asyncio
+import logging
+import argparse
+from collections import Counter
+from typing import List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    """Server webhook con pool di worker e ordinamento per utente"""
+
+    def __init__(
+        self,
+        application: Application,
+        secret_token: str,
+        path: str = '/telegram',
+        workers: int = 8,
+        queue_size: int = 1000,
+        enqueue_timeout: float = 2.0,
+    ):
+        """
+        Args:
+            application: Application PTB già inizializzata (handler registrati)
+            secret_token: Segreto passato a setWebhook
+            path: Percorso HTTP del webhook
+            workers: Worker concorrenti (e code)
+            queue_size: Update in attesa totali (divisi tra le code)
+            enqueue_timeout: Attesa massima per un posto in coda prima del 503
+        """
+        self.application = application
+        self.secret_token = secret_token
+        self.path = path
+        self.enqueue_timeout = enqueue_timeout
+
+        per_worker = max(1, queue_size // workers)
+        self._queues: List[asyncio.Queue] = [asyncio.Queue(per_worker) for _ in range(workers)]
+        self._workers: List[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+
+        self.stats: Counter = Counter()
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self._handle)
+        self.app.router.add_get('/health', self._health)
+
+    # ==========================================
+    # AVVIO / ARRESTO
+    # ==========================================
+
+    async def start(self, host: str = '0.0.0.0', port: int = 8443) -> int:
+        """
+        Avvia worker e server HTTP
+
+        Returns:
+            Porta effettiva (utile con port=0)
+        """
+        self._workers = [
+            asyncio.create_task(self._work(queue)) for queue in self._queues
+        ]
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        port = self._runner.addresses[0][1]
+        logger.info(f"🌐 Webhook in ascolto su {host}:{port}{self.path} "
+                    f"({len(self._workers)} worker)")
+        return port
+
+    async def stop(self, timeout: float = 30):
+        """Smette di accettare update, svuota le code e ferma i worker"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Webhook fermato con {self.pending()} update non elaborati")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def pending(self) -> int:
+        """Update in coda"""
+        return sum(queue.qsize() for queue in self._queues)
+
+    # ==========================================
+    # RICHIESTE
+    # ==========================================
+
+    async def _health(self, request: web.Request) -> web.Response:
+        return web.json_response({'ok': True, 'pending': self.pending(), **self.stats})
+
+    def _shard(self, update: Update) -> asyncio.Queue:
+        """Coda dell'utente (o della chat): stesso utente, stesso worker"""
+        if update.effective_user:
+            key = update.effective_user.id
+        elif update.effective_chat:
+            key = update.effective_chat.id
+        else:
+            key = update.update_id
+        return self._queues[zlib.crc32(str(key).encode()) % len(self._queues)]
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        secret = request.headers.get(SECRET_HEADER, '')
+        if not hmac.compare_digest(secret, self.secret_token):
+            self.stats['rejected'] += 1
+            return web.Response(status=403)
+
+        try:
+            update = Update.de_json(await request.json(), self.application.bot)
+        except (ValueError, KeyError, TypeError) as e:
+            self.stats['invalid'] += 1
+            logger.warning(f"⚠️ Update non valido: {e}")
+            # 200: un update malformato non va riconsegnato
+            return web.Response()
+
+        queue = self._shard(update)
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(queue.put(update), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                # Backpressure: Telegram riconsegnerà l'update più tardi
+                self.stats['busy'] += 1
+                return web.Response(status=503)
+
+        self.stats['received'] += 1
+        return web.Response()
+
+    async def _work(self, queue: asyncio.Queue):
+        """Worker: elabora in ordine gli update della sua coda"""
+        while True:
+            update = await queue.get()
+            try:
+                await self.application.process_update(update)
+                self.stats['processed'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"❌ Errore elaborazione update {update.update_id}: {e}")
+            finally:
+                queue.task_done()
+
+
+# ==========================================
+# SELF-TEST
+# ==========================================
+
+async def self_test(updates: int, users: int, workers: int, work_ms: float,
+                    concurrency: int = 64, queue_size: int = 1000):
+    """
+    Invia update sintetici al webhook locale e misura updates/secondo
+
+    Ogni update è un messaggio con un numero di sequenza per utente: alla
+    fine si verifica che ogni utente sia stato elaborato in ordine.
+    """
+    from aiohttp import ClientSession
+    from telegram.ext import MessageHandler, filters
+    from bot.fake_bot_api import FakeBotAPI
+
+    api = FakeBotAPI()
+    base_url = await api.start()
+    application = (
+        Application.builder()
+        .token('0:selftest')
+        .base_url(base_url)
+        .build()
+    )
+
+    seen = {}
+    out_of_order = 0
+
+    async def handle(update: Update, context):
+        nonlocal out_of_order
+        user_id = update.effective_user.id
+        seq = int(update.message.text)
+        if seq <= seen.get(user_id, -1):
+            out_of_order += 1
+        seen[user_id] = seq
+        if work_ms:
+            await asyncio.sleep(work_ms / 1000 * random.uniform(0.5, 1.5))
+
+    application.add_handler(MessageHandler(filters.TEXT, handle))
+    await application.initialize()
+
+    secret = 'self-test-secret'
+    server = WebhookServer(application, secret, workers=workers, queue_size=queue_size)
+    port = await server.start('127.0.0.1', 0)
+    url = f"http://127.0.0.1:{port}{server.path}"
+
+    sequence = Counter()
+    payloads = []
+    for update_id in range(updates):
+        user_id = 1 + update_id % users
+        payloads.append(json.dumps({
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': user_id, 'is_bot': False, 'first_name': 'test'},
+                'text': str(sequence[user_id]),
+            },
+        }))
+        sequence[user_id] += 1
+
+    statuses = Counter()
+    async with ClientSession(headers={'Content-Type': 'application/json'}) as session:
+        async with session.post(url, data=payloads[0], headers={SECRET_HEADER: 'wrong'}) as response:
+            statuses[f"wrong-secret:{response.status}"] += 1
+
+        # Come Telegram: gli update di un utente arrivano uno alla volta e in
+        # ordine, utenti diversi in parallelo (un canale HTTP per gruppo di utenti)
+        lanes = [[] for _ in range(concurrency)]
+        for update_id, payload in enumerate(payloads):
+            lanes[(update_id % users) % concurrency].append(payload)
+
+        async def lane(items):
+            for payload in items:
+                while True:
+                    async with session.post(url, data=payload, headers={SECRET_HEADER: secret}) as response:
+                        statuses[response.status] += 1
+                        if response.status != 503:
+                            break
+                    await asyncio.sleep(0.05)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(lane(items) for items in lanes))
+        accepted = time.perf_counter() - started
+        await asyncio.gather(*(queue.join() for queue in server._queues))
+        processed = time.perf_counter() - started
+
+    await server.stop()
+    await application.shutdown()
+    await api.stop()
+
+    print("\n" + "="*60)
+    print("📊 SELF-TEST WEBHOOK")
+    print("="*60)
+    print(f"  Update:        {updates:,} da {users} utenti, {workers} worker, lavoro ~{work_ms}ms")
+    print(f"  Accettati:     {updates / accepted:,.0f} update/s ({accepted:.2f}s)")
+    print(f"  Elaborati:     {updates / processed:,.0f} update/s ({processed:.2f}s)")
+    print(f"  Risposte HTTP: {dict(statuses)}")
+    print(f"  Server:        {dict(server.stats)}")
+    print(f"  Fuori ordine:  {out_of_order}")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="Self-test del webhook")
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--work-ms', type=float, default=5, help="Tempo di elaborazione simulato")
+    parser.add_argument('--concurrency', type=int, default=64, help="Richieste HTTP in parallelo")
+    parser.add_argument('--queue-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    asyncio.run(self_test(args.updates, args.users, args.workers, args.work_ms,
+                          args.concurrency, args.queue_size))
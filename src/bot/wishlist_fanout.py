@@ -0,0 +1,285 @@
+"""
+Wishlist Fan-out
+Notifiche in privato agli utenti che hanno in wishlist un gioco in offerta
+o un alert di prezzo soddisfatto (stesso flusso, job con intestazione diversa)
+
+Flusso:
+1. plan(): per le offerte nuove cerca gli utenti interessati con l'indice
+   inverso delle wishlist e salva su Redis la lista dei destinatari e un job
+   con il cursore di avanzamento (una sola volta per offerta)
+2. drain()/run(): per ogni job il messaggio viene renderizzato una volta sola,
+   i destinatari sono letti a blocchi e inviati in parallelo dalla coda di
+   invio (limite globale + 1 msg/s per chat privata); dopo ogni blocco il
+   cursore viene salvato, così un riavvio riprende dal blocco interrotto
+"""
+
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from telegram.constants import ParseMode
+from telegram.error import Forbidden
+from redis.exceptions import WatchError
+
+from database.redis_client import RedisClient, POSTED_TTL
+
+logger = logging.getLogger(__name__)
+
+WISHLIST_HEADER = "💙 *Un gioco della tua wishlist è in offerta!*\n\n"
+ALERT_HEADER = "📉 *Il prezzo è sceso sotto il tuo obiettivo!*\n\n"
+
+
+class WishlistFanout:
+    """Invio a blocchi e riprendibile delle notifiche wishlist"""
+
+    def __init__(self, db: RedisClient, poster, chunk_size: int = 500):
+        """
+        Args:
+            db: Client database
+            poster: TelegramPoster (bot, coda di invio e renderer)
+            chunk_size: Destinatari letti e inviati per blocco
+        """
+        self.db = db
+        self.poster = poster
+        self.chunk_size = chunk_size
+
+        self.jobs_key = f"{db.prefix}fanout:jobs"
+        self.recipients_prefix = f"{db.prefix}fanout:recipients:"
+        self.done_prefix = f"{db.prefix}fanout:done:"
+
+        self._wakeup = asyncio.Event()
+        # Loop del sender: plan() può girare in asyncio.to_thread
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ==========================================
+    # PIANIFICAZIONE
+    # ==========================================
+
+    def _queue_job(self, pipe, job_id: str, deal: Dict, users, header: str, stat: str):
+        """Accoda nella pipeline destinatari e job (con cursore a zero)"""
+        recipients = sorted(users)
+        key = f"{self.recipients_prefix}{job_id}"
+        pipe.delete(key)
+        for start in range(0, len(recipients), 1000):
+            pipe.rpush(key, *recipients[start:start + 1000])
+        pipe.hset(self.jobs_key, job_id, json.dumps({
+            'deal': deal,
+            'header': header,
+            'stat': stat,
+            'total': len(recipients),
+            'offset': 0,
+            'delivered': 0,
+            'blocked': 0,
+            'failed': 0,
+            'created_at': time.time(),
+        }))
+
+    def plan(self, deals: List[Dict]) -> int:
+        """
+        Crea i job di notifica per le offerte che corrispondono a delle wishlist
+
+        Args:
+            deals: Offerte nuove (con 'brislyscore_data')
+
+        Returns:
+            Numero di job creati
+        """
+        matches = self.db.match_wishlists(deals)
+        if not matches:
+            return 0
+
+        by_id = {deal.get('product_id') or self.db._generate_deal_id(deal): deal for deal in deals}
+        created = 0
+        for deal_id, users in matches.items():
+            # Chiave di idempotenza: ogni offerta notifica una volta sola.
+            # WATCH + MULTI: controllo, chiave e job in un'unica transazione
+            done_key = f"{self.done_prefix}{deal_id}"
+            with self.db.client.pipeline(transaction=True) as pipe:
+                try:
+                    pipe.watch(done_key)
+                    if pipe.exists(done_key):
+                        continue
+                    pipe.multi()
+                    pipe.set(done_key, 1, ex=POSTED_TTL)
+                    self._queue_job(pipe, deal_id, by_id[deal_id], users, WISHLIST_HEADER,
+                                    'wishlist_notifications')
+                    pipe.execute()
+                except WatchError:
+                    # Un altro processo ha pianificato la stessa offerta
+                    continue
+            created += 1
+            logger.info(f"💙 Wishlist: {by_id[deal_id]['title']} → {len(users)} utenti")
+
+        if created:
+            self._notify()
+        return created
+
+    def plan_alerts(self, deals: List[Dict]) -> int:
+        """
+        Crea i job di notifica per gli alert di prezzo soddisfatti
+
+        Gli alert scattati sono rimossi nello stesso commit che crea i job:
+        ogni alert notifica una volta sola, anche dopo un riavvio.
+
+        Args:
+            deals: Offerte dell'ultimo scraping (non filtrate)
+
+        Returns:
+            Numero di job creati
+        """
+        matches, prices = self.db.match_price_alerts(deals)
+        if not prices:
+            return 0
+
+        by_id = {deal.get('product_id') or self.db._generate_deal_id(deal): deal for deal in deals}
+        pipe = self.db.client.pipeline(transaction=True)
+        for product_id, users in matches.items():
+            deal = by_id[product_id]
+            cents = int(round(float(deal['discounted_price']) * 100))
+            self._queue_job(pipe, f"alert:{product_id}:{cents}", deal, users,
+                            ALERT_HEADER, 'alert_notifications')
+            logger.info(f"📉 Alert prezzo: {deal['title']} a {deal['discounted_price']}€ "
+                        f"→ {len(users)} utenti")
+        self.db.consume_price_alerts(matches, prices, pipe)
+        pipe.execute()
+
+        if matches:
+            self._notify()
+        return len(matches)
+
+    def _notify(self):
+        """Sveglia il sender (asyncio.Event non è thread-safe)"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        else:
+            self._wakeup.set()
+
+    def pending_count(self) -> int:
+        """Job di notifica non ancora completati"""
+        return self.db.client.hlen(self.jobs_key)
+
+    # ==========================================
+    # INVIO
+    # ==========================================
+
+    async def drain(self, stop: Optional[asyncio.Event] = None) -> List[Dict]:
+        """
+        Completa tutti i job in sospeso (anche quelli interrotti da un riavvio)
+
+        Args:
+            stop: Se impostato, si ferma alla fine del blocco corrente
+
+        Returns:
+            Report dei job completati
+        """
+        reports = []
+        for deal_id in list(self.db.client.hkeys(self.jobs_key)):
+            if stop is not None and stop.is_set():
+                break
+            report = await self._process(deal_id, stop)
+            if report:
+                reports.append(report)
+        return reports
+
+    async def run(self, stop: asyncio.Event, poll_seconds: float = 60):
+        """
+        Sender in background: svuota i job quando ne arrivano di nuovi
+
+        Args:
+            stop: Evento di arresto (il job corrente si ferma a fine blocco)
+            poll_seconds: Controllo periodico anche senza notifiche
+        """
+        logger.info("💙 Sender wishlist avviato")
+        self._loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            self._wakeup.clear()
+            try:
+                await self.drain(stop)
+            except Exception as e:
+                logger.error(f"❌ Errore fan-out wishlist: {e}")
+
+            wakeup = asyncio.create_task(self._wakeup.wait())
+            stopped = asyncio.create_task(stop.wait())
+            await asyncio.wait(
+                {wakeup, stopped},
+                timeout=poll_seconds,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            wakeup.cancel()
+            stopped.cancel()
+        logger.info("💙 Sender wishlist fermato")
+
+    async def _process(self, deal_id: str, stop: Optional[asyncio.Event]) -> Optional[Dict]:
+        raw = self.db.client.hget(self.jobs_key, deal_id)
+        if not raw:
+            return None
+        job = json.loads(raw)
+        deal = job['deal']
+
+        # Un solo render per offerta, condiviso da tutti i destinatari
+        message, keyboard = self.poster.renderer.render(deal, deal.get('brislyscore_data'))
+        text = job.get('header', WISHLIST_HEADER) + message
+
+        key = f"{self.recipients_prefix}{deal_id}"
+        while job['offset'] < job['total']:
+            if stop is not None and stop.is_set():
+                logger.info(f"⏸️ Fan-out {deal['title']} sospeso a {job['offset']}/{job['total']}")
+                return None
+
+            chunk = self.db.client.lrange(key, job['offset'], job['offset'] + self.chunk_size - 1)
+            if not chunk:
+                break
+
+            results = await asyncio.gather(
+                *(self._send(int(user_id), text, keyboard) for user_id in chunk),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Forbidden):
+                    job['blocked'] += 1
+                elif isinstance(result, BaseException):
+                    job['failed'] += 1
+                else:
+                    job['delivered'] += 1
+
+            job['offset'] += len(chunk)
+            job['last_sent_at'] = time.time()
+            # Cursore salvato dopo ogni blocco: al riavvio si riprende da qui
+            self.db.client.hset(self.jobs_key, deal_id, json.dumps(job))
+
+        pipe = self.db.client.pipeline(transaction=True)
+        pipe.hdel(self.jobs_key, deal_id)
+        pipe.delete(key)
+        pipe.execute()
+        self.db.increment_stat(job.get('stat', 'wishlist_notifications'), job['delivered'])
+
+        elapsed = job.get('last_sent_at', time.time()) - job['created_at']
+        report = {
+            'deal_id': deal_id,
+            'total': job['total'],
+            'delivered': job['delivered'],
+            'blocked': job['blocked'],
+            'failed': job['failed'],
+            'time_to_last': elapsed,
+            'delivered_per_second': job['delivered'] / elapsed if elapsed > 0 else 0.0,
+        }
+        logger.info(f"📬 Wishlist {deal['title']}: {job['delivered']}/{job['total']} consegnate "
+                    f"({job['blocked']} bloccati, {job['failed']} errori) in {elapsed:.1f}s "
+                    f"- {report['delivered_per_second']:.1f} msg/s")
+        return report
+
+    def _send(self, user_id: int, text: str, keyboard) -> asyncio.Future:
+        bot = self.poster.bot
+        return self.poster.queue.submit_nowait(
+            user_id,
+            lambda: bot.send_message(
+                chat_id=user_id,
+                text=text,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=keyboard,
+                disable_web_page_preview=False
+            ),
+            description=f"wishlist {user_id}"
+        )
@@ -0,0 +1,205 @@
+"""
+Record Codec
+Serializzazione compatta dei payload salvati su Redis (offerte postate, cache prezzi)
+
+Formato binario a schema fisso (struct), timestamp epoch interi, prezzi in
+centesimi e compressione zlib opzionale. La decodifica riconosce anche i
+vecchi valori JSON, così i record già salvati restano leggibili.
+"""
+
+import json
+import struct
+import zlib
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+# Primo byte dei record binari (un JSON inizia sempre con "{")
+MAGIC_POSTED = 0xB1
+MAGIC_PRICE = 0xB2
+
+FLAG_ZLIB = 0x01
+
+# posted_at, price (cent), message_id, brislyscore (x10, con segno), discount, source
+_POSTED_STRUCT = struct.Struct('<IIqhBB')
+# cached_at, original (cent), discounted (cent), discount
+_PRICE_STRUCT = struct.Struct('<IIIB')
+
+# Codici per le fonti note (0 = fonte salvata come stringa)
+SOURCE_CODES = {'instant_gaming': 1, 'gamivo': 2}
+SOURCE_NAMES = {code: name for name, code in SOURCE_CODES.items()}
+
+_NO_PRICE = 0xFFFFFFFF
+
+
+def _clamp(value: int, low: int, high: int) -> int:
+    """Limita un valore all'intervallo del campo struct"""
+    return max(low, min(high, value))
+
+
+def _cents(value) -> int:
+    """Prezzo in centesimi, limitato al campo uint32 (_NO_PRICE è riservato)"""
+    if value is None:
+        return _NO_PRICE
+    return _clamp(int(round(float(value) * 100)), 0, _NO_PRICE - 1)
+
+
+def _euros(value: int) -> Optional[float]:
+    return None if value == _NO_PRICE else value / 100
+
+
+def _epoch(value) -> int:
+    if isinstance(value, str):
+        return int(datetime.fromisoformat(value).timestamp())
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value or datetime.now().timestamp())
+
+
+def _pack_str(value: Optional[str], max_len: int = 0xFFFF) -> bytes:
+    raw = (value or '').encode('utf-8')[:max_len]
+    return struct.pack('<H', len(raw)) + raw
+
+
+def _unpack_str(buf: bytes, offset: int):
+    (length,) = struct.unpack_from('<H', buf, offset)
+    offset += 2
+    return buf[offset:offset + length].decode('utf-8', errors='ignore'), offset + length
+
+
+def _wrap(magic: int, body: bytes, compress: bool) -> bytes:
+    """Aggiunge header e comprime solo se conviene"""
+    if compress:
+        packed = zlib.compress(body, 9)
+        if len(packed) < len(body):
+            return bytes((magic, FLAG_ZLIB)) + packed
+    return bytes((magic, 0)) + body
+
+
+def _unwrap(data: bytes) -> bytes:
+    body = data[2:]
+    if data[1] & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    return body
+
+
+def _is_binary(data: Union[str, bytes], magic: int) -> bool:
+    return isinstance(data, bytes) and len(data) >= 2 and data[0] == magic
+
+
+# ==========================================
+# OFFERTE POSTATE
+# ==========================================
+
+def encode_posted(data: Dict, compact: bool = True, compress: bool = False) -> Union[str, bytes]:
+    """
+    Serializza il record di un'offerta postata
+
+    Args:
+        data: Record (title, platform, source, price, discount, posted_at, message_id, brislyscore)
+        compact: Se False usa il vecchio formato JSON
+        compress: Applica zlib se riduce la dimensione
+
+    Returns:
+        bytes (compatto) o str (JSON)
+    """
+    if not compact:
+        return json.dumps(data)
+
+    source = data.get('source') or ''
+    source_code = SOURCE_CODES.get(source, 0)
+    head = _POSTED_STRUCT.pack(
+        _epoch(data.get('posted_at')),
+        _cents(data.get('price')),
+        int(data.get('message_id') or 0),
+        _clamp(int(round(float(data.get('brislyscore') or 0) * 10)), -0x8000, 0x7FFF),
+        _clamp(int(data.get('discount') or 0), 0, 0xFF),
+        source_code,
+    )
+    body = head + _pack_str(data.get('title')) + _pack_str(data.get('platform'))
+    if source_code == 0:
+        body += _pack_str(source)
+    return _wrap(MAGIC_POSTED, body, compress)
+
+
+def decode_posted(data: Union[str, bytes, None]) -> Optional[Dict]:
+    """
+    Legge un record postato, binario o JSON legacy
+
+    Returns:
+        Dizionario con gli stessi campi del formato JSON (posted_at in ISO)
+    """
+    if data is None:
+        return None
+    if not _is_binary(data, MAGIC_POSTED):
+        return json.loads(data)
+
+    body = _unwrap(data)
+    posted_at, price, message_id, score, discount, source_code = _POSTED_STRUCT.unpack_from(body)
+    offset = _POSTED_STRUCT.size
+    title, offset = _unpack_str(body, offset)
+    platform, offset = _unpack_str(body, offset)
+    if source_code == 0:
+        source, offset = _unpack_str(body, offset)
+    else:
+        source = SOURCE_NAMES[source_code]
+
+    return {
+        'title': title,
+        'platform': platform,
+        'source': source,
+        'price': _euros(price),
+        'discount': discount,
+        'posted_at': datetime.fromtimestamp(posted_at).isoformat(),
+        'message_id': message_id or None,
+        'brislyscore': score / 10,
+    }
+
+
+# ==========================================
+# CACHE PREZZI
+# ==========================================
+
+_PRICE_FIELDS = ('original_price', 'discounted_price', 'discount_percent', 'cached_at')
+
+
+def encode_price(data: Dict, compact: bool = True, compress: bool = False) -> Union[str, bytes]:
+    """
+    Serializza un record della cache prezzi
+
+    I campi noti vanno nello schema fisso, eventuali campi extra
+    in coda come JSON.
+    """
+    if not compact:
+        return json.dumps(data)
+
+    head = _PRICE_STRUCT.pack(
+        _epoch(data.get('cached_at')),
+        _cents(data.get('original_price')),
+        _cents(data.get('discounted_price')),
+        _clamp(int(data.get('discount_percent') or 0), 0, 0xFF),
+    )
+    extra = {k: v for k, v in data.items() if k not in _PRICE_FIELDS}
+    body = head + (json.dumps(extra, separators=(',', ':')).encode('utf-8') if extra else b'')
+    return _wrap(MAGIC_PRICE, body, compress)
+
+
+def decode_price(data: Union[str, bytes, None]) -> Optional[Dict]:
+    """Legge un record della cache prezzi, binario o JSON legacy"""
+    if data is None:
+        return None
+    if not _is_binary(data, MAGIC_PRICE):
+        return json.loads(data)
+
+    body = _unwrap(data)
+    cached_at, original, discounted, discount = _PRICE_STRUCT.unpack_from(body)
+    result = {}
+    extra = body[_PRICE_STRUCT.size:]
+    if extra:
+        result.update(json.loads(extra))
+    if original != _NO_PRICE:
+        result['original_price'] = original / 100
+    if discounted != _NO_PRICE:
+        result['discounted_price'] = discounted / 100
+    result['discount_percent'] = discount
+    result['cached_at'] = datetime.fromtimestamp(cached_at).isoformat()
+    return result
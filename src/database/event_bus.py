@@ -0,0 +1,308 @@
+"""
+Deal Event Bus
+Eventi del ciclo di vita delle offerte su Redis Streams
+
+Uno stream per tipo di evento (<prefisso>events:<tipo>):
+- scraped: offerte raccolte e unite, prima dello scoring
+- scored: offerte con BrislyScore
+- posted: offerte pubblicate su un canale (nello stesso commit dello storico)
+- expired: post segnati come scaduti
+
+Gli stream hanno lunghezza limitata (MAXLEN ~) e i consumer esterni (sito,
+analytics, alert) leggono con consumer group: più istanze dello stesso
+gruppo si dividono gli eventi, ogni gruppo li riceve tutti. Gli XADD di un
+blocco di offerte partono in un'unica pipeline.
+
+Payload compatto a campi fissi, prezzi in centesimi:
+    id, t (titolo), pf (piattaforma), src, p, op, d, ts
+    + s (score x10), tier per scored; ch (prefisso canale), m (message_id) per posted/expired
+
+Consumer di esempio (stampa e conferma):
+    python src/database/event_bus.py --group analytics --consumer a1 --types posted,expired
+
+Benchmark (storage locale in memoria):
+    python src/database/event_bus.py --bench 20000
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.canonical import normalize_platform
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('scraped', 'scored', 'posted', 'expired')
+
+# Evento letto: (tipo, ID nello stream, campi)
+Event = Tuple[str, str, Dict[str, str]]
+
+
+def _cents(value) -> str:
+    return str(int(round(float(value) * 100))) if value is not None else ''
+
+
+def decode_event(fields: Dict[str, str]) -> Dict:
+    """Campi compatti → dizionario leggibile (prezzi in euro)"""
+    event = {
+        'id': fields.get('id'),
+        'title': fields.get('t'),
+        'platform': fields.get('pf'),
+        'source': fields.get('src'),
+        'timestamp': int(fields['ts']) if fields.get('ts') else None,
+    }
+    for field, name in (('p', 'discounted_price'), ('op', 'original_price')):
+        if fields.get(field):
+            event[name] = int(fields[field]) / 100
+    if fields.get('d'):
+        event['discount_percent'] = int(fields['d'])
+    if fields.get('s'):
+        event['brislyscore'] = int(fields['s']) / 10
+    if fields.get('tier'):
+        event['tier'] = fields['tier']
+    if fields.get('ch'):
+        event['channel'] = fields['ch']
+    if fields.get('m'):
+        event['message_id'] = int(fields['m'])
+    return event
+
+
+class DealEventBus:
+    """Pubblicazione e lettura degli eventi delle offerte"""
+
+    def __init__(self, client, prefix: str, maxlen: int = 10000, batch_size: int = 500,
+                 deal_id: Optional[Callable[[Dict], str]] = None):
+        """
+        Args:
+            client: Client redis-py o LocalStore (con decodifica delle risposte)
+            prefix: Prefisso delle chiavi (gli stream sono condivisi tra i canali)
+            maxlen: Eventi tenuti per stream (taglio approssimato)
+            batch_size: XADD per pipeline quando il bus esegue da solo
+            deal_id: ID canonico di un'offerta (default: campo product_id)
+        """
+        self.client = client
+        self.prefix = prefix
+        self.maxlen = maxlen
+        self.batch_size = batch_size
+        self.deal_id = deal_id or (lambda deal: deal.get('product_id', ''))
+
+    def stream(self, event_type: str) -> str:
+        """Chiave dello stream di un tipo di evento"""
+        return f"{self.prefix}events:{event_type}"
+
+    # ==========================================
+    # PUBBLICAZIONE
+    # ==========================================
+
+    def encode(self, event_type: str, deal: Dict, channel: Optional[str] = None,
+               message_id: Optional[int] = None) -> Dict[str, str]:
+        """Payload compatto di un evento"""
+        fields = {
+            'id': deal.get('product_id') or self.deal_id(deal),
+            't': deal.get('title') or '',
+            'pf': normalize_platform(deal.get('platform', '')),
+            'src': deal.get('source') or '',
+            'p': _cents(deal.get('discounted_price')),
+            'op': _cents(deal.get('original_price')),
+            'd': str(int(deal.get('discount_percent') or 0)),
+            'ts': str(int(time.time())),
+        }
+        if event_type == 'scored' and deal.get('brislyscore') is not None:
+            fields['s'] = str(int(round(float(deal['brislyscore']) * 10)))
+            fields['tier'] = (deal.get('brislyscore_data') or {}).get('tier') or ''
+        if channel:
+            fields['ch'] = channel
+        if message_id is not None:
+            fields['m'] = str(message_id)
+        return fields
+
+    def publish(self, event_type: str, deals: Iterable[Dict], pipe=None,
+                channel: Optional[str] = None, message_id: Optional[int] = None) -> int:
+        """
+        Pubblica un evento per offerta
+
+        Args:
+            event_type: Uno di EVENT_TYPES
+            deals: Offerte dell'evento
+            pipe: Pipeline del chiamante (gli XADD entrano nel suo commit);
+                  se None il bus usa pipeline proprie da batch_size comandi
+            channel: Prefisso del canale (posted/expired)
+            message_id: Messaggio del canale (posted/expired)
+
+        Returns:
+            Eventi accodati o pubblicati
+        """
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"❌ Tipo di evento sconosciuto: {event_type}")
+
+        stream = self.stream(event_type)
+        execute = pipe is None
+        published = 0
+        try:
+            for deal in deals:
+                if pipe is None:
+                    pipe = self.client.pipeline(transaction=False)
+                pipe.xadd(stream, self.encode(event_type, deal, channel, message_id),
+                          maxlen=self.maxlen, approximate=True)
+                published += 1
+                if execute and published % self.batch_size == 0:
+                    pipe.execute()
+                    pipe = None
+            if execute and pipe is not None and len(pipe):
+                pipe.execute()
+        except Exception as e:
+            # Gli eventi sono best-effort: mai bloccare scraping o posting
+            logger.error(f"❌ Errore pubblicazione eventi {event_type}: {e}")
+            return 0
+        return published
+
+    # ==========================================
+    # CONSUMER GROUP
+    # ==========================================
+
+    def ensure_group(self, group: str, types: Iterable[str] = EVENT_TYPES, start: str = '$'):
+        """Crea il consumer group sugli stream (se non esiste già)"""
+        for event_type in types:
+            try:
+                self.client.xgroup_create(self.stream(event_type), group, id=start, mkstream=True)
+                logger.info(f"👥 Gruppo {group} creato su {self.stream(event_type)}")
+            except Exception as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+
+    def read(self, group: str, consumer: str, types: Iterable[str] = EVENT_TYPES,
+             count: int = 100, block_ms: Optional[int] = 5000) -> List[Event]:
+        """
+        Nuovi eventi per questo consumer (da confermare con ack)
+
+        Returns:
+            Lista di (tipo, ID, campi)
+        """
+        streams = {self.stream(event_type): '>' for event_type in types}
+        response = self.client.xreadgroup(group, consumer, streams, count=count, block=block_ms)
+        events = []
+        for stream, entries in response or []:
+            event_type = stream[len(self.prefix) + len('events:'):]
+            events.extend((event_type, entry_id, fields) for entry_id, fields in entries)
+        return events
+
+    def ack(self, group: str, events: List[Event]) -> int:
+        """Conferma gli eventi elaborati (una pipeline)"""
+        if not events:
+            return 0
+        by_type: Dict[str, List[str]] = {}
+        for event_type, entry_id, _ in events:
+            by_type.setdefault(event_type, []).append(entry_id)
+        pipe = self.client.pipeline(transaction=False)
+        for event_type, ids in by_type.items():
+            pipe.xack(self.stream(event_type), group, *ids)
+        return sum(pipe.execute())
+
+    def claim_stale(self, group: str, consumer: str, min_idle_ms: int = 60000,
+                    types: Iterable[str] = EVENT_TYPES, count: int = 100) -> List[Event]:
+        """Prende in carico gli eventi rimasti in sospeso su consumer fermi"""
+        events = []
+        for event_type in types:
+            _, entries, _ = self.client.xautoclaim(self.stream(event_type), group, consumer,
+                                                   min_idle_ms, count=count)[:3]
+            events.extend((event_type, entry_id, fields) for entry_id, fields in entries if fields)
+        return events
+
+
+def bus_from_env(client, prefix: str, deal_id: Optional[Callable[[Dict], str]] = None) -> Optional[DealEventBus]:
+    """Bus da EVENT_BUS/EVENT_STREAM_MAXLEN/EVENT_PREFIX (None = eventi disattivi)"""
+    if os.getenv('EVENT_BUS', 'false').lower() != 'true':
+        return None
+    return DealEventBus(
+        client,
+        os.getenv('EVENT_PREFIX', prefix),
+        maxlen=int(os.getenv('EVENT_STREAM_MAXLEN', '10000')),
+        deal_id=deal_id,
+    )
+
+
+# ==========================================
+# CONSUMER DI ESEMPIO E BENCHMARK
+# ==========================================
+
+def consume(bus: DealEventBus, group: str, consumer: str, types: List[str]):
+    """Stampa gli eventi man mano che arrivano e li conferma"""
+    bus.ensure_group(group, types)
+    print(f"👂 {consumer}@{group} in ascolto su {', '.join(types)} (Ctrl+C per uscire)")
+    # Prima gli eventi rimasti in sospeso da un consumer fermo
+    pending = bus.claim_stale(group, consumer, types=types)
+    while True:
+        events = pending or bus.read(group, consumer, types)
+        pending = []
+        for event_type, entry_id, fields in events:
+            event = decode_event(fields)
+            print(f"{entry_id} {event_type:8} {event.get('title')} "
+                  f"{event.get('discounted_price', '')}€ {event.get('channel', '')}")
+        bus.ack(group, events)
+
+
+def bench(count: int):
+    """XADD a blocchi e lettura con due consumer dello stesso gruppo"""
+    from database.local_store import LocalStore
+
+    store = LocalStore()
+    bus = DealEventBus(store, 'bench:', maxlen=count // 2)
+    deals = [
+        {'product_id': f"game-{i}-steam", 'title': f"Game {i}", 'platform': 'Steam',
+         'source': 'gamivo', 'original_price': 59.99, 'discounted_price': 19.99,
+         'discount_percent': 67, 'brislyscore': 28.4}
+        for i in range(count)
+    ]
+    bus.ensure_group('bench', ['scored'], start='0')
+
+    started = time.perf_counter()
+    bus.publish('scored', deals)
+    elapsed = time.perf_counter() - started
+    print(f"📤 {count:,} XADD in {elapsed:.2f}s ({count / elapsed:,.0f}/s), "
+          f"stream: {store.xlen(bus.stream('scored')):,} eventi (MAXLEN ~{bus.maxlen:,})")
+
+    received = {'c1': 0, 'c2': 0}
+    started = time.perf_counter()
+    while True:
+        done = True
+        for consumer in received:
+            events = bus.read('bench', consumer, ['scored'], count=500, block_ms=None)
+            received[consumer] += len(events)
+            bus.ack('bench', events)
+            done = done and not events
+        if done:
+            break
+    elapsed = time.perf_counter() - started
+    print(f"📥 Letti {sum(received.values()):,} eventi in {elapsed:.2f}s {received}, "
+          f"in sospeso: {store.xpending(bus.stream('scored'), 'bench')['pending']}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="Eventi delle offerte su Redis Streams")
+    parser.add_argument('--group', default='debug')
+    parser.add_argument('--consumer', default='c1')
+    parser.add_argument('--types', default=','.join(EVENT_TYPES))
+    parser.add_argument('--bench', type=int, help="Benchmark con N eventi in memoria")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args.bench)
+    else:
+        from dotenv import load_dotenv
+        from database.redis_client import RedisClient
+
+        load_dotenv()
+        db = RedisClient()
+        bus = DealEventBus(db.client, os.getenv('EVENT_PREFIX', db.prefix),
+                           maxlen=int(os.getenv('EVENT_STREAM_MAXLEN', '10000')))
+        try:
+            consume(bus, args.group, args.consumer, args.types.split(','))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,905 @@
+"""
+Local Store
+Backend embedded in-process, alternativa a Upstash per deploy single-node,
+benchmark e test senza servizi esterni.
+
+Espone lo stesso sottoinsieme di comandi redis-py usato da RedisClient
+(con semantica decode_responses=True) e salva periodicamente uno snapshot
+su disco, ricaricato all'avvio.
+"""
+
+import os
+import math
+import time
+import hashlib
+import pickle
+import atexit
+import bisect
+import fnmatch
+import inspect
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from redis.exceptions import WatchError
+
+logger = logging.getLogger(__name__)
+
+# HyperLogLog come in Redis: 2^14 registri, errore standard ~0.81%
+HLL_BITS = 14
+HLL_REGISTERS = 1 << HLL_BITS
+HLL_ALPHA = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+
+
+def _seconds(value) -> float:
+    """Converte un TTL (int o timedelta) in secondi"""
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value)
+
+
+class LocalStore:
+    """Store chiave/valore in-process con TTL e snapshot periodici"""
+
+    def __init__(self, path: Optional[str] = None, snapshot_interval: int = 60):
+        """
+        Args:
+            path: File di snapshot (None = solo memoria)
+            snapshot_interval: Secondi tra uno snapshot e l'altro
+        """
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        # Lettori bloccati su XREADGROUP, svegliati da XADD
+        self._stream_added = threading.Condition(self._lock)
+        self._dirty = False
+        self._stop = threading.Event()
+
+        if self.path:
+            self._load()
+            self._thread = threading.Thread(
+                target=self._snapshot_loop,
+                name="local-store-snapshot",
+                daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.close)
+
+        logger.info(f"✅ LocalStore pronto ({self.path or 'solo memoria'})")
+
+    # ==========================================
+    # SNAPSHOT
+    # ==========================================
+
+    def _load(self):
+        """Carica lo snapshot da disco se presente"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                snapshot = pickle.load(f)
+            self._data = snapshot.get('data', {})
+            self._expires = snapshot.get('expires', {})
+            self._purge_expired()
+            logger.info(f"📂 Snapshot caricato: {len(self._data)} chiavi")
+        except Exception as e:
+            logger.error(f"❌ Errore caricamento snapshot: {e}")
+
+    def save(self) -> bool:
+        """
+        Scrive lo snapshot su disco (write + rename atomico)
+
+        Returns:
+            True se salvato
+        """
+        if not self.path:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return True
+            payload = pickle.dumps(
+                {'data': self._data, 'expires': self._expires},
+                protocol=pickle.HIGHEST_PROTOCOL
+            )
+            self._dirty = False
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Errore salvataggio snapshot: {e}")
+            with self._lock:
+                self._dirty = True
+            return False
+
+    def _snapshot_loop(self):
+        """Thread che salva lo snapshot ogni snapshot_interval secondi"""
+        while not self._stop.wait(self.snapshot_interval):
+            self.save()
+
+    def close(self):
+        """Ferma il thread di snapshot e salva lo stato finale"""
+        self._stop.set()
+        self.save()
+
+    # ==========================================
+    # GESTIONE TTL
+    # ==========================================
+
+    def _alive(self, key: str) -> bool:
+        """Verifica che la chiave esista e non sia scaduta (lazy expiry)"""
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+            self._dirty = True
+            return False
+        return key in self._data
+
+    def _purge_expired(self):
+        """Rimuove tutte le chiavi scadute"""
+        now = time.time()
+        for key in [k for k, exp in self._expires.items() if exp <= now]:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    def _container(self, key: str, factory):
+        """Ritorna il contenitore della chiave, creandolo se manca"""
+        if not self._alive(key):
+            self._data[key] = factory()
+        return self._data[key]
+
+    def _written(self):
+        self._dirty = True
+
+    # ==========================================
+    # COMANDI GENERICI
+    # ==========================================
+
+    def ping(self) -> bool:
+        return True
+
+    def exists(self, *keys: str) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._alive(key))
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    del self._data[key]
+                    removed += 1
+                self._expires.pop(key, None)
+            if removed:
+                self._written()
+            return removed
+
+    def expire(self, key: str, ttl) -> bool:
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.time() + _seconds(ttl)
+            self._written()
+            return True
+
+    def ttl(self, key: str) -> int:
+        with self._lock:
+            if not self._alive(key):
+                return -2
+            expires_at = self._expires.get(key)
+            if expires_at is None:
+                return -1
+            return int(expires_at - time.time())
+
+    def scan_iter(self, match: str = '*', count: Optional[int] = None) -> Iterator[str]:
+        with self._lock:
+            keys = [k for k in list(self._data) if self._alive(k)]
+        for key in keys:
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    # ==========================================
+    # STRINGHE
+    # ==========================================
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._data[key] if self._alive(key) else None
+
+    def set(self, key: str, value, ex=None, nx: bool = False) -> Optional[bool]:
+        with self._lock:
+            if nx and self._alive(key):
+                return None
+            self._data[key] = value if isinstance(value, bytes) else str(value)
+            if ex is not None:
+                self._expires[key] = time.time() + _seconds(ex)
+            else:
+                self._expires.pop(key, None)
+            self._written()
+            return True
+
+    def setex(self, key: str, ttl, value) -> bool:
+        return self.set(key, value, ex=ttl)
+
+    def incrby(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            current = int(self._data[key]) if self._alive(key) else 0
+            current += amount
+            self._data[key] = str(current)
+            self._written()
+            return current
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        return self.incrby(key, amount)
+
+    # ==========================================
+    # SET
+    # ==========================================
+
+    def sadd(self, key: str, *members) -> int:
+        with self._lock:
+            container: Set = self._container(key, set)
+            before = len(container)
+            container.update(str(m) for m in members)
+            self._written()
+            return len(container) - before
+
+    def srem(self, key: str, *members) -> int:
+        with self._lock:
+            if not self._alive(key):
+                return 0
+            container: Set = self._data[key]
+            removed = 0
+            for member in members:
+                if str(member) in container:
+                    container.discard(str(member))
+                    removed += 1
+            if not container:
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            self._written()
+            return removed
+
+    def smembers(self, key: str) -> Set[str]:
+        with self._lock:
+            return set(self._data[key]) if self._alive(key) else set()
+
+    def sismember(self, key: str, member) -> bool:
+        with self._lock:
+            return self._alive(key) and str(member) in self._data[key]
+
+    def scard(self, key: str) -> int:
+        with self._lock:
+            return len(self._data[key]) if self._alive(key) else 0
+
+    # ==========================================
+    # HASH
+    # ==========================================
+
+    def hset(self, key: str, field=None, value=None, mapping: Optional[Dict] = None) -> int:
+        with self._lock:
+            container: Dict = self._container(key, dict)
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            added = 0
+            for k, v in items.items():
+                if str(k) not in container:
+                    added += 1
+                container[str(k)] = v if isinstance(v, bytes) else str(v)
+            self._written()
+            return added
+
+    def hsetnx(self, key: str, field, value) -> bool:
+        with self._lock:
+            if self.hexists(key, field):
+                return False
+            self.hset(key, field, value)
+            return True
+
+    def hget(self, key: str, field) -> Optional[str]:
+        with self._lock:
+            return self._data[key].get(str(field)) if self._alive(key) else None
+
+    def hmget(self, key: str, fields: List) -> List[Optional[str]]:
+        with self._lock:
+            container = self._data[key] if self._alive(key) else {}
+            return [container.get(str(f)) for f in fields]
+
+    def hexists(self, key: str, field) -> bool:
+        with self._lock:
+            return self._alive(key) and str(field) in self._data[key]
+
+    def hdel(self, key: str, *fields) -> int:
+        with self._lock:
+            if not self._alive(key):
+                return 0
+            container: Dict = self._data[key]
+            removed = sum(1 for f in fields if container.pop(str(f), None) is not None)
+            if not container:
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            self._written()
+            return removed
+
+    def hgetall(self, key: str) -> Dict:
+        with self._lock:
+            return dict(self._data[key]) if self._alive(key) else {}
+
+    def hkeys(self, key: str) -> List[str]:
+        with self._lock:
+            return list(self._data[key]) if self._alive(key) else []
+
+    def hlen(self, key: str) -> int:
+        with self._lock:
+            return len(self._data[key]) if self._alive(key) else 0
+
+    def hincrby(self, key: str, field, amount: int = 1) -> int:
+        with self._lock:
+            container: Dict = self._container(key, dict)
+            current = int(container.get(str(field), 0)) + amount
+            container[str(field)] = str(current)
+            self._written()
+            return current
+
+    # ==========================================
+    # LISTE
+    # ==========================================
+
+    def lpush(self, key: str, *values) -> int:
+        with self._lock:
+            container: List = self._container(key, list)
+            for value in values:
+                container.insert(0, value if isinstance(value, bytes) else str(value))
+            self._written()
+            return len(container)
+
+    def rpush(self, key: str, *values) -> int:
+        with self._lock:
+            container: List = self._container(key, list)
+            container.extend(v if isinstance(v, bytes) else str(v) for v in values)
+            self._written()
+            return len(container)
+
+    def _pop(self, key: str, index: int):
+        if not self._alive(key):
+            return None
+        container: List = self._data[key]
+        value = container.pop(index)
+        if not container:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        self._written()
+        return value
+
+    def lpop(self, key: str):
+        with self._lock:
+            return self._pop(key, 0)
+
+    def rpop(self, key: str):
+        with self._lock:
+            return self._pop(key, -1)
+
+    def rpoplpush(self, source: str, destination: str):
+        with self._lock:
+            value = self._pop(source, -1)
+            if value is not None:
+                self.lpush(destination, value)
+            return value
+
+    def lrange(self, key: str, start: int, end: int) -> List:
+        with self._lock:
+            if not self._alive(key):
+                return []
+            container: List = self._data[key]
+            end = len(container) if end == -1 else end + 1
+            return container[start:end]
+
+    def llen(self, key: str) -> int:
+        with self._lock:
+            return len(self._data[key]) if self._alive(key) else 0
+
+    def lrem(self, key: str, count: int, value) -> int:
+        with self._lock:
+            if not self._alive(key):
+                return 0
+            container: List = self._data[key]
+            value = value if isinstance(value, bytes) else str(value)
+            removed = 0
+            indexes = range(len(container) - 1, -1, -1) if count < 0 else range(len(container))
+            for i in list(indexes):
+                if container[i] == value and (count == 0 or removed < abs(count)):
+                    container[i] = None
+                    removed += 1
+            self._data[key] = [v for v in container if v is not None]
+            if not self._data[key]:
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            self._written()
+            return removed
+
+    def ltrim(self, key: str, start: int, end: int) -> bool:
+        with self._lock:
+            if self._alive(key):
+                self._data[key] = self.lrange(key, start, end)
+                self._written()
+            return True
+
+    # ==========================================
+    # SORTED SET
+    # ==========================================
+
+    def _sorted(self, key: str, desc: bool = False) -> List[tuple]:
+        """Membri ordinati per (score, membro) come in Redis"""
+        if not self._alive(key):
+            return []
+        return sorted(self._data[key].items(), key=lambda item: (item[1], item[0]), reverse=desc)
+
+    @staticmethod
+    def _score_bound(value) -> tuple:
+        """Converte un limite di score ('-inf', '(5', 3.2) in (valore, esclusivo)"""
+        if isinstance(value, str):
+            if value.startswith('('):
+                return float(value[1:]), True
+            return float(value), False
+        return float(value), False
+
+    @staticmethod
+    def _slice(items: List, start: int, end: int) -> List:
+        end = len(items) if end == -1 else end + 1
+        return items[start:end]
+
+    @staticmethod
+    def _format(items: List[tuple], withscores: bool) -> List:
+        return [(m, s) for m, s in items] if withscores else [m for m, _ in items]
+
+    def zadd(self, key: str, mapping: Dict, nx: bool = False, xx: bool = False,
+             gt: bool = False, lt: bool = False) -> int:
+        with self._lock:
+            container: Dict = self._container(key, dict)
+            added = 0
+            for member, score in mapping.items():
+                member, score = str(member), float(score)
+                current = container.get(member)
+                if current is None:
+                    if xx:
+                        continue
+                    added += 1
+                else:
+                    if nx or (gt and score <= current) or (lt and score >= current):
+                        continue
+                container[member] = score
+            if not container:
+                self._data.pop(key, None)
+            self._written()
+            return added
+
+    def zincrby(self, key: str, amount: float, value) -> float:
+        with self._lock:
+            container: Dict = self._container(key, dict)
+            score = container.get(str(value), 0.0) + float(amount)
+            container[str(value)] = score
+            self._written()
+            return score
+
+    def zrem(self, key: str, *values) -> int:
+        with self._lock:
+            if not self._alive(key):
+                return 0
+            container: Dict = self._data[key]
+            removed = sum(1 for v in values if container.pop(str(v), None) is not None)
+            if not container:
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            self._written()
+            return removed
+
+    def zscore(self, key: str, value) -> Optional[float]:
+        with self._lock:
+            return self._data[key].get(str(value)) if self._alive(key) else None
+
+    def zcard(self, key: str) -> int:
+        with self._lock:
+            return len(self._data[key]) if self._alive(key) else 0
+
+    def zrange(self, key: str, start: int, end: int, desc: bool = False,
+               withscores: bool = False) -> List:
+        with self._lock:
+            return self._format(self._slice(self._sorted(key, desc), start, end), withscores)
+
+    def zrevrange(self, key: str, start: int, end: int, withscores: bool = False) -> List:
+        return self.zrange(key, start, end, desc=True, withscores=withscores)
+
+    def _by_score(self, key: str, low, high, desc: bool = False) -> List[tuple]:
+        (low, low_open), (high, high_open) = self._score_bound(low), self._score_bound(high)
+        return [
+            (m, s) for m, s in self._sorted(key, desc)
+            if (s > low if low_open else s >= low) and (s < high if high_open else s <= high)
+        ]
+
+    def zrangebyscore(self, key: str, min, max, start: Optional[int] = None,
+                      num: Optional[int] = None, withscores: bool = False) -> List:
+        with self._lock:
+            items = self._by_score(key, min, max)
+            if start is not None:
+                items = items[start:start + num if num is not None and num >= 0 else None]
+            return self._format(items, withscores)
+
+    def zrevrangebyscore(self, key: str, max, min, start: Optional[int] = None,
+                         num: Optional[int] = None, withscores: bool = False) -> List:
+        with self._lock:
+            items = self._by_score(key, min, max, desc=True)
+            if start is not None:
+                items = items[start:start + num if num is not None and num >= 0 else None]
+            return self._format(items, withscores)
+
+    def zremrangebyscore(self, key: str, min, max) -> int:
+        with self._lock:
+            members = [m for m, _ in self._by_score(key, min, max)]
+            return self.zrem(key, *members) if members else 0
+
+    def zremrangebyrank(self, key: str, start: int, end: int) -> int:
+        with self._lock:
+            members = [m for m, _ in self._slice(self._sorted(key), start, end)]
+            return self.zrem(key, *members) if members else 0
+
+    def zpopmax(self, key: str, count: Optional[int] = None) -> List[tuple]:
+        with self._lock:
+            items = self._sorted(key, desc=True)[:count or 1]
+            if items:
+                self.zrem(key, *(m for m, _ in items))
+            return items
+
+    # ==========================================
+    # STREAM
+    # ==========================================
+
+    @staticmethod
+    def _stream_id(value: str, default_seq: int = 0) -> tuple:
+        """'1700000000000-3' → (1700000000000, 3)"""
+        ms, _, seq = str(value).partition('-')
+        return int(ms), int(seq) if seq else default_seq
+
+    @staticmethod
+    def _format_id(stream_id: tuple) -> str:
+        return f"{stream_id[0]}-{stream_id[1]}"
+
+    def _stream(self, key: str, create: bool = False) -> Optional[Dict]:
+        if create:
+            return self._container(key, lambda: {'ids': [], 'fields': [], 'last': (0, 0), 'groups': {}})
+        return self._data[key] if self._alive(key) else None
+
+    def xadd(self, name: str, fields: Dict, id: str = '*', maxlen: Optional[int] = None,
+             approximate: bool = True) -> str:
+        with self._lock:
+            stream = self._stream(name, create=True)
+            if id == '*':
+                ms = int(time.time() * 1000)
+                last_ms, last_seq = stream['last']
+                new_id = (last_ms, last_seq + 1) if ms <= last_ms else (ms, 0)
+            else:
+                new_id = self._stream_id(id)
+                if new_id <= stream['last']:
+                    raise ValueError("ID specificato in XADD uguale o minore dell'ultimo")
+            stream['ids'].append(new_id)
+            stream['fields'].append({str(k): str(v) for k, v in fields.items()})
+            stream['last'] = new_id
+
+            if maxlen is not None:
+                # "~": taglio a blocchi (10%), come i nodi dello stream in Redis
+                slack = max(1, maxlen // 10) if approximate else 0
+                excess = len(stream['ids']) - maxlen
+                if excess > slack:
+                    del stream['ids'][:excess]
+                    del stream['fields'][:excess]
+
+            self._written()
+            self._stream_added.notify_all()
+            return self._format_id(new_id)
+
+    def xlen(self, name: str) -> int:
+        with self._lock:
+            stream = self._stream(name)
+            return len(stream['ids']) if stream else 0
+
+    def _entries(self, stream: Dict, start: int, end: int) -> List[tuple]:
+        return [(self._format_id(i), dict(f))
+                for i, f in zip(stream['ids'][start:end], stream['fields'][start:end])]
+
+    def xrange(self, name: str, min: str = '-', max: str = '+',
+               count: Optional[int] = None) -> List[tuple]:
+        with self._lock:
+            stream = self._stream(name)
+            if not stream:
+                return []
+            ids = stream['ids']
+            start = 0 if min == '-' else bisect.bisect_left(ids, self._stream_id(min))
+            end = len(ids) if max == '+' else bisect.bisect_right(ids, self._stream_id(max, 1 << 63))
+            if count is not None and start + count < end:
+                end = start + count
+            return self._entries(stream, start, end)
+
+    def xgroup_create(self, name: str, groupname: str, id: str = '$', mkstream: bool = False) -> bool:
+        with self._lock:
+            stream = self._stream(name, create=mkstream)
+            if stream is None:
+                raise ValueError("ERR The XGROUP subcommand requires the key to exist")
+            if groupname in stream['groups']:
+                raise ValueError("BUSYGROUP Consumer Group name already exists")
+            last = stream['last'] if id == '$' else self._stream_id(id)
+            stream['groups'][groupname] = {'last': last, 'pending': {}}
+            self._written()
+            return True
+
+    def _read_group(self, name: str, groupname: str, consumername: str, start: str,
+                    count: Optional[int], noack: bool) -> List[tuple]:
+        stream = self._stream(name)
+        if stream is None or groupname not in stream['groups']:
+            raise ValueError(f"NOGROUP No such key '{name}' or consumer group '{groupname}'")
+        group = stream['groups'][groupname]
+        ids = stream['ids']
+
+        if start != '>':
+            # Rilettura dei messaggi in sospeso di questo consumer
+            after = self._stream_id(start)
+            pending = sorted(i for i, (owner, _, _) in group['pending'].items()
+                             if owner == consumername and i > after)[:count]
+            result = []
+            for entry_id in pending:
+                index = bisect.bisect_left(ids, entry_id)
+                fields = stream['fields'][index] if index < len(ids) and ids[index] == entry_id else None
+                result.append((self._format_id(entry_id), dict(fields) if fields else None))
+            return result
+
+        first = bisect.bisect_right(ids, group['last'])
+        last = len(ids) if count is None else min(len(ids), first + count)
+        entries = self._entries(stream, first, last)
+        if entries:
+            group['last'] = ids[last - 1]
+            if not noack:
+                now = time.time()
+                for entry_id in ids[first:last]:
+                    group['pending'][entry_id] = (consumername, now, 1)
+            self._written()
+        return entries
+
+    def xreadgroup(self, groupname: str, consumername: str, streams: Dict,
+                   count: Optional[int] = None, block: Optional[int] = None,
+                   noack: bool = False) -> List:
+        deadline = time.time() + block / 1000 if block else None
+        with self._lock:
+            while True:
+                result = []
+                for name, start in streams.items():
+                    entries = self._read_group(name, groupname, consumername, str(start), count, noack)
+                    if entries or str(start) != '>':
+                        result.append([name, entries])
+                if result or deadline is None:
+                    return result
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return []
+                self._stream_added.wait(remaining)
+
+    def xack(self, name: str, groupname: str, *ids) -> int:
+        with self._lock:
+            stream = self._stream(name)
+            if stream is None or groupname not in stream['groups']:
+                return 0
+            pending = stream['groups'][groupname]['pending']
+            acked = sum(1 for i in ids if pending.pop(self._stream_id(i), None) is not None)
+            if acked:
+                self._written()
+            return acked
+
+    def xpending(self, name: str, groupname: str) -> Dict:
+        with self._lock:
+            stream = self._stream(name)
+            pending = stream['groups'][groupname]['pending'] if stream else {}
+            consumers = {}
+            for owner, _, _ in pending.values():
+                consumers[owner] = consumers.get(owner, 0) + 1
+            return {
+                'pending': len(pending),
+                'min': self._format_id(min(pending)) if pending else None,
+                'max': self._format_id(max(pending)) if pending else None,
+                'consumers': [{'name': c, 'pending': n} for c, n in consumers.items()],
+            }
+
+    def xautoclaim(self, name: str, groupname: str, consumername: str, min_idle_time: int,
+                   start_id: str = '0-0', count: Optional[int] = None) -> List:
+        with self._lock:
+            stream = self._stream(name)
+            if stream is None or groupname not in stream['groups']:
+                raise ValueError(f"NOGROUP No such key '{name}' or consumer group '{groupname}'")
+            pending = stream['groups'][groupname]['pending']
+            now = time.time()
+            start = self._stream_id(start_id)
+            idle = sorted(i for i, (_, since, _) in pending.items()
+                          if i >= start and (now - since) * 1000 >= min_idle_time)
+            claimed, deleted = [], []
+            for entry_id in idle[:count or 100]:
+                index = bisect.bisect_left(stream['ids'], entry_id)
+                if index < len(stream['ids']) and stream['ids'][index] == entry_id:
+                    _, _, deliveries = pending[entry_id]
+                    pending[entry_id] = (consumername, now, deliveries + 1)
+                    claimed.append((self._format_id(entry_id), dict(stream['fields'][index])))
+                else:
+                    # Già tagliato da MAXLEN: rimosso dai pending
+                    del pending[entry_id]
+                    deleted.append(self._format_id(entry_id))
+            next_id = self._format_id(idle[count]) if count and len(idle) > count else '0-0'
+            self._written()
+            return [next_id, claimed, deleted]
+
+    # ==========================================
+    # HYPERLOGLOG
+    # ==========================================
+
+    @staticmethod
+    def _hll_position(element) -> tuple:
+        """Registro e rango (zeri finali + 1) di un elemento"""
+        value = int.from_bytes(hashlib.blake2b(str(element).encode(), digest_size=8).digest(), 'little')
+        index = value & (HLL_REGISTERS - 1)
+        rest = value >> HLL_BITS
+        rank = (rest & -rest).bit_length() if rest else 64 - HLL_BITS + 1
+        return index, rank
+
+    def pfadd(self, key: str, *elements) -> int:
+        with self._lock:
+            registers: bytearray = self._container(key, lambda: bytearray(HLL_REGISTERS))
+            changed = 0
+            for element in elements:
+                index, rank = self._hll_position(element)
+                if rank > registers[index]:
+                    registers[index] = rank
+                    changed = 1
+            self._written()
+            return changed
+
+    def _hll_union(self, keys) -> bytes:
+        alive = [self._data[key] for key in keys if self._alive(key)]
+        if len(alive) == 1:
+            return bytes(alive[0])
+        merged = bytearray(HLL_REGISTERS)
+        for registers in alive:
+            merged = bytearray(map(max, merged, registers))
+        return bytes(merged)
+
+    def pfcount(self, *keys: str) -> int:
+        with self._lock:
+            registers = self._hll_union(keys)
+        # Istogramma dei ranghi: al massimo 64 - HLL_BITS + 2 valori distinti
+        histogram = {rank: registers.count(rank) for rank in set(registers)}
+        estimate = HLL_ALPHA * HLL_REGISTERS ** 2 / sum(n * 2.0 ** -r for r, n in histogram.items())
+        zeros = histogram.get(0, 0)
+        if estimate <= 2.5 * HLL_REGISTERS and zeros:
+            # Pochi elementi: linear counting
+            estimate = HLL_REGISTERS * math.log(HLL_REGISTERS / zeros)
+        return int(round(estimate))
+
+    def pfmerge(self, destination: str, *sources: str) -> bool:
+        with self._lock:
+            self._data[destination] = bytearray(self._hll_union((destination,) + sources))
+            self._written()
+            return True
+
+    # ==========================================
+    # PIPELINE
+    # ==========================================
+
+    def pipeline(self, transaction: bool = True) -> 'LocalPipeline':
+        return LocalPipeline(self, transaction)
+
+
+class LocalPipeline:
+    """
+    Pipeline compatibile con redis-py: accoda i comandi ed esegue sotto lock
+
+    Supporta anche WATCH/MULTI: dopo watch() i comandi sono immediati fino a
+    multi(), ed execute() fallisce con WatchError se una chiave osservata è
+    cambiata nel frattempo.
+
+    Errori come in Redis: in una transazione un comando malformato (argomenti
+    non validi) annulla tutto prima di applicare qualsiasi scrittura
+    (EXECABORT); un errore in esecuzione (es. tipo sbagliato) non ferma gli
+    altri comandi e finisce nei risultati, sollevato dopo l'esecuzione se
+    raise_on_error=True.
+    """
+
+    # Firma dei comandi, per validare le transazioni prima di eseguirle
+    _signatures: Dict[str, inspect.Signature] = {}
+
+    def __init__(self, store: LocalStore, transaction: bool = True):
+        self._store = store
+        self.transaction = transaction
+        self._commands: List[tuple] = []
+        self._watched: Optional[Dict[str, bytes]] = None
+        self._multi = False
+
+    def __getattr__(self, name: str):
+        method = getattr(self._store, name)
+        if self._watched is not None and not self._multi:
+            return method
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def _version(self, key: str) -> bytes:
+        """Stato della chiave (valore + scadenza) per il confronto di WATCH"""
+        value = self._store._data.get(key) if self._store._alive(key) else None
+        return pickle.dumps((value, self._store._expires.get(key)))
+
+    def watch(self, *keys: str):
+        with self._store._lock:
+            if self._watched is None:
+                self._watched = {}
+            for key in keys:
+                self._watched[key] = self._version(key)
+
+    def multi(self):
+        self._multi = True
+
+    def unwatch(self):
+        self._watched = None
+
+    def reset(self):
+        self._commands = []
+        self._watched = None
+        self._multi = False
+
+    def _validate(self):
+        """Verifica gli argomenti di ogni comando prima di applicarne uno"""
+        for method, args, kwargs in self._commands:
+            signature = self._signatures.get(method.__name__)
+            if signature is None:
+                signature = self._signatures[method.__name__] = inspect.signature(method)
+            try:
+                signature.bind(*args, **kwargs)
+            except TypeError as e:
+                raise TypeError(f"EXECABORT {method.__name__}: {e}") from None
+
+    def execute(self, raise_on_error: bool = True) -> List[Any]:
+        with self._store._lock:
+            try:
+                if self._watched and any(self._version(key) != version
+                                         for key, version in self._watched.items()):
+                    raise WatchError("Watched variable changed.")
+                if self.transaction:
+                    self._validate()
+                results = []
+                for method, args, kwargs in self._commands:
+                    try:
+                        results.append(method(*args, **kwargs))
+                    except Exception as e:
+                        results.append(e)
+            finally:
+                self.reset()
+
+        if raise_on_error:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
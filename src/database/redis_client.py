@@ -1,32 +1,169 @@
 """
 Redis Database Client
 Gestisce la connessione e le operazioni con Upstash Redis
+
+Il backend di storage è scelto da STORAGE_BACKEND:
+- "upstash" (default): Upstash/Redis remoto
+- "local": LocalStore embedded in-process con snapshot su disco
+Entrambi espongono la stessa interfaccia (sottoinsieme dei comandi redis-py).
+
+STORAGE_ENCODING=compact salva offerte postate e cache prezzi nel formato
+binario di database/codec.py; i valori JSON esistenti restano leggibili.
 """
 
 import os
+import sys
+import copy
 import json
 import logging
 import re
-from typing import Dict, List, Optional, Any
+import zlib
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Any, Set, Tuple
 from datetime import datetime, timedelta
+import pytz
 import redis
 from redis.exceptions import RedisError
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.local_store import LocalStore
+from database.codec import encode_posted, decode_posted, encode_price, decode_price
+from database.event_bus import bus_from_env
+from utils.canonical import CanonicalIndex, tokenize
+
 logger = logging.getLogger(__name__)
 
+# Durata dello storico offerte postate
+POSTED_TTL = timedelta(days=30)
+# Per quanto tempo un post resta aggiornabile (prezzo/scadenza)
+LIVE_TTL = timedelta(days=7)
+# Aggregati del recap settimanale: offerte in classifica e durata dei bucket
+RECAP_TOP_K = 10
+RECAP_TTL = timedelta(weeks=5)
+# Fuso in cui si calcola la settimana del recap (lo stesso dello scheduler)
+RECAP_TIMEZONE = pytz.timezone(os.getenv('TIMEZONE', 'Europe/Rome'))
+# Contatori dei click sui pulsanti ed eventi grezzi
+CLICKS_TTL = timedelta(days=90)
+CLICK_EVENTS_TTL = timedelta(days=30)
+# Token troppo comuni per l'indice inverso delle wishlist
+WISHLIST_STOPWORDS = {'a', 'an', 'and', 'of', 'the', 'to', 'in', 'on', 'for'}
+# Numeri romani rimasti come token (i-xx)
+_ROMAN_TOKEN = re.compile(r'x{0,2}(ix|iv|v?i{0,3})')
+
+
+def _wish_tokens(title: str) -> List[str]:
+    """Token canonici di un titolo, senza stopword e senza 's' finale (baldurs → baldur)"""
+    tokens = []
+    for token in tokenize(title):
+        if token in WISHLIST_STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s'):
+            token = token[:-1]
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def _wish_anchors(tokens: List[str]) -> List[str]:
+    """
+    Token sotto cui indicizzare un desiderio: i due più lunghi
+
+    Con due ancore un desiderio che tollera una parola mancante viene trovato
+    comunque, e i token corti e comuni ("2", "3") non gonfiano le liste.
+    """
+    return sorted(tokens, key=len, reverse=True)[:2]
+
+
+def _wish_is_number(token: str) -> bool:
+    """Numero di capitolo (cifre o numero romano non convertito da tokenize)"""
+    return token.isdigit() or bool(_ROMAN_TOKEN.fullmatch(token))
+
+
+def _wish_matches(wish: List[str], tokens: Set[str]) -> bool:
+    """
+    Un desiderio corrisponde a un titolo se ne contiene tutti i numeri e
+    tutte le parole, con una parola di scarto oltre i due token
+    ("baldur gate 3" non trova "Baldur's Gate 2")
+    """
+    words = []
+    for token in wish:
+        if _wish_is_number(token):
+            if token not in tokens:
+                return False
+        else:
+            words.append(token)
+    hits = sum(1 for token in words if token in tokens)
+    return hits >= (len(words) if len(wish) <= 2 else len(words) - 1)
+
+
 class RedisClient:
     """Client per gestire il database Redis"""
     
-    def __init__(self):
+    def __init__(self, backend: str = None, prefix: str = None):
+        """
+        Args:
+            backend: "upstash" o "local" (default: env STORAGE_BACKEND)
+            prefix: Prefisso chiavi (default: env REDIS_PREFIX o "brisly:gaming:")
+        """
+        self.backend = (backend or os.getenv('STORAGE_BACKEND', 'upstash')).lower()
+        
+        # Prefisso per questo bot (per non mischiare con altri canali)
+        self.prefix = prefix or os.getenv('REDIS_PREFIX', 'brisly:gaming:')
+        
+        # Formato payload: "json" (legacy) o "compact" (binario a schema fisso)
+        self.compact = os.getenv('STORAGE_ENCODING', 'json').lower() == 'compact'
+        self.compress = os.getenv('STORAGE_COMPRESSION', 'false').lower() == 'true'
+        
+        # Layout offerte postate: "keys" (una chiave con TTL per offerta) o
+        # "buckets" (hash piccoli per shard, scadenza con sweep giornaliero)
+        self.posted_layout = os.getenv('POSTED_LAYOUT', 'keys').lower()
+        self.posted_buckets = int(os.getenv('POSTED_BUCKETS', '16384'))
+        if self.posted_layout == 'buckets' and not self.compact:
+            # Record JSON oltre hash-max-listpack-value (64 B): i bucket diventano
+            # hashtable e il risparmio scende da ~59% a ~20% (benchmark_storage.py layout)
+            logger.warning("⚠️ POSTED_LAYOUT=buckets senza STORAGE_ENCODING=compact: "
+                           "i bucket non restano compatti, usa la codifica compatta")
+        
+        if self.backend == 'local':
+            self.client = LocalStore(
+                path=os.getenv('LOCAL_STORE_PATH', 'data/brisly_store.pkl') or None,
+                snapshot_interval=int(os.getenv('LOCAL_SNAPSHOT_SECONDS', '60'))
+            )
+            # LocalStore conserva i bytes così come sono
+            self.raw = self.client
+            self.binary = self.client
+            logger.info("✅ Storage locale attivo")
+        else:
+            self._connect_upstash()
+        
+        # Identità canonica dei prodotti (dedup, storico prezzi, confronto store)
+        self.identity = CanonicalIndex(self.client, self.prefix)
+        
+        # Eventi delle offerte su Redis Streams (EVENT_BUS=true), condivisi dai canali
+        self.events = bus_from_env(self.client, self.prefix, self._generate_deal_id)
+    
+    def for_prefix(self, prefix: str) -> 'RedisClient':
+        """
+        Client per un altro namespace (es. un secondo canale)
+        
+        Condivide connessioni e identità canonica: stesso ID prodotto su
+        tutti i canali, ma storico postati, outbox e statistiche separati.
+        """
+        if prefix == self.prefix:
+            return self
+        tenant = copy.copy(self)
+        tenant.prefix = prefix
+        return tenant
+    
+    def _connect_upstash(self):
+        """Connessione a Upstash/Redis remoto"""
         self.url = os.getenv('UPSTASH_REDIS_URL')
         self.token = os.getenv('UPSTASH_REDIS_TOKEN')
         
         if not self.url or not self.token:
             raise ValueError("❌ Redis credentials non configurate!")
         
-        # Prefisso per questo bot (per non mischiare con altri canali)
-        self.prefix = "brisly:gaming:"
-        
         # Connessione
         try:
             # Upstash usa REST API, convertiamo in formato Redis
@@ -47,6 +184,14 @@ class RedisClient:
                 decode_responses=True,
                 ssl_cert_reqs=None
             )
+            # Connessione senza decodifica per i payload binari (immagini, formato
+            # compatto); redis-py apre le connessioni solo al primo comando
+            self.binary = redis.from_url(
+                url=redis_url,
+                decode_responses=False,
+                ssl_cert_reqs=None
+            )
+            self.raw = self.binary if self.compact else self.client
             # Test connessione
             self.client.ping()
             logger.info("✅ Redis connesso con successo")
@@ -69,20 +214,35 @@ class RedisClient:
             True se già postata
         """
         key = f"{self.prefix}posted:{deal_id}"
+        
+        if self.posted_layout == 'buckets':
+            # Un solo round-trip: campo nel bucket o chiave legacy non ancora scaduta
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hexists(self._bucket_key(deal_id), deal_id)
+            pipe.exists(key)
+            in_bucket, legacy = pipe.execute()
+            return bool(in_bucket) or legacy > 0
+        
         return self.client.exists(key) > 0
     
-    def mark_deal_posted(self, deal: Dict, message_id: int = None) -> bool:
+    def mark_deal_posted(self, deal: Dict, message_id: int = None, pipe=None) -> bool:
         """
         Marca un'offerta come postata
         
         Args:
             deal: Dizionario con i dati dell'offerta
             message_id: ID del messaggio Telegram (opzionale)
+            pipe: Pipeline di RedisClient.pipeline() in cui accodare le scritture
+                  (eseguita dal chiamante); se None le scritture partono subito
             
         Returns:
             True se salvata con successo
         """
         try:
+            execute = pipe is None
+            if execute:
+                pipe = self.pipeline()
+            
             # Crea ID univoco
             deal_id = self._generate_deal_id(deal)
             key = f"{self.prefix}posted:{deal_id}"
@@ -99,17 +259,30 @@ class RedisClient:
                 'brislyscore': deal.get('brislyscore', 0)
             }
             
-            # Salva con TTL di 30 giorni (per non tenere troppo storico)
-            self.client.setex(
-                key,
-                timedelta(days=30),
-                json.dumps(data)
-            )
+            payload = encode_posted(data, self.compact, self.compress)
+            
+            if self.posted_layout == 'buckets':
+                # Campo nel bucket; la scadenza la gestisce sweep_posted_buckets
+                bucket = self._bucket_key(deal_id)
+                pipe.hset(bucket, deal_id, payload)
+                pipe.expire(bucket, POSTED_TTL + timedelta(days=1))
+            else:
+                # Salva con TTL di 30 giorni (per non tenere troppo storico)
+                pipe.setex(key, POSTED_TTL, payload)
             
             # Aggiungi a set giornaliero
             today_key = f"{self.prefix}posted:daily:{datetime.now().strftime('%Y-%m-%d')}"
-            self.client.sadd(today_key, deal_id)
-            self.client.expire(today_key, timedelta(days=7))
+            pipe.sadd(today_key, deal_id)
+            pipe.expire(today_key, timedelta(days=7))
+            
+            # Aggregati della settimana, aggiornati nello stesso commit
+            self.record_weekly_post(deal, pipe)
+            if self.events:
+                self.events.publish('posted', [deal], pipe=pipe,
+                                    channel=self.prefix, message_id=message_id)
+            
+            if execute:
+                pipe.execute()
             
             logger.info(f"✅ Offerta salvata: {deal_id}")
             return True
@@ -118,6 +291,109 @@ class RedisClient:
             logger.error(f"❌ Errore salvataggio offerta: {e}")
             return False
     
+    def get_posted_deal(self, deal_id: str) -> Optional[Dict]:
+        """
+        Ottiene il record di un'offerta postata (formato compatto o JSON legacy)
+        
+        Args:
+            deal_id: ID univoco dell'offerta
+            
+        Returns:
+            Dati salvati o None
+        """
+        key = f"{self.prefix}posted:{deal_id}"
+        
+        if self.posted_layout == 'buckets':
+            data = self.raw.hget(self._bucket_key(deal_id), deal_id)
+            if data is not None:
+                return decode_posted(data)
+        
+        return decode_posted(self.raw.get(key))
+    
+    def _bucket_key(self, deal_id: str) -> str:
+        """Bucket hash che contiene l'offerta (crc32 dell'ID modulo numero bucket)"""
+        shard = zlib.crc32(deal_id.encode('utf-8')) % self.posted_buckets
+        return f"{self.prefix}posted:bucket:{shard}"
+    
+    def sweep_posted_buckets(self, batch_size: int = 256) -> int:
+        """
+        Rimuove dai bucket le offerte più vecchie di 30 giorni
+        (sostituisce il TTL per chiave nel layout "buckets", da eseguire ogni giorno)
+        
+        Args:
+            batch_size: Bucket letti per pipeline
+            
+        Returns:
+            Numero di record rimossi
+        """
+        if self.posted_layout != 'buckets':
+            return 0
+        
+        cutoff = datetime.now() - POSTED_TTL
+        removed = 0
+        
+        for start in range(0, self.posted_buckets, batch_size):
+            buckets = [
+                f"{self.prefix}posted:bucket:{shard}"
+                for shard in range(start, min(start + batch_size, self.posted_buckets))
+            ]
+            pipe = self.raw.pipeline(transaction=False)
+            for bucket in buckets:
+                pipe.hgetall(bucket)
+            
+            cleanup = self.raw.pipeline(transaction=False)
+            for bucket, records in zip(buckets, pipe.execute()):
+                expired = [
+                    field for field, value in records.items()
+                    if datetime.fromisoformat(decode_posted(value)['posted_at']) < cutoff
+                ]
+                if expired:
+                    cleanup.hdel(bucket, *expired)
+                    removed += len(expired)
+            if len(cleanup):
+                cleanup.execute()
+        
+        logger.info(f"🧹 Sweep bucket completato: {removed} offerte scadute rimosse")
+        return removed
+    
+    def mark_digest_posted(self, deals: List[Dict], message_id: int, pipe=None) -> bool:
+        """
+        Marca come postate le offerte di un digest (un solo messaggio)
+        
+        Args:
+            deals: Offerte incluse nel digest
+            message_id: ID del messaggio del digest
+            pipe: Pipeline del chiamante (es. commit dell'outbox); se None
+                  viene eseguita una transazione propria
+            
+        Returns:
+            True se salvato (o accodato) con successo
+        """
+        try:
+            execute = pipe is None
+            if execute:
+                pipe = self.pipeline()
+            for deal in deals:
+                self.mark_deal_posted(deal, message_id, pipe=pipe)
+                self.increment_stat(f"posts_{deal['source']}", pipe=pipe)
+            
+            digest_key = f"{self.prefix}digests:daily:{datetime.now().strftime('%Y-%m-%d')}"
+            pipe.sadd(digest_key, message_id)
+            pipe.expire(digest_key, timedelta(days=7))
+            self.increment_stat('total_posts', len(deals), pipe=pipe)
+            self.increment_stat('total_digests', pipe=pipe)
+            if execute:
+                pipe.execute()
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Errore salvataggio digest: {e}")
+            return False
+    
+    def get_digest_count_today(self) -> int:
+        """Numero di digest pubblicati oggi"""
+        return self.client.scard(f"{self.prefix}digests:daily:{datetime.now().strftime('%Y-%m-%d')}")
+    
     def get_posted_count_today(self) -> int:
         """
         Conta quante offerte sono state postate oggi
@@ -128,22 +404,72 @@ class RedisClient:
         today_key = f"{self.prefix}posted:daily:{datetime.now().strftime('%Y-%m-%d')}"
         return self.client.scard(today_key)
     
+    # ==========================================
+    # POST ATTIVI (aggiornamento prezzi)
+    # ==========================================
+    
+    def track_live_post(self, deal: Dict, message_id: int, media: str = 'text', pipe=None):
+        """
+        Registra un post pubblicato come aggiornabile
+        
+        Args:
+            deal: Offerta completa così come è stata renderizzata
+            message_id: ID del messaggio sul canale
+            media: 'photo' (banner, si modifica la didascalia) o 'text'
+            pipe: Pipeline in cui accodare la scrittura (opzionale)
+        """
+        entry = {
+            'deal': deal,
+            'message_id': message_id,
+            'media': media,
+            'posted_at': datetime.now().isoformat(),
+            'misses': 0,
+        }
+        (pipe if pipe is not None else self.client).hset(
+            f"{self.prefix}live:posts", self._generate_deal_id(deal), json.dumps(entry)
+        )
+    
+    def get_live_posts(self) -> Dict[str, Dict]:
+        """
+        Post ancora aggiornabili
+        
+        Returns:
+            Dizionario ID offerta → {deal, message_id, media, posted_at, misses}
+        """
+        raw = self.client.hgetall(f"{self.prefix}live:posts")
+        return {deal_id: json.loads(value) for deal_id, value in raw.items()}
+    
+    def save_live_posts(self, entries: Dict[str, Dict], removed: List[str] = ()):
+        """Aggiorna e rimuove post attivi in un'unica transazione"""
+        key = f"{self.prefix}live:posts"
+        pipe = self.client.pipeline(transaction=True)
+        if entries:
+            pipe.hset(key, mapping={k: json.dumps(v) for k, v in entries.items()})
+        if removed:
+            pipe.hdel(key, *removed)
+        if len(pipe):
+            pipe.execute()
+    
     # ==========================================
     # GESTIONE STATISTICHE
     # ==========================================
     
-    def increment_stat(self, stat_name: str, value: int = 1) -> int:
+    def increment_stat(self, stat_name: str, value: int = 1, pipe=None) -> Optional[int]:
         """
         Incrementa una statistica
         
         Args:
             stat_name: Nome della statistica
             value: Valore da aggiungere (default 1)
+            pipe: Pipeline in cui accodare l'incremento (opzionale)
             
         Returns:
-            Nuovo valore
+            Nuovo valore (None se accodato in pipeline)
         """
         key = f"{self.prefix}stats:{stat_name}"
+        if pipe is not None:
+            pipe.incrby(key, value)
+            return None
         return self.client.incrby(key, value)
     
     def get_stat(self, stat_name: str) -> int:
@@ -176,6 +502,154 @@ class RedisClient:
         
         return stats
     
+    # ==========================================
+    # RECAP SETTIMANALE
+    # ==========================================
+    
+    @staticmethod
+    def week_id(when: datetime = None) -> str:
+        """Settimana ISO di una data (es: "2024-W07"), default: adesso nel fuso TIMEZONE"""
+        year, week, _ = (when or datetime.now(RECAP_TIMEZONE)).isocalendar()
+        return f"{year}-W{week:02d}"
+    
+    def record_weekly_post(self, deal: Dict, pipe):
+        """
+        Aggiorna gli aggregati della settimana corrente con un'offerta postata
+        
+        Un bucket per settimana ISO, tutto a costo costante per post:
+        - top: sorted set dei migliori BrislyScore, tagliato a RECAP_TOP_K
+        - best: sorted set con solo lo sconto più alto
+        - sources: post per fonte
+        - totals: post e risparmio totale (in centesimi)
+        
+        Args:
+            deal: Offerta postata
+            pipe: Pipeline in cui accodare le scritture
+        """
+        base = f"{self.prefix}recap:{self.week_id()}"
+        entry = json.dumps({
+            'id': self._generate_deal_id(deal),
+            'title': deal.get('title'),
+            'platform': deal.get('platform'),
+            'source': deal.get('source'),
+            'url': deal.get('url'),
+            'image_url': deal.get('image_url'),
+            'original_price': deal.get('original_price'),
+            'discounted_price': deal.get('discounted_price'),
+            'discount_percent': deal.get('discount_percent'),
+            'score': deal.get('brislyscore', 0),
+            'emoji': (deal.get('brislyscore_data') or {}).get('emoji'),
+        }, separators=(',', ':'))
+        saving = (deal.get('original_price') or 0) - (deal.get('discounted_price') or 0)
+        
+        pipe.zadd(f"{base}:top", {entry: deal.get('brislyscore', 0)})
+        pipe.zremrangebyrank(f"{base}:top", 0, -(RECAP_TOP_K + 1))
+        pipe.zadd(f"{base}:best", {entry: deal.get('discount_percent') or 0})
+        pipe.zremrangebyrank(f"{base}:best", 0, -2)
+        pipe.hincrby(f"{base}:sources", deal.get('source') or 'unknown', 1)
+        pipe.hincrby(f"{base}:totals", 'posts', 1)
+        pipe.hincrby(f"{base}:totals", 'savings_cents', max(0, round(saving * 100)))
+        for suffix in ('top', 'best', 'sources', 'totals'):
+            pipe.expire(f"{base}:{suffix}", RECAP_TTL)
+    
+    def get_weekly_recap(self, week: str = None) -> Dict:
+        """
+        Aggregati di una settimana (quattro letture, nessuna scansione)
+        
+        Args:
+            week: Settimana ISO (default: corrente)
+            
+        Returns:
+            {week, posts, savings, top, best_discount, sources}
+        """
+        week = week or self.week_id()
+        base = f"{self.prefix}recap:{week}"
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zrevrange(f"{base}:top", 0, RECAP_TOP_K - 1, withscores=True)
+        pipe.zrevrange(f"{base}:best", 0, 0)
+        pipe.hgetall(f"{base}:sources")
+        pipe.hgetall(f"{base}:totals")
+        top, best, sources, totals = pipe.execute()
+        
+        return {
+            'week': week,
+            'posts': int(totals.get('posts', 0)),
+            'savings': int(totals.get('savings_cents', 0)) / 100,
+            'top': [json.loads(entry) for entry, _ in top],
+            'best_discount': json.loads(best[0]) if best else None,
+            'sources': {source: int(count) for source, count in sources.items()},
+        }
+    
+    # ==========================================
+    # CLICK TRACKING
+    # ==========================================
+    
+    def record_clicks(self, events: List[Tuple[float, str, str, str]]) -> int:
+        """
+        Salva un blocco di click in un'unica pipeline
+        
+        - clicks:deal:<id>: click per pulsante (hash)
+        - clicks:uniq:<id> e clicks:uniq:day:<data>: visitatori unici (HyperLogLog,
+          dimensione fissa indipendente dal numero di utenti)
+        - clicks:events:<data>: eventi grezzi (lista JSON compatta)
+        
+        Args:
+            events: (timestamp, ID offerta, pulsante, visitatore)
+            
+        Returns:
+            Numero di eventi salvati
+        """
+        if not events:
+            return 0
+        
+        counts = Counter((deal_id, button) for _, deal_id, button, _ in events)
+        visitors: Dict[str, Set[str]] = defaultdict(set)
+        daily: Dict[str, Set[str]] = defaultdict(set)
+        raw: Dict[str, List[str]] = defaultdict(list)
+        for timestamp, deal_id, button, visitor in events:
+            day = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
+            visitors[deal_id].add(visitor)
+            daily[day].add(visitor)
+            raw[day].append(json.dumps([round(timestamp, 3), deal_id, button, visitor],
+                                       separators=(',', ':')))
+        
+        pipe = self.client.pipeline(transaction=False)
+        for (deal_id, button), count in counts.items():
+            pipe.hincrby(f"{self.prefix}clicks:deal:{deal_id}", button, count)
+        for deal_id, members in visitors.items():
+            pipe.pfadd(f"{self.prefix}clicks:uniq:{deal_id}", *members)
+        for deal_id in visitors:
+            pipe.expire(f"{self.prefix}clicks:deal:{deal_id}", CLICKS_TTL)
+            pipe.expire(f"{self.prefix}clicks:uniq:{deal_id}", CLICKS_TTL)
+        for day, members in daily.items():
+            pipe.pfadd(f"{self.prefix}clicks:uniq:day:{day}", *members)
+            pipe.expire(f"{self.prefix}clicks:uniq:day:{day}", CLICKS_TTL)
+        for day, lines in raw.items():
+            pipe.rpush(f"{self.prefix}clicks:events:{day}", *lines)
+            pipe.expire(f"{self.prefix}clicks:events:{day}", CLICK_EVENTS_TTL)
+        self.increment_stat('total_clicks', len(events), pipe=pipe)
+        pipe.execute()
+        return len(events)
+    
+    def get_click_stats(self, deal_id: str) -> Dict:
+        """
+        Click di un'offerta
+        
+        Returns:
+            {buttons: {pulsante: click}, clicks, unique}
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(f"{self.prefix}clicks:deal:{deal_id}")
+        pipe.pfcount(f"{self.prefix}clicks:uniq:{deal_id}")
+        buttons, unique = pipe.execute()
+        buttons = {button: int(count) for button, count in buttons.items()}
+        return {'buttons': buttons, 'clicks': sum(buttons.values()), 'unique': unique}
+    
+    def get_unique_visitors(self, day: str = None) -> int:
+        """Visitatori unici stimati di un giorno (default: oggi)"""
+        day = day or datetime.now().strftime('%Y-%m-%d')
+        return self.client.pfcount(f"{self.prefix}clicks:uniq:day:{day}")
+    
     # ==========================================
     # GESTIONE WISHLIST UTENTI
     # ==========================================
@@ -184,6 +658,8 @@ class RedisClient:
         """
         Aggiunge un gioco alla wishlist di un utente
         
+        Aggiorna anche l'indice inverso token → utenti usato da match_wishlists.
+        
         Args:
             user_id: ID utente Telegram
             game_title: Titolo del gioco
@@ -192,7 +668,42 @@ class RedisClient:
             True se aggiunto con successo
         """
         key = f"{self.prefix}wishlist:{user_id}"
-        return self.client.sadd(key, game_title.lower()) > 0
+        title = game_title.lower()
+        tokens = _wish_tokens(title)
+        
+        pipe = self.client.pipeline(transaction=True)
+        pipe.sadd(key, title)
+        if tokens:
+            member = f"{user_id}:{'-'.join(tokens)}"
+            for token in _wish_anchors(tokens):
+                pipe.sadd(f"{self.prefix}wishidx:{token}", member)
+        return pipe.execute()[0] > 0
+    
+    def remove_from_wishlist(self, user_id: int, game_title: str) -> bool:
+        """
+        Rimuove un gioco dalla wishlist di un utente (e dall'indice inverso)
+        
+        Args:
+            user_id: ID utente Telegram
+            game_title: Titolo del gioco
+            
+        Returns:
+            True se era presente
+        """
+        key = f"{self.prefix}wishlist:{user_id}"
+        title = game_title.lower()
+        if not self.client.srem(key, title):
+            return False
+        
+        tokens = _wish_tokens(title)
+        # Un altro titolo della stessa wishlist può avere gli stessi token
+        if tokens and not any(_wish_tokens(other) == tokens for other in self.client.smembers(key)):
+            member = f"{user_id}:{'-'.join(tokens)}"
+            pipe = self.client.pipeline(transaction=True)
+            for token in _wish_anchors(tokens):
+                pipe.srem(f"{self.prefix}wishidx:{token}", member)
+            pipe.execute()
+        return True
     
     def get_wishlist(self, user_id: int) -> List[str]:
         """
@@ -221,6 +732,206 @@ class RedisClient:
         key = f"{self.prefix}wishlist:{user_id}"
         return self.client.sismember(key, game_title.lower())
     
+    def match_wishlists(self, deals: List[Dict]) -> Dict[str, Set[int]]:
+        """
+        Utenti interessati a ciascuna offerta, in un solo round trip
+        
+        Legge dall'indice inverso solo i token presenti nei titoli delle
+        offerte: il costo dipende dai desideri candidati, non dal numero di
+        utenti. Un desiderio corrisponde se i suoi token sono contenuti nel
+        titolo: i numeri di capitolo sono sempre obbligatori, delle parole
+        una può mancare se il desiderio ha più di due token ("witcher 3 wild
+        hunt goty" trova "The Witcher 3: Wild Hunt", "baldurs gate 3" non
+        trova "Baldur's Gate 2").
+        
+        Args:
+            deals: Offerte da confrontare
+            
+        Returns:
+            {deal_id: set(user_id)} solo per le offerte con almeno un utente
+        """
+        deal_tokens = {}
+        for deal in deals:
+            deal_id = deal.get('product_id') or self._generate_deal_id(deal)
+            deal_tokens[deal_id] = set(_wish_tokens(deal.get('title', '')))
+        
+        lookup = sorted(set().union(*deal_tokens.values())) if deal_tokens else []
+        if not lookup:
+            return {}
+        
+        pipe = self.client.pipeline(transaction=False)
+        for token in lookup:
+            pipe.smembers(f"{self.prefix}wishidx:{token}")
+        postings = dict(zip(lookup, pipe.execute()))
+        
+        matches: Dict[str, Set[int]] = {}
+        for deal_id, tokens in deal_tokens.items():
+            candidates = set()
+            for token in tokens:
+                candidates.update(postings[token])
+            for member in candidates:
+                user_id, slug = member.split(':', 1)
+                if _wish_matches(slug.split('-'), tokens):
+                    matches.setdefault(deal_id, set()).add(int(user_id))
+        return matches
+    
+    def rebuild_wishlist_index(self) -> int:
+        """
+        Ricostruisce l'indice inverso dalle wishlist esistenti
+        
+        Serve una volta per le wishlist salvate prima dell'indice.
+        
+        Returns:
+            Numero di desideri indicizzati
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for key in self.client.scan_iter(match=f"{self.prefix}wishidx:*"):
+            pipe.delete(key)
+        pipe.execute()
+        
+        indexed = 0
+        pipe = self.client.pipeline(transaction=False)
+        for key in self.client.scan_iter(match=f"{self.prefix}wishlist:*"):
+            user_id = key.rsplit(':', 1)[1]
+            for title in self.client.smembers(key):
+                tokens = _wish_tokens(title)
+                if not tokens:
+                    continue
+                member = f"{user_id}:{'-'.join(tokens)}"
+                for token in _wish_anchors(tokens):
+                    pipe.sadd(f"{self.prefix}wishidx:{token}", member)
+                indexed += 1
+        pipe.execute()
+        logger.info(f"🔎 Indice wishlist ricostruito: {indexed} desideri")
+        return indexed
+    
+    # ==========================================
+    # ALERT DI PREZZO
+    # ==========================================
+    
+    def add_price_alert(self, user_id: int, game_title: str, target_price: float,
+                        platform: str = None) -> str:
+        """
+        Avvisa un utente quando un gioco scende sotto un prezzo
+        
+        Un sorted set per prodotto (utente → soglia): la valutazione legge solo
+        i prodotti cambiati, indipendentemente dal numero totale di alert.
+        L'hash alerts:prices contiene solo i prodotti con alert attivi
+        (vuoto = prezzo non ancora valutato).
+        
+        Args:
+            user_id: ID utente Telegram
+            game_title: Titolo del gioco
+            target_price: Prezzo obiettivo in euro (incluso)
+            platform: Piattaforma (default: famiglia Steam)
+            
+        Returns:
+            ID prodotto canonico dell'alert
+        """
+        # Input utente: nessun alias imparato nell'indice condiviso
+        product_id = self.identity.lookup_product_id(game_title, platform)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zadd(f"{self.prefix}alerts:{product_id}", {user_id: target_price})
+        pipe.hsetnx(f"{self.prefix}alerts:prices", product_id, '')
+        pipe.hset(f"{self.prefix}alerts:user:{user_id}", product_id,
+                  json.dumps({'title': game_title, 'target': target_price}))
+        pipe.execute()
+        return product_id
+    
+    def remove_price_alert(self, user_id: int, product_id: str) -> bool:
+        """Rimuove l'alert di un utente su un prodotto"""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zrem(f"{self.prefix}alerts:{product_id}", user_id)
+        pipe.hdel(f"{self.prefix}alerts:user:{user_id}", product_id)
+        pipe.zcard(f"{self.prefix}alerts:{product_id}")
+        _, removed, remaining = pipe.execute()
+        if not remaining:
+            # Nessun alert rimasto: il prodotto esce dal confronto prezzi
+            self.client.hdel(f"{self.prefix}alerts:prices", product_id)
+        return removed > 0
+    
+    def get_price_alerts(self, user_id: int) -> Dict[str, Dict]:
+        """
+        Alert attivi di un utente
+        
+        Returns:
+            ID prodotto → {title, target}
+        """
+        raw = self.client.hgetall(f"{self.prefix}alerts:user:{user_id}")
+        return {product_id: json.loads(value) for product_id, value in raw.items()}
+    
+    def match_price_alerts(self, deals: List[Dict]) -> Tuple[Dict[str, Dict[int, float]], Dict[str, int]]:
+        """
+        Alert soddisfatti dai prezzi appena raccolti
+        
+        Due round trip: prezzi dell'ultima valutazione (HMGET, solo i prodotti
+        con alert vi compaiono), poi ZRANGEBYSCORE <prezzo> +inf e ZCARD per
+        ogni prodotto con alert e prezzo cambiato.
+        
+        Args:
+            deals: Offerte dell'ultimo scraping
+            
+        Returns:
+            (ID prodotto → {utente: soglia}, ID prodotto → prezzo in centesimi
+             dei prodotti cambiati, None se non restano alert; da salvare con
+             consume_price_alerts)
+        """
+        prices = {}
+        for deal in deals:
+            if deal.get('discounted_price') is None:
+                continue
+            product_id = deal.get('product_id') or self._generate_deal_id(deal)
+            prices[product_id] = int(round(float(deal['discounted_price']) * 100))
+        if not prices:
+            return {}, {}
+        
+        ids = list(prices)
+        last = self.client.hmget(f"{self.prefix}alerts:prices", ids)
+        # None = nessun alert sul prodotto, '' = alert mai valutato
+        changed = {
+            product_id: prices[product_id]
+            for product_id, previous in zip(ids, last)
+            if previous is not None and (previous == '' or int(previous) != prices[product_id])
+        }
+        if not changed:
+            return {}, {}
+        
+        pipe = self.client.pipeline(transaction=False)
+        for product_id, cents in changed.items():
+            pipe.zrangebyscore(f"{self.prefix}alerts:{product_id}", cents / 100, '+inf', withscores=True)
+            pipe.zcard(f"{self.prefix}alerts:{product_id}")
+        results = pipe.execute()
+        
+        matches = {}
+        for i, product_id in enumerate(list(changed)):
+            fired, total = results[2 * i], results[2 * i + 1]
+            if fired:
+                matches[product_id] = {int(user_id): threshold for user_id, threshold in fired}
+            if total <= len(fired):
+                # Tutti gli alert scattano (o non ce ne sono più): via dal confronto
+                changed[product_id] = None
+        return matches, changed
+    
+    def consume_price_alerts(self, matches: Dict[str, Dict[int, float]], prices: Dict[str, int], pipe):
+        """
+        Rimuove gli alert scattati e salva i prezzi valutati
+        
+        Args:
+            matches: Primo valore restituito da match_price_alerts
+            prices: Secondo valore restituito da match_price_alerts
+            pipe: Pipeline del chiamante (nello stesso commit dei job di notifica)
+        """
+        for product_id, users in matches.items():
+            pipe.zrem(f"{self.prefix}alerts:{product_id}", *users)
+            for user_id in users:
+                pipe.hdel(f"{self.prefix}alerts:user:{user_id}", product_id)
+        kept = {k: str(v) for k, v in prices.items() if v is not None}
+        dropped = [k for k, v in prices.items() if v is None]
+        if kept:
+            pipe.hset(f"{self.prefix}alerts:prices", mapping=kept)
+        if dropped:
+            pipe.hdel(f"{self.prefix}alerts:prices", *dropped)
+    
     # ==========================================
     # CACHE PREZZI
     # ==========================================
@@ -242,10 +953,10 @@ class RedisClient:
         price_data['cached_at'] = datetime.now().isoformat()
         
         # Salva con TTL di 24 ore
-        return self.client.setex(
+        return self.raw.setex(
             key,
             timedelta(hours=24),
-            json.dumps(price_data)
+            encode_price(price_data, self.compact, self.compress)
         )
     
     def get_cached_price(self, deal_id: str) -> Optional[Dict]:
@@ -259,31 +970,38 @@ class RedisClient:
             Dati prezzo o None
         """
         key = f"{self.prefix}price:{deal_id}"
-        data = self.client.get(key)
+        data = self.raw.get(key)
         
         if data:
-            return json.loads(data)
+            return decode_price(data)
         return None
     
     # ==========================================
     # UTILITY
     # ==========================================
     
+    def pipeline(self):
+        """
+        Pipeline transazionale (MULTI/EXEC) per scritture atomiche
+        
+        Usa la connessione dei payload, così può contenere anche record binari.
+        """
+        return self.raw.pipeline(transaction=True)
+    
     def _generate_deal_id(self, deal: Dict) -> str:
         """
         Genera ID univoco per un'offerta
         
+        L'ID è il prodotto canonico: stesso gioco e piattaforma danno lo stesso
+        ID anche con titoli scritti diversamente o da store diversi.
+        
         Args:
             deal: Dizionario offerta
             
         Returns:
-            ID univoco (es: "cyberpunk-2077-steam-instant-gaming")
+            ID univoco (es: "cyberpunk-2077-steam")
         """
-        title = deal.get('title', '').lower().replace(' ', '-').replace(':', '')
-        platform = deal.get('platform', '').lower()
-        source = deal.get('source', '').lower()
-        
-        return f"{title}-{platform}-{source}"
+        return self.identity.product_id(deal)
     
     def health_check(self) -> bool:
         """
@@ -310,6 +1028,7 @@ class RedisClient:
                 'connected': self.health_check(),
                 'posted_today': self.get_posted_count_today(),
                 'total_posts': self.get_stat('total_posts'),
+                'backend': self.backend,
                 'prefix': self.prefix
             }
             return info
@@ -0,0 +1,186 @@
+"""
+Load Test
+Spinge migliaia di offerte attraverso il vero percorso di invio
+(TelegramPoster → SendQueue → PTB/HTTPX) verso la Fake Bot API locale
+
+Uso:
+    python src/load_test.py --deals 2000 --latency 40 --jitter 40 --rate-429 0.01 --rate-5xx 0.01
+    python src/load_test.py --url http://127.0.0.1:8081/bot   # server già avviato
+    python src/load_test.py --fanout 5000                     # notifiche wishlist
+
+Misura throughput, retry (429/5xx) e percentili di latenza end-to-end
+(dall'accodamento alla conferma di Telegram). Con --fanout invia un'offerta
+in privato a N utenti che la hanno in wishlist (storage locale in memoria).
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+from typing import Dict, List, Optional
+
+from scrapers.mock_data import MockDataProvider
+from utils.brislyscore import BrislyScore
+from bot.fake_bot_api import FakeBotAPI
+
+
+def _deals(count: int) -> List[Dict]:
+    """Offerte sintetiche tutte diverse, con BrislyScore"""
+    scorer = BrislyScore()
+    base = MockDataProvider().mock_deals
+    scores = [scorer.calculate(deal) for deal in base]
+
+    deals = []
+    for i in range(count):
+        template = base[i % len(base)]
+        deal = dict(
+            template,
+            title=f"{template['title']} #{i}",
+            url=f"https://example.com/deal/{i}",
+        )
+        deal['brislyscore_data'] = scores[i % len(base)]
+        deals.append(deal)
+    return deals
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run(args) -> Dict:
+    api: Optional[FakeBotAPI] = None
+    base_url = args.url
+    if not base_url:
+        api = FakeBotAPI(
+            latency_ms=args.latency, jitter_ms=args.jitter, rate_429=args.rate_429,
+            retry_after=args.retry_after, rate_5xx=args.rate_5xx,
+            flood_per_minute=args.flood_per_minute, seed=args.seed
+        )
+        base_url = await api.start()
+
+    # Il poster legge configurazione e limiti dall'ambiente
+    os.environ['TELEGRAM_API_BASE_URL'] = base_url
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:loadtest')
+    os.environ['TELEGRAM_CHANNEL_PER_MINUTE'] = str(args.channel_per_minute)
+    os.environ['TELEGRAM_GLOBAL_PER_SECOND'] = str(args.global_per_second)
+    from bot.telegram_poster import TelegramPoster
+
+    if args.fanout:
+        os.environ['STORAGE_BACKEND'] = 'local'
+        os.environ['LOCAL_STORE_PATH'] = ''
+        from database.redis_client import RedisClient
+        db = RedisClient()
+        poster = TelegramPoster(db)
+        await poster.start()
+        report = await _fanout(db, poster, args.fanout, base_url)
+    else:
+        poster = TelegramPoster()
+        await poster.start()
+        report = await _publish(poster, args.deals, base_url)
+
+    await poster.stop()
+    if api:
+        report['server'] = dict(api.stats)
+        await api.stop()
+        print(f"  Server:        429={api.stats.get('429', 0)} 502={api.stats.get('502', 0)} "
+              f"ok={api.stats.get('ok', 0)}")
+    print("="*60)
+    return report
+
+
+async def _fanout(db, poster, users: int, base_url: str) -> Dict:
+    """Un'offerta notificata in privato a N utenti"""
+    from bot.wishlist_fanout import WishlistFanout
+
+    deal = _deals(1)[0]
+    for user_id in range(1, users + 1):
+        db.add_to_wishlist(user_id, deal['title'])
+
+    fanout = WishlistFanout(db, poster)
+    print(f"\n🚀 Fan-out di 1 offerta a {users:,} utenti verso {base_url} ...")
+    fanout.plan([deal])
+    report = (await fanout.drain())[0]
+
+    print("\n" + "="*60)
+    print("📊 RISULTATI FAN-OUT WISHLIST")
+    print("="*60)
+    print(f"  Consegnate:    {report['delivered']:,}/{report['total']:,} "
+          f"({report['blocked']} bloccati, {report['failed']} errori)")
+    print(f"  Ultimo utente: {report['time_to_last']:.1f}s")
+    print(f"  Throughput:    {report['delivered_per_second']:.1f} msg/s")
+    print(f"  Coda:          {dict(poster.queue.stats)}")
+    return report
+
+
+async def _publish(poster, count: int, base_url: str) -> Dict:
+    """N offerte pubblicate sul canale"""
+    deals = _deals(count)
+
+    latencies: List[float] = []
+
+    async def timed(deal: Dict) -> bool:
+        start = time.perf_counter()
+        message_id = await poster.publish_deal(deal, deal['brislyscore_data'])
+        latencies.append(time.perf_counter() - start)
+        return message_id is not None
+
+    print(f"\n🚀 Invio di {len(deals):,} offerte verso {base_url} ...")
+    started = time.perf_counter()
+    results = await asyncio.gather(*(timed(deal) for deal in deals))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    report = {
+        'sent': sum(results),
+        'failed': len(results) - sum(results),
+        'elapsed': elapsed,
+        'throughput': sum(results) / elapsed if elapsed else 0.0,
+        'p50': _percentile(latencies, 50),
+        'p90': _percentile(latencies, 90),
+        'p99': _percentile(latencies, 99),
+        'max': latencies[-1],
+        'mean': statistics.mean(latencies),
+        'queue': dict(poster.queue.stats),
+    }
+
+    print("\n" + "="*60)
+    print("📊 RISULTATI LOAD TEST")
+    print("="*60)
+    print(f"  Inviate:       {report['sent']:,}/{len(deals):,} ({report['failed']} fallite)")
+    print(f"  Durata:        {elapsed:.1f}s")
+    print(f"  Throughput:    {report['throughput']:.1f} msg/s")
+    print(f"  Latenza e2e:   p50 {report['p50']:.2f}s | p90 {report['p90']:.2f}s | "
+          f"p99 {report['p99']:.2f}s | max {report['max']:.2f}s")
+    print(f"  Coda:          {report['queue']}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test del percorso di invio")
+    parser.add_argument('--deals', type=int, default=2000)
+    parser.add_argument('--fanout', type=int, default=0, help="Utenti per il test notifiche wishlist")
+    parser.add_argument('--url', default=None, help="Base URL di una Bot API già avviata")
+    parser.add_argument('--latency', type=float, default=30, help="ms per richiesta")
+    parser.add_argument('--jitter', type=float, default=30, help="ms casuali aggiuntivi")
+    parser.add_argument('--rate-429', type=float, default=0.005)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--rate-5xx', type=float, default=0.005)
+    parser.add_argument('--flood-per-minute', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    # Limiti della coda: di default quello globale (30/s) è il collo di bottiglia
+    parser.add_argument('--channel-per-minute', type=float, default=1800)
+    parser.add_argument('--global-per-second', type=float, default=30)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
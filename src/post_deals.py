@@ -17,6 +17,7 @@ from dotenv import load_dotenv
 from scrapers.instant_gaming import InstantGamingScraper
 from scrapers.gamivo import GamivoScraper
 from utils.brislyscore import BrislyScore
+from utils.deal_merger import DealMerger
 from bot.telegram_poster import TelegramPoster
 from database.redis_client import RedisClient
 
@@ -36,8 +37,9 @@ class DealsPoster:
         self.ig_scraper = InstantGamingScraper()
         self.gv_scraper = GamivoScraper()
         self.scorer = BrislyScore()
-        self.poster = TelegramPoster()
         self.db = RedisClient()  # AGGIUNGI QUESTA RIGA
+        self.poster = TelegramPoster(self.db)
+        self.merger = DealMerger(self.db.identity)
         
         logger.info("🎮 DealsPoster inizializzato")
     
@@ -58,7 +60,11 @@ class DealsPoster:
         logger.info(f"  ✅ {len(gv_deals)} deals da GAMIVO")
         
         logger.info(f"📊 Totale deals raccolti: {len(all_deals)}")
-        return all_deals
+        
+        # Stesso gioco su più store: resta il prezzo migliore
+        merged = self.merger.merge(all_deals)
+        self.db.identity.flush()
+        return merged
     
     def score_and_rank_deals(self, deals: List[Dict]) -> List[Dict]:
         """Calcola BrislyScore e ordina deals"""
@@ -143,6 +149,7 @@ class DealsPoster:
         
         # 4. Selezione top deals
         top_deals = filtered_deals[:max_posts]
+        self.poster.renderer.prerender(top_deals)
         print(f"\n🏆 FASE 4: Selezione Top {len(top_deals)} Offerte")
         
         for i, deal in enumerate(top_deals, 1):
@@ -177,25 +184,16 @@ class DealsPoster:
             
             print("\n📤 Invio in corso...")
             
+            # La coda di invio rispetta i limiti Telegram, niente sleep fissi
+            results = await self.poster.send_multiple_deals(top_deals)
+            
             sent_count = 0
-            for i, deal in enumerate(top_deals, 1):
-                print(f"\n📮 Invio {i}/{len(top_deals)}: {deal['title']}...")
-                
-                success = await self.poster.send_deal(
-                    deal,
-                    deal['brislyscore_data']
-                )
-                
+            for i, (deal, success) in enumerate(zip(top_deals, results), 1):
                 if success:
                     sent_count += 1
-                    print(f"   ✅ Inviato con successo!")
+                    print(f"   ✅ {i}/{len(top_deals)} {deal['title']}: inviato con successo!")
                 else:
-                    print(f"   ❌ Errore nell'invio!")
-                
-                # Delay tra i post (5 secondi)
-                if i < len(top_deals):
-                    print(f"   ⏰ Attendo 5 secondi...")
-                    await asyncio.sleep(5)
+                    print(f"   ❌ {i}/{len(top_deals)} {deal['title']}: errore nell'invio!")
             
             print("\n" + "="*60)
             print(f"✅ COMPLETATO: {sent_count}/{len(top_deals)} offerte inviate")
@@ -1,17 +1,19 @@
 """
 Scheduler
 Gestisce il posting automatico agli orari prestabiliti
+
+Uno scraping/scoring condiviso alimenta uno o più canali (bot/channel.py),
+ognuno con filtri, orari, limiti e namespace Redis propri.
 """
 
 import os
 import sys
+import signal
 import asyncio
 import logging
-import schedule
-import time
 from datetime import datetime, timedelta
 import pytz
-from typing import List, Dict
+from typing import Callable, Dict, List
 from dotenv import load_dotenv
 
 # Setup path
@@ -20,7 +22,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from scrapers.instant_gaming import InstantGamingScraper
 from scrapers.gamivo import GamivoScraper
 from utils.brislyscore import BrislyScore
+from utils.deal_merger import DealMerger
+from utils.async_scheduler import AsyncScheduler
 from bot.telegram_poster import TelegramPoster
+from bot.channel import ChannelRuntime, load_channel_configs, load_settings
+from bot.wishlist_fanout import WishlistFanout
 from database.redis_client import RedisClient
 
 # Load environment
@@ -36,25 +42,56 @@ class BotScheduler:
     """Scheduler per posting automatico"""
     
     def __init__(self):
-        self.timezone = pytz.timezone('Europe/Rome')
+        self.timezone = pytz.timezone(os.getenv('TIMEZONE', 'Europe/Rome'))
         self.ig_scraper = InstantGamingScraper()
         self.gv_scraper = GamivoScraper()
         self.scorer = BrislyScore()
-        self.poster = TelegramPoster()
         self.db = RedisClient()
+        self.poster = TelegramPoster(self.db)
+        self.merger = DealMerger(self.db.identity)
+        
+        # Ingest in background: scraping + scoring fuori dagli orari di posting
+        self.scraping_interval = int(os.getenv('SCRAPING_INTERVAL_MINUTES', 30)) * 60
+        self._ingest_lock = asyncio.Lock()
+        # Callback chiamate con tutte le offerte di ogni ingest (es. indice ricerca del bot)
+        self.ingest_listeners: List[Callable[[List[Dict]], None]] = []
+        
+        # Canali serviti dallo stesso scraping (CHANNELS_FILE, default: uno da env)
+        self.channels = [
+            ChannelRuntime(config, self.db, self.poster, self.scraping_interval, self.ingest_deals)
+            for config in load_channel_configs()
+        ]
+        
+        # Canale principale (compatibilità: esecuzione singola, post_deals, bot)
+        primary = self.channels[0]
+        self.outbox = primary.outbox
+        self.buffer = primary.buffer
+        self.updater = primary.updater
         
-        # Orari di posting (formato 24h)
-        self.posting_times = ['08:00', '13:00', '18:00', '21:00']
+        # Notifiche in privato agli utenti con il gioco in wishlist
+        self.fanout = WishlistFanout(
+            self.db, self.poster,
+            chunk_size=int(os.getenv('WISHLIST_FANOUT_CHUNK', '500'))
+        )
         
-        # Limiti
-        self.max_posts_per_session = 2
-        self.max_posts_per_day = 10
+        # Recap domenicale
+        settings = load_settings()
+        self.sunday_recap = settings.SUNDAY_RECAP
+        self.recap_collage = settings.RECAP_COLLAGE
+        
+        # Runtime asyncio persistente (creato in run_async)
+        self.jobs = AsyncScheduler(self.timezone.zone)
+        self._stop: asyncio.Event = None
+        self._senders: List[asyncio.Task] = []
+        self._notifier: asyncio.Task = None
         
         logger.info("🤖 Scheduler inizializzato")
-        logger.info(f"⏰ Orari posting: {', '.join(self.posting_times)}")
+        for channel in self.channels:
+            logger.info(f"⏰ [{channel.name}] {channel.poster.channel_id} - "
+                        f"orari posting: {', '.join(channel.posting_times)}")
     
-    def collect_best_deals(self) -> List[Dict]:
-        """Raccoglie e filtra le migliori offerte"""
+    def collect_scored_deals(self) -> List[Dict]:
+        """Raccoglie, unisce e valuta le offerte (senza filtri)"""
         all_deals = []
         
         # Raccolta da tutte le fonti
@@ -70,120 +107,154 @@ class BotScheduler:
             logger.warning("⚠️ Nessuna offerta trovata")
             return []
         
+        # Stesso gioco su più store: resta il prezzo migliore
+        all_deals = self.merger.merge(all_deals)
+        if self.db.events:
+            self.db.events.publish('scraped', all_deals)
+        
         # Calcola BrislyScore
         for deal in all_deals:
             score_data = self.scorer.calculate(deal)
             deal['brislyscore_data'] = score_data
             deal['brislyscore'] = score_data['score']
+        if self.db.events:
+            self.db.events.publish('scored', all_deals)
         
         # Ordina per score
         all_deals.sort(key=lambda x: x['brislyscore'], reverse=True)
-        
-        # Filtra solo offerte valide e non già postate
-        filtered = []
-        for deal in all_deals:
-            # Skip se già postata
-            deal_id = self.db._generate_deal_id(deal)
-            if self.db.is_deal_posted(deal_id):
-                continue
-                
-            # Filtri qualità
-            if deal['brislyscore'] < 15:
-                continue
-            if deal.get('discount_percent', 0) < 30:
-                continue
-                
-            filtered.append(deal)
-        
-        logger.info(f"✅ {len(filtered)} offerte valide trovate")
-        return filtered
+        # Alias dei titoli nuovi: una sola scrittura per ingest
+        self.db.identity.flush()
+        return all_deals
     
-    async def post_scheduled_deals(self):
-        """Posta le offerte negli orari schedulati"""
-        try:
-            # Check limite giornaliero
-            posted_today = self.db.get_posted_count_today()
-            if posted_today >= self.max_posts_per_day:
-                logger.warning(f"⚠️ Limite giornaliero raggiunto ({posted_today}/{self.max_posts_per_day})")
-                return
-            
-            # Trova migliori deals
-            deals = self.collect_best_deals()
-            
-            if not deals:
-                logger.info("📭 Nessuna nuova offerta da postare")
+    def filter_postable(self, all_deals: List[Dict]) -> List[Dict]:
+        """Filtra solo offerte valide e non già postate (canale principale)"""
+        return self.channels[0].filter_postable(all_deals)
+    
+    def collect_best_deals(self) -> List[Dict]:
+        """Raccoglie e filtra le migliori offerte"""
+        return self.filter_postable(self.collect_scored_deals())
+    
+    async def ingest_deals(self):
+        """Scraping e scoring periodici: aggiorna il buffer delle offerte pronte"""
+        if self._ingest_lock.locked():
+            # Ingest già in corso: basta attenderne il risultato
+            async with self._ingest_lock:
                 return
-            
-            # Posta fino a max_posts_per_session offerte
-            to_post = deals[:self.max_posts_per_session]
-            
-            logger.info(f"📤 Posting {len(to_post)} offerte...")
-            
-            for i, deal in enumerate(to_post, 1):
-                logger.info(f"📮 [{i}/{len(to_post)}] {deal['title']}")
-                
-                # Invia a Telegram
-                success = await self.poster.send_deal(
-                    deal,
-                    deal['brislyscore_data']
-                )
-                
-                if success:
-                    # Marca come postata nel database
-                    self.db.mark_deal_posted(deal)
-                    self.db.increment_stat('total_posts')
-                    self.db.increment_stat(f"posts_{deal['source']}")
-                    logger.info(f"✅ Postata con successo!")
-                else:
-                    logger.error(f"❌ Errore nel posting")
-                
-                # Delay tra posts
-                if i < len(to_post):
-                    await asyncio.sleep(5)
-            
-            # Log statistiche
-            stats = self.db.get_all_stats()
-            logger.info(f"📊 Stats - Totale posts: {stats.get('total_posts', 0)}")
-            
+        
+        async with self._ingest_lock:
+            started = datetime.now()
+            deals = await asyncio.to_thread(self.collect_scored_deals)
+            # Stesso set di offerte valutate, filtri e storico di ogni canale
+            postable = {}
+            for channel in self.channels:
+                channel_deals = await asyncio.to_thread(channel.filter_postable, deals)
+                await asyncio.to_thread(channel.buffer.refresh, channel_deals)
+                for deal in channel_deals:
+                    postable[self.db._generate_deal_id(deal)] = deal
+            for listener in self.ingest_listeners:
+                try:
+                    listener(deals)
+                except Exception as e:
+                    logger.error(f"❌ Errore listener ingest: {e}")
+            elapsed = (datetime.now() - started).total_seconds()
+            logger.info(f"📥 Ingest completato in {elapsed:.1f}s")
+        
+        # Fuori dal lock: le modifiche rispettano i limiti del canale e
+        # non devono bloccare un posting in attesa del buffer
+        for channel in self.channels:
+            try:
+                await channel.updater.apply(deals)
+            except Exception as e:
+                logger.error(f"❌ [{channel.name}] Errore aggiornamento post: {e}")
+        
+        # Offerte nuove → utenti che le hanno in wishlist;
+        # prezzi cambiati → alert di prezzo soddisfatti (tutte le offerte, non solo postabili)
+        try:
+            planned = await asyncio.to_thread(self.fanout.plan, list(postable.values()))
+            planned += await asyncio.to_thread(self.fanout.plan_alerts, deals)
+            if planned and self._notifier is None:
+                # Nessun sender in background (esecuzione singola): invia ora
+                await self.fanout.drain()
         except Exception as e:
-            logger.error(f"❌ Errore in post_scheduled_deals: {e}")
+            logger.error(f"❌ Errore notifiche wishlist: {e}")
     
-    def job_wrapper(self):
-        """Wrapper per eseguire job async in schedule"""
-        logger.info(f"⏰ Esecuzione job schedulato - {datetime.now().strftime('%H:%M')}")
-        asyncio.run(self.post_scheduled_deals())
+    async def post_scheduled_deals(self):
+        """Posting su tutti i canali (esecuzione singola e test)"""
+        for channel in self.channels:
+            await channel.post_scheduled_deals()
     
     def setup_schedule(self):
-        """Configura gli orari di posting"""
-        # Clear schedule precedenti
-        schedule.clear()
-        
-        # Setup posting times
-        for time_str in self.posting_times:
-            schedule.every().day.at(time_str).do(self.job_wrapper)
-            logger.info(f"⏰ Schedulato posting alle {time_str}")
+        """Configura gli orari di posting nel fuso configurato"""
+        for channel in self.channels:
+            # Cron: giorno della settimana 0 = domenica, 6 = sabato
+            weekdays = '0-5' if channel.saturday_pause else '*'
+            
+            for time_str in channel.posting_times:
+                hour, minute = time_str.split(':')
+                self.jobs.cron(
+                    f"posting_{channel.name}_{time_str}",
+                    f"{int(minute)} {int(hour)} * * {weekdays}",
+                    channel.post_scheduled_deals
+                )
+                logger.info(f"⏰ [{channel.name}] Schedulato posting alle {time_str}")
+            
+            if channel.saturday_pause:
+                logger.info(f"😴 [{channel.name}] Pausa del sabato attiva")
         
         # Job speciali
-        schedule.every().day.at("00:00").do(self.daily_reset)
-        schedule.every().sunday.at("12:00").do(self.weekly_recap)
+        self.jobs.cron("daily_reset", "0 0 * * *", self.daily_reset)
+        if self.sunday_recap:
+            self.jobs.cron("weekly_recap", "0 12 * * 0", self.weekly_recap)
+        self.jobs.every("ingest", self.scraping_interval, self.ingest_deals, start_now=True)
+        self.jobs.every("heartbeat", 3600, self.heartbeat)
         
         logger.info("📅 Schedule configurato con successo")
     
+    def heartbeat(self):
+        """Log periodico con i prossimi job"""
+        upcoming = min(
+            (when for when in self.jobs.next_runs().values() if when),
+            default=None
+        )
+        logger.info(f"💓 Heartbeat - {datetime.now(self.timezone).strftime('%H:%M')} - "
+                    f"Jobs: {len(self.jobs.jobs)} - Prossimo: {upcoming.strftime('%a %H:%M') if upcoming else '-'}")
+    
     def daily_reset(self):
         """Reset giornaliero delle statistiche"""
         logger.info("🔄 Reset giornaliero statistiche")
-        # Qui puoi aggiungere logica di reset se necessaria
+        # Scadenza offerte postate nel layout a bucket
+        for channel in self.channels:
+            channel.db.sweep_posted_buckets()
     
-    def weekly_recap(self):
-        """Recap settimanale della domenica"""
+    async def weekly_recap(self):
+        """Recap settimanale della domenica (aggregati aggiornati a ogni post)"""
         logger.info("📊 Generazione recap settimanale")
-        # TODO: Implementare recap settimanale
+        for channel in self.channels:
+            await channel.post_weekly_recap(collage=self.recap_collage)
     
-    def run_forever(self):
-        """Loop principale dello scheduler"""
+    async def run_async(self):
+        """
+        Loop principale: un unico runtime asyncio per tutta la vita del processo
+        
+        Il Bot (e il suo pool HTTP) viene inizializzato una volta sola;
+        su SIGTERM/SIGINT i job in corso terminano e l'outbox viene svuotata.
+        """
+        loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self._stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: resta KeyboardInterrupt
+        
         logger.info("🚀 Scheduler avviato!")
         logger.info(f"⏰ Ora corrente: {datetime.now(self.timezone).strftime('%H:%M:%S %Z')}")
-        logger.info(f"📅 Prossimi job: {self.posting_times}")
+        
+        await self.poster.start()
+        for channel in self.channels:
+            channel.sender = asyncio.create_task(channel.outbox.run(self._stop))
+            self._senders.append(channel.sender)
+        self._notifier = asyncio.create_task(self.fanout.run(self._stop))
         
         # Setup schedule
         self.setup_schedule()
@@ -191,29 +262,47 @@ class BotScheduler:
         # Test immediato se richiesto
         if os.getenv('TEST_ON_START', 'false').lower() == 'true':
             logger.info("🧪 Test immediato richiesto...")
-            self.job_wrapper()
+            self.jobs.once("test_on_start", self.post_scheduled_deals)
         
-        # Loop principale
-        while True:
-            try:
-                schedule.run_pending()
-                time.sleep(60)  # Check ogni minuto
-                
-                # Log ogni ora
-                if datetime.now().minute == 0:
-                    logger.info(f"💓 Heartbeat - {datetime.now().strftime('%H:%M')} - Jobs pending: {len(schedule.jobs)}")
-                    
-            except KeyboardInterrupt:
-                logger.info("⏹️ Scheduler fermato dall'utente")
-                break
-            except Exception as e:
-                logger.error(f"❌ Errore nel loop principale: {e}")
-                time.sleep(60)
+        await self.jobs.run(self._stop)
+        await self.shutdown()
+    
+    async def shutdown(self, timeout: float = 60):
+        """Attende i job in corso, ferma il sender e chiude il Bot"""
+        logger.info("⏹️ Arresto scheduler: completamento job in corso...")
+        await self.jobs.wait_running(timeout)
+        if self._senders:
+            await asyncio.gather(*self._senders)
+            for channel in self.channels:
+                # Ultimo giro per ciò che è stato accodato durante l'arresto
+                await channel.outbox.drain()
+                channel.sender = None
+            self._senders = []
+        if self._notifier:
+            # Il job in corso si ferma a fine blocco e riprende al riavvio
+            await self._notifier
+            self._notifier = None
+        await self.poster.stop()
+        logger.info("👋 Scheduler fermato")
+    
+    def run_forever(self):
+        """Avvia il runtime persistente"""
+        try:
+            asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            logger.info("⏹️ Scheduler fermato dall'utente")
+    
+    async def _run_once(self):
+        await self.poster.start()
+        try:
+            await self.post_scheduled_deals()
+        finally:
+            await self.poster.stop()
     
     def run_once(self):
         """Esegue un singolo posting (per test)"""
         logger.info("🧪 Esecuzione singola...")
-        asyncio.run(self.post_scheduled_deals())
+        asyncio.run(self._run_once())
 
 def main():
     """Main entry point"""
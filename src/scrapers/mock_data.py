@@ -102,6 +102,19 @@ class MockDataProvider:
                 'is_historical_low': True,
             },
             
+            {
+                'source': 'instant_gaming',
+                'title': 'ELDEN RING',
+                'platform': 'Steam',
+                'original_price': 59.99,
+                'discounted_price': 32.49,
+                'discount_percent': 46,
+                'metacritic_score': 96,
+                'release_year': 2022,
+                'genre': 'Action',
+                'is_aaa': True,
+            },
+            
             # GAMIVO DEALS
             {
                 'source': 'gamivo',
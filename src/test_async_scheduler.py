@@ -0,0 +1,96 @@
+"""
+Test dei trigger cron dello scheduler asyncio
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from utils.async_scheduler import CronTrigger
+
+ROME = pytz.timezone('Europe/Rome')
+
+
+def rome(*args) -> datetime:
+    return ROME.localize(datetime(*args))
+
+
+def runs(expression: str, start: datetime, count: int):
+    """Prime esecuzioni del trigger dopo start"""
+    trigger = CronTrigger(expression, ROME)
+    result = []
+    now = start
+    for _ in range(count):
+        now = trigger.next_after(now)
+        result.append(now)
+    return result
+
+
+def test_invalid_expression():
+    with pytest.raises(ValueError):
+        CronTrigger('0 9 * *', ROME)
+    with pytest.raises(ValueError):
+        CronTrigger('0 24 * * *', ROME)
+
+
+def test_weekday_range_includes_sunday():
+    trigger = CronTrigger('0 9 * * 0-5', ROME)
+    assert trigger.weekdays == {0, 1, 2, 3, 4, 5}
+    # 2026-10-17 è sabato: si salta a domenica 18
+    days = [run.date() for run in runs('0 9 * * 0-5', rome(2026, 10, 16, 10, 0), 3)]
+    assert days == [datetime(2026, 10, 18).date(),
+                    datetime(2026, 10, 19).date(),
+                    datetime(2026, 10, 20).date()]
+
+
+def test_sunday_as_seven():
+    assert CronTrigger('0 9 * * 7', ROME).weekdays == {0}
+
+
+def test_day_of_month_or_day_of_week():
+    # Il 1° del mese oppure ogni lunedì, come in cron
+    found = runs('0 8 1 * 1', rome(2026, 10, 20, 0, 0), 4)
+    assert [run.date().isoformat() for run in found] == [
+        '2026-10-26', '2026-11-01', '2026-11-02', '2026-11-09',
+    ]
+
+
+def test_star_prefixed_fields_are_and():
+    # "*/2" nel giorno del mese non rende il giorno della settimana alternativo
+    found = runs('0 8 */2 * 1', rome(2026, 10, 1, 0, 0), 2)
+    for run in found:
+        assert run.weekday() == 0
+        assert run.day % 2 == 1
+    assert found[0].date().isoformat() == '2026-10-05'
+
+
+def test_runs_are_in_local_time():
+    run = CronTrigger('30 9 * * *', ROME).next_after(pytz.utc.localize(datetime(2026, 7, 1, 12, 0)))
+    assert (run.hour, run.minute) == (9, 30)
+    assert run.utcoffset() == timedelta(hours=2)
+
+
+def test_dst_spring_forward_runs_once():
+    # 2026-03-29: le 02:30 non esistono, il job parte alle 03:30 CEST
+    found = runs('30 2 * * *', rome(2026, 3, 28, 12, 0), 2)
+    assert found[0].isoformat() == '2026-03-29T03:30:00+02:00'
+    assert found[1].isoformat() == '2026-03-30T02:30:00+02:00'
+
+
+def test_dst_fall_back_runs_once():
+    # 2026-10-25: le 02:30 capitano due volte, il job parte una sola volta
+    found = runs('30 2 * * *', rome(2026, 10, 24, 12, 0), 2)
+    assert found[0].isoformat() == '2026-10-25T02:30:00+01:00'
+    assert found[1].isoformat() == '2026-10-26T02:30:00+01:00'
+
+
+@pytest.mark.parametrize('start', [rome(2026, 3, 29, 0, 30), rome(2026, 10, 25, 0, 30)])
+def test_dst_hourly_is_monotonic_without_duplicates(start):
+    found = runs('0 * * * *', start, 6)
+    assert all(a < b for a, b in zip(found, found[1:]))
+    assert len({run.astimezone(pytz.utc) for run in found}) == len(found)
@@ -0,0 +1,130 @@
+"""
+Test del codec dei record Redis (offerte postate e cache prezzi)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+from datetime import datetime
+
+from database.codec import (
+    FLAG_ZLIB, MAGIC_POSTED, MAGIC_PRICE,
+    encode_posted, decode_posted, encode_price, decode_price,
+)
+
+POSTED_AT = datetime(2026, 3, 29, 2, 30).isoformat()
+
+POSTED = {
+    'title': 'The Legend of Zelda: Tears of the Kingdom',
+    'platform': 'Nintendo Switch',
+    'source': 'instant_gaming',
+    'price': 44.99,
+    'discount': 36,
+    'posted_at': POSTED_AT,
+    'message_id': 1234567890123,
+    'brislyscore': 8.7,
+}
+
+
+# ==========================================
+# OFFERTE POSTATE
+# ==========================================
+
+def test_posted_roundtrip():
+    encoded = encode_posted(POSTED)
+    assert isinstance(encoded, bytes)
+    assert encoded[0] == MAGIC_POSTED
+    assert decode_posted(encoded) == POSTED
+
+
+def test_posted_roundtrip_zlib():
+    data = dict(POSTED, title='Deluxe Edition ' * 20)
+    encoded = encode_posted(data, compress=True)
+    assert encoded[1] & FLAG_ZLIB
+    assert len(encoded) < len(encode_posted(data))
+    assert decode_posted(encoded) == data
+
+
+def test_posted_zlib_skipped_when_larger():
+    encoded = encode_posted(dict(POSTED, title='X'), compress=True)
+    assert not encoded[1] & FLAG_ZLIB
+    assert decode_posted(encoded)['title'] == 'X'
+
+
+def test_posted_legacy_json():
+    assert decode_posted(json.dumps(POSTED)) == POSTED
+    assert encode_posted(POSTED, compact=False) == json.dumps(POSTED)
+    assert decode_posted(None) is None
+
+
+def test_posted_unknown_source():
+    data = dict(POSTED, source='kinguin')
+    assert decode_posted(encode_posted(data))['source'] == 'kinguin'
+    data = dict(POSTED, source='')
+    assert decode_posted(encode_posted(data))['source'] == ''
+
+
+def test_posted_missing_fields():
+    decoded = decode_posted(encode_posted({'title': 'Hades', 'posted_at': POSTED_AT}))
+    assert decoded['price'] is None
+    assert decoded['message_id'] is None
+    assert decoded['discount'] == 0
+    assert decoded['brislyscore'] == 0
+    assert decoded['platform'] == ''
+
+
+def test_posted_clamps_out_of_range_values():
+    data = dict(POSTED, brislyscore=-5000, discount=-10, price=-3)
+    decoded = decode_posted(encode_posted(data))
+    assert decoded['brislyscore'] == -3276.8
+    assert decoded['discount'] == 0
+    assert decoded['price'] == 0
+
+    data = dict(POSTED, brislyscore=99999, discount=400, price=99_000_000)
+    decoded = decode_posted(encode_posted(data))
+    assert decoded['brislyscore'] == 3276.7
+    assert decoded['discount'] == 255
+    # Resta un prezzo valido, non il segnaposto "nessun prezzo"
+    assert decoded['price'] == (0xFFFFFFFF - 1) / 100
+
+
+# ==========================================
+# CACHE PREZZI
+# ==========================================
+
+def test_price_roundtrip_with_extra_fields():
+    data = {
+        'original_price': 69.99,
+        'discounted_price': 19.99,
+        'discount_percent': 71,
+        'cached_at': POSTED_AT,
+        'url': 'https://example.com/game',
+    }
+    encoded = encode_price(data)
+    assert encoded[0] == MAGIC_PRICE
+    assert decode_price(encoded) == data
+    assert decode_price(encode_price(data, compress=True)) == data
+
+
+def test_price_none_and_zero_discount():
+    decoded = decode_price(encode_price({'discounted_price': 9.5, 'cached_at': POSTED_AT}))
+    assert 'original_price' not in decoded
+    assert decoded['discounted_price'] == 9.5
+    assert decoded['discount_percent'] == 0
+
+
+def test_price_clamps_out_of_range_values():
+    data = {'original_price': -1, 'discounted_price': 50_000_000,
+            'discount_percent': 300, 'cached_at': POSTED_AT}
+    decoded = decode_price(encode_price(data))
+    assert decoded['original_price'] == 0
+    assert decoded['discounted_price'] == (0xFFFFFFFF - 1) / 100
+    assert decoded['discount_percent'] == 255
+
+
+def test_price_legacy_json():
+    data = {'original_price': 10.0, 'discounted_price': 5.0, 'discount_percent': 50}
+    assert decode_price(json.dumps(data)) == data
+    assert decode_price(None) is None
@@ -0,0 +1,248 @@
+"""
+Test del backend LocalStore tramite RedisClient(backend='local')
+Nessun servizio esterno: lo store vive in memoria
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import threading
+from datetime import datetime
+
+import pytest
+import pytz
+from redis.exceptions import WatchError
+
+from database import redis_client
+from database.redis_client import RedisClient
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """RedisClient su LocalStore solo in memoria"""
+    monkeypatch.setenv('LOCAL_STORE_PATH', '')
+    monkeypatch.setenv('EVENT_BUS', 'false')
+    return RedisClient(backend='local', prefix='test:')
+
+
+# ==========================================
+# TTL
+# ==========================================
+
+def test_ttl_and_lazy_expiry(db):
+    client = db.client
+    client.set('k', 'v', ex=0.05)
+    client.set('persistent', 'v')
+    assert client.ttl('persistent') == -1
+    assert client.ttl('missing') == -2
+
+    time.sleep(0.1)
+    assert client.get('k') is None
+    assert client.exists('k') == 0
+    assert client.ttl('k') == -2
+
+    client.hset('h', 'f', 'v')
+    assert client.expire('h', 60)
+    assert 0 < client.ttl('h') <= 60
+    assert not client.expire('missing', 60)
+
+
+def test_set_nx(db):
+    assert db.client.set('k', 1, nx=True)
+    assert db.client.set('k', 2, nx=True) is None
+    assert db.client.get('k') == '1'
+
+
+def test_mark_deal_posted_roundtrip(db):
+    deal = {'title': 'Hades', 'platform': 'Steam', 'source': 'gamivo',
+            'discounted_price': 9.99, 'discount_percent': 60}
+    deal_id = db._generate_deal_id(deal)
+    assert not db.is_deal_posted(deal_id)
+    assert db.mark_deal_posted(deal, message_id=42)
+    assert db.is_deal_posted(deal_id)
+    assert db.get_posted_deal(deal_id)['message_id'] == 42
+
+
+def test_weekly_recap_uses_configured_timezone(db, monkeypatch):
+    monkeypatch.setattr(redis_client, 'RECAP_TIMEZONE', pytz.timezone('Pacific/Kiritimati'))
+    week = db.week_id()
+    assert week == db.week_id(datetime.now(pytz.timezone('Pacific/Kiritimati')))
+
+    deal = {'title': 'Hades', 'platform': 'Steam', 'source': 'gamivo', 'original_price': 24.99,
+            'discounted_price': 9.99, 'discount_percent': 60, 'brislyscore': 8.1}
+    pipe = db.client.pipeline()
+    db.record_weekly_post(deal, pipe)
+    pipe.execute()
+
+    recap = db.get_weekly_recap()
+    assert recap['week'] == week
+    assert recap['posts'] == 1
+    assert recap['savings'] == 15.0
+    assert recap['top'][0]['title'] == 'Hades'
+
+
+# ==========================================
+# PIPELINE E WATCH
+# ==========================================
+
+def test_pipeline_queues_until_execute(db):
+    pipe = db.client.pipeline()
+    pipe.set('a', 1)
+    pipe.incr('counter')
+    assert db.client.get('a') is None
+    assert pipe.execute() == [True, 1]
+    assert db.client.get('a') == '1'
+    assert len(pipe) == 0
+
+
+def test_pipeline_runtime_error_keeps_other_commands(db):
+    db.client.set('string', 'x')
+    pipe = db.client.pipeline()
+    pipe.set('before', 1)
+    pipe.hset('string', 'field', 'value')
+    pipe.set('after', 2)
+    with pytest.raises(Exception):
+        pipe.execute()
+    # Come EXEC in Redis: gli altri comandi sono applicati comunque
+    assert db.client.get('before') == '1'
+    assert db.client.get('after') == '2'
+
+
+def test_pipeline_errors_in_results(db):
+    db.client.set('string', 'x')
+    pipe = db.client.pipeline()
+    pipe.set('a', 1)
+    pipe.hset('string', 'field', 'value')
+    results = pipe.execute(raise_on_error=False)
+    assert results[0] is True
+    assert isinstance(results[1], Exception)
+
+
+def test_transaction_aborts_on_malformed_command(db):
+    pipe = db.client.pipeline(transaction=True)
+    pipe.set('a', 1)
+    pipe.zadd('z')
+    with pytest.raises(TypeError, match='EXECABORT'):
+        pipe.execute()
+    # Nessuna scrittura applicata
+    assert db.client.get('a') is None
+
+
+def test_watch_executes_when_unchanged(db):
+    with db.client.pipeline() as pipe:
+        pipe.watch('done')
+        assert pipe.exists('done') == 0
+        pipe.multi()
+        pipe.set('done', 1)
+        pipe.hset('jobs', 'x', 'payload')
+        assert pipe.execute() == [True, 1]
+    assert db.client.hget('jobs', 'x') == 'payload'
+
+
+def test_watch_fails_when_key_changes(db):
+    with db.client.pipeline() as pipe:
+        pipe.watch('done')
+        pipe.multi()
+        pipe.hset('jobs', 'x', 'payload')
+        db.client.set('done', 1)
+        with pytest.raises(WatchError):
+            pipe.execute()
+    assert db.client.hget('jobs', 'x') is None
+
+
+def test_watch_detects_ttl_change(db):
+    db.client.set('k', 1)
+    pipe = db.client.pipeline()
+    pipe.watch('k')
+    pipe.multi()
+    pipe.set('other', 1)
+    db.client.expire('k', 60)
+    with pytest.raises(WatchError):
+        pipe.execute()
+
+
+# ==========================================
+# SORTED SET
+# ==========================================
+
+def test_sorted_set_ranges(db):
+    client = db.client
+    client.zadd('z', {'a': 3, 'b': 1, 'c': 2})
+    assert client.zcard('z') == 3
+    assert client.zrange('z', 0, -1) == ['b', 'c', 'a']
+    assert client.zrevrange('z', 0, 0, withscores=True) == [('a', 3.0)]
+    assert client.zrangebyscore('z', 2, '+inf') == ['c', 'a']
+    assert client.zincrby('z', 5, 'b') == 6.0
+    assert client.zscore('z', 'b') == 6.0
+
+    # Tieni solo i due punteggi più alti
+    assert client.zremrangebyrank('z', 0, -3) == 1
+    assert client.zrange('z', 0, -1) == ['a', 'b']
+    assert client.zadd('z', {'a': 10}, nx=True) == 0
+    assert client.zscore('z', 'a') == 3.0
+
+
+# ==========================================
+# STREAM
+# ==========================================
+
+def test_stream_consumer_group(db):
+    client = db.client
+    client.xgroup_create('s', 'g', id='0', mkstream=True)
+    ids = [client.xadd('s', {'n': i}) for i in range(5)]
+    assert ids == sorted(ids)
+    assert client.xlen('s') == 5
+
+    first = client.xreadgroup('g', 'c1', {'s': '>'}, count=3)
+    second = client.xreadgroup('g', 'c2', {'s': '>'}, count=10)
+    assert [f['n'] for _, f in first[0][1]] == ['0', '1', '2']
+    assert [f['n'] for _, f in second[0][1]] == ['3', '4']
+    assert client.xpending('s', 'g')['pending'] == 5
+
+    assert client.xack('s', 'g', *(entry_id for entry_id, _ in first[0][1])) == 3
+    assert client.xpending('s', 'g')['pending'] == 2
+
+    # Gli eventi di c2 passano a c3
+    _, claimed, _ = client.xautoclaim('s', 'g', 'c3', 0, count=10)[:3]
+    assert [f['n'] for _, f in claimed] == ['3', '4']
+
+
+def test_stream_maxlen_and_busygroup(db):
+    client = db.client
+    for i in range(1000):
+        client.xadd('s', {'n': i}, maxlen=100, approximate=True)
+    assert 100 <= client.xlen('s') <= 110
+
+    client.xgroup_create('s', 'g')
+    with pytest.raises(ValueError, match='BUSYGROUP'):
+        client.xgroup_create('s', 'g')
+
+
+def test_stream_blocking_read_wakes_on_xadd(db):
+    client = db.client
+    client.xgroup_create('s', 'g', id='$', mkstream=True)
+    threading.Timer(0.05, lambda: client.xadd('s', {'n': 1})).start()
+
+    started = time.monotonic()
+    response = client.xreadgroup('g', 'c1', {'s': '>'}, block=2000)
+    assert time.monotonic() - started < 1
+    assert response[0][1][0][1] == {'n': '1'}
+
+
+# ==========================================
+# HYPERLOGLOG
+# ==========================================
+
+def test_hyperloglog_estimate_and_merge(db):
+    client = db.client
+    assert client.pfadd('a', *(f"user-{i}" for i in range(5000))) == 1
+    assert client.pfadd('a', 'user-1') == 0
+    assert abs(client.pfcount('a') - 5000) / 5000 < 0.03
+
+    client.pfadd('b', *(f"user-{i}" for i in range(2500, 7500)))
+    assert abs(client.pfcount('a', 'b') - 7500) / 7500 < 0.03
+    client.pfmerge('ab', 'a', 'b')
+    assert client.pfcount('ab') == client.pfcount('a', 'b')
+    assert client.pfcount('missing') == 0
@@ -0,0 +1,67 @@
+"""
+Test del matching dei desideri della wishlist sui titoli delle offerte
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from database.redis_client import _ROMAN_TOKEN, _wish_matches, _wish_tokens
+
+
+def matches(wish: str, title: str) -> bool:
+    return _wish_matches(_wish_tokens(wish), set(_wish_tokens(title)))
+
+
+@pytest.mark.parametrize('token, expected', [
+    ('x', True), ('v', True), ('xiv', True), ('xxiii', True), ('ix', True),
+    ('xl', False), ('mix', False), ('vx', False), ('men', False),
+])
+def test_roman_token(token, expected):
+    assert bool(_ROMAN_TOKEN.fullmatch(token)) is expected
+
+
+@pytest.mark.parametrize('wish, title', [
+    ("baldurs gate", "Baldur's Gate 3"),
+    ("baldur gate 3", "Baldur's Gate 3"),
+    ("hades", "Hades II"),
+    ("elden ring", "ELDEN RING - Shadow of the Erdtree Edition"),
+    ("elden ring", "Elden Ring Deluxe Edition"),
+    ("gta v", "GTA V Premium Edition"),
+])
+def test_base_title_and_editions_match(wish, title):
+    assert matches(wish, title)
+
+
+@pytest.mark.parametrize('wish, title', [
+    ("baldur gate 3", "Baldur's Gate 2"),
+    ("hades ii", "Hades"),
+    ("civilization vi", "Civilization V"),
+])
+def test_different_chapter_does_not_match(wish, title):
+    assert not matches(wish, title)
+
+
+@pytest.mark.parametrize('wish, title, expected', [
+    ("final fantasy vii", "Final Fantasy 7 Remake", True),
+    ("final fantasy 7", "FINAL FANTASY VII", True),
+    ("final fantasy 16", "Final Fantasy XVI", True),
+    ("final fantasy 7", "Final Fantasy XVI", False),
+])
+def test_roman_and_arabic_numerals(wish, title, expected):
+    assert matches(wish, title) is expected
+
+
+@pytest.mark.parametrize('wish, title, expected', [
+    # "x" e "v" da soli non diventano numeri: Mega Man X non è Mega Man 10
+    ("mega man x", "Mega Man 10", False),
+    ("mega man 10", "Mega Man X", False),
+    ("mega man x", "Mega Man X Legacy Collection", True),
+    ("mega man x", "X-Men", False),
+    ("x-men", "X-Men Origins: Wolverine", True),
+    ("gta 5", "GTA V", False),
+])
+def test_single_letter_numerals(wish, title, expected):
+    assert matches(wish, title) is expected
@@ -0,0 +1,258 @@
+"""
+Async Scheduler
+Scheduler nativo asyncio basato su heap: si sveglia esattamente alla prossima scadenza
+
+Tipi di job:
+- cron: espressione "minuti ore giorno mese giorno_settimana" (0 = domenica);
+  come in cron, se giorno e giorno_settimana sono entrambi ristretti basta
+  che ne corrisponda uno (OR), altrimenti valgono entrambi
+- interval: ogni N secondi
+- once: una sola volta a un orario o dopo un ritardo
+
+Gli orari cron sono interpretati nel fuso configurato (es. Europe/Rome),
+indipendentemente dal fuso del server. I job girano come task separati,
+quindi un job lento non blocca gli altri.
+"""
+
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Union
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+JobFunc = Callable[[], Union[Awaitable, None]]
+
+
+def _parse_field(field: str, low: int, high: int) -> Set[int]:
+    """Parsa un campo cron (*, */n, a-b, a,b,c, a-b/n)"""
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/')
+            step = int(step_text)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start_text, end_text = part.split('-')
+            start, end = int(start_text), int(end_text)
+        else:
+            start = end = int(part)
+        if start < low or end > high:
+            raise ValueError(f"Valore cron fuori range: {part} ({low}-{high})")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronTrigger:
+    """Trigger stile cron nel fuso orario indicato"""
+
+    def __init__(self, expression: str, tz):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Espressione cron non valida: {expression}")
+        self.expression = expression
+        self.tz = tz
+        self.minutes = sorted(_parse_field(fields[0], 0, 59))
+        self.hours = sorted(_parse_field(fields[1], 0, 23))
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12)
+        # 0 e 7 = domenica, come in cron
+        self.weekdays = {d % 7 for d in _parse_field(fields[4], 0, 7)}
+        # Campo che inizia con "*": nessuna restrizione, i giorni vanno in AND
+        self.days_or_weekdays = not (fields[2].startswith('*') or fields[4].startswith('*'))
+
+    def _day_matches(self, day) -> bool:
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays
+        if self.days_or_weekdays:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, now: datetime) -> Optional[datetime]:
+        local = now.astimezone(self.tz)
+        day = local.date()
+        for _ in range(366 * 5):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        naive = datetime(day.year, day.month, day.day, hour, minute)
+                        candidate = self.tz.normalize(self.tz.localize(naive))
+                        if candidate > now:
+                            return candidate
+            day += timedelta(days=1)
+        return None
+
+
+class IntervalTrigger:
+    """Trigger a intervallo fisso"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def next_after(self, now: datetime) -> Optional[datetime]:
+        return now + timedelta(seconds=self.seconds)
+
+
+class OnceTrigger:
+    """Trigger singolo"""
+
+    def __init__(self, at: datetime):
+        self.at = at
+
+    def next_after(self, now: datetime) -> Optional[datetime]:
+        return None
+
+
+class Job:
+    """Job registrato nello scheduler"""
+
+    def __init__(self, name: str, func: JobFunc, trigger, next_run: Optional[datetime]):
+        self.name = name
+        self.func = func
+        self.trigger = trigger
+        self.next_run = next_run
+        self.task: Optional[asyncio.Task] = None
+        self.cancelled = False
+
+    def __repr__(self) -> str:
+        return f"<Job {self.name} next={self.next_run}>"
+
+
+class AsyncScheduler:
+    """Scheduler asyncio con heap di scadenze"""
+
+    def __init__(self, timezone: str = 'Europe/Rome'):
+        self.tz = pytz.timezone(timezone)
+        self.jobs: Dict[str, Job] = {}
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._changed = asyncio.Event()
+        self._running: Set[asyncio.Task] = set()
+
+    def now(self) -> datetime:
+        """Ora corrente nel fuso configurato"""
+        return datetime.now(self.tz)
+
+    # ==========================================
+    # REGISTRAZIONE JOB
+    # ==========================================
+
+    def _add(self, job: Job) -> Job:
+        old = self.jobs.get(job.name)
+        if old:
+            old.cancelled = True
+        self.jobs[job.name] = job
+        if job.next_run is not None:
+            heapq.heappush(self._heap, (job.next_run.timestamp(), next(self._counter), job))
+        self._changed.set()
+        return job
+
+    def cron(self, name: str, expression: str, func: JobFunc) -> Job:
+        """
+        Registra un job cron
+
+        Args:
+            name: Nome univoco del job
+            expression: Es. "0 8,13,18,21 * * 0-5" (alle 8/13/18/21, sabato escluso)
+            func: Coroutine function o funzione sincrona (eseguita in un thread)
+        """
+        trigger = CronTrigger(expression, self.tz)
+        return self._add(Job(name, func, trigger, trigger.next_after(self.now())))
+
+    def every(self, name: str, seconds: float, func: JobFunc, start_now: bool = False) -> Job:
+        """Registra un job ogni N secondi (subito se start_now)"""
+        trigger = IntervalTrigger(seconds)
+        first = self.now() if start_now else trigger.next_after(self.now())
+        return self._add(Job(name, func, trigger, first))
+
+    def once(self, name: str, func: JobFunc, at: datetime = None, delay: float = 0) -> Job:
+        """Registra un job singolo a un orario preciso o dopo un ritardo"""
+        when = at.astimezone(self.tz) if at else self.now() + timedelta(seconds=delay)
+        return self._add(Job(name, func, OnceTrigger(when), when))
+
+    def cancel(self, name: str):
+        job = self.jobs.pop(name, None)
+        if job:
+            job.cancelled = True
+
+    def next_runs(self) -> Dict[str, Optional[datetime]]:
+        """Prossima esecuzione di ogni job"""
+        return {name: job.next_run for name, job in self.jobs.items()}
+
+    # ==========================================
+    # LOOP
+    # ==========================================
+
+    async def run(self, stop: asyncio.Event, max_sleep: float = 60):
+        """
+        Esegue i job alle scadenze finché stop non viene impostato
+
+        Args:
+            stop: Evento di arresto
+            max_sleep: Sonno massimo, per riallinearsi a cambi dell'orologio di sistema
+        """
+        while not stop.is_set():
+            self._changed.clear()
+
+            # Scarta i job cancellati in cima allo heap
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+
+            delay = max_sleep
+            if self._heap:
+                delay = min(max_sleep, self._heap[0][0] - time.time())
+
+            if delay > 0:
+                await self._sleep(stop, delay)
+                continue
+
+            _, _, job = heapq.heappop(self._heap)
+            self._fire(job)
+
+            job.next_run = job.trigger.next_after(self.now())
+            if job.next_run is None:
+                self.jobs.pop(job.name, None)
+            else:
+                heapq.heappush(self._heap, (job.next_run.timestamp(), next(self._counter), job))
+
+    async def _sleep(self, stop: asyncio.Event, delay: float):
+        """Dorme fino alla scadenza, a un nuovo job o all'arresto"""
+        waiters = [asyncio.create_task(stop.wait()), asyncio.create_task(self._changed.wait())]
+        await asyncio.wait(waiters, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waiters:
+            waiter.cancel()
+
+    def _fire(self, job: Job):
+        """Avvia il job come task (salta se l'esecuzione precedente è ancora in corso)"""
+        if job.task and not job.task.done():
+            logger.warning(f"⏭️ Job {job.name} ancora in esecuzione, turno saltato")
+            return
+        logger.info(f"⏰ Job {job.name} - {self.now().strftime('%H:%M:%S %Z')}")
+        job.task = asyncio.create_task(self._execute(job))
+        self._running.add(job.task)
+        job.task.add_done_callback(self._running.discard)
+
+    async def _execute(self, job: Job):
+        try:
+            if asyncio.iscoroutinefunction(job.func):
+                await job.func()
+            else:
+                result = await asyncio.to_thread(job.func)
+                if asyncio.iscoroutine(result):
+                    await result
+        except Exception as e:
+            logger.error(f"❌ Errore nel job {job.name}: {e}")
+
+    async def wait_running(self, timeout: float = 60):
+        """Attende i job in esecuzione (per lo shutdown)"""
+        if self._running:
+            await asyncio.wait(set(self._running), timeout=timeout)
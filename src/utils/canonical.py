@@ -0,0 +1,241 @@
+"""
+Canonical Identity
+Normalizza i titoli delle offerte in un ID prodotto canonico, uguale tra store diversi
+
+Pipeline: Unicode → minuscole → apostrofi/punteggiatura → numeri romani →
+rimozione token di edizione, piattaforma e regione.
+Es: "Baldur's Gate 3 (PC) Steam Key GLOBAL" e "Baldurs Gate 3" → "baldurs-gate-3"
+
+I numeri romani di una sola lettera ("V", "X") restano lettere: "Mega Man X"
+e "X-Men" non sono "10"; le equivalenze come "GTA V" ↔ "GTA 5" passano
+dagli alias manuali.
+"""
+
+import re
+import logging
+import unicodedata
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Edizioni che non cambiano il gioco base
+EDITION_TOKENS = {
+    'standard', 'deluxe', 'digital', 'gold', 'ultimate', 'premium', 'complete',
+    'definitive', 'enhanced', 'special', 'collectors', 'goty', 'anniversary',
+}
+EDITION_PHRASES = [
+    ('game', 'of', 'the', 'year'),
+]
+
+# Token di piattaforma/regione/formato aggiunti dagli store in coda al titolo
+STORE_TOKENS = {
+    'pc', 'steam', 'epic', 'gog', 'uplay', 'ubisoft', 'connect', 'origin', 'ea', 'app',
+    'key', 'cd', 'code', 'account', 'global', 'ww', 'worldwide', 'eu', 'europe',
+    'row', 'uk', 'region', 'multi', 'language', 'mac', 'linux',
+}
+
+# Solo numerali di almeno due lettere: "v" e "x" da soli sono spesso parte
+# del nome (Mega Man X, X-Men, Dragon Quest V e Dragon Quest 5 via alias)
+ROMAN_NUMERALS = {
+    'ii': '2', 'iii': '3', 'iv': '4', 'vi': '6', 'vii': '7',
+    'viii': '8', 'ix': '9', 'xi': '11', 'xii': '12', 'xiii': '13',
+    'xiv': '14', 'xv': '15', 'xvi': '16',
+}
+
+# Versione della normalizzazione: cambia la chiave degli alias imparati
+# (gli slug calcolati con regole vecchie non vanno riusati)
+NORMALIZATION_VERSION = 2
+
+# Famiglie di piattaforma (chiavi non intercambiabili tra loro)
+PLATFORM_FAMILIES = {
+    'steam': 'steam',
+    'epic': 'epic',
+    'epic games': 'epic',
+    'gog': 'gog',
+    'uplay': 'ubisoft',
+    'ubisoft': 'ubisoft',
+    'ubisoft connect': 'ubisoft',
+    'origin': 'ea',
+    'ea': 'ea',
+    'ea app': 'ea',
+    'battle.net': 'battlenet',
+    'rockstar': 'rockstar',
+    'xbox': 'xbox',
+    'playstation': 'playstation',
+    'psn': 'playstation',
+    'nintendo': 'nintendo',
+}
+
+_APOSTROPHES = re.compile(r"['’`´]")
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def tokenize(title: str) -> List[str]:
+    """
+    Normalizza un titolo e lo divide in token
+
+    Args:
+        title: Titolo così come arriva dallo store
+
+    Returns:
+        Lista di token normalizzati (senza edizione/piattaforma/regione)
+    """
+    text = unicodedata.normalize('NFKD', title or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    text = text.replace('&', ' and ')
+    text = _APOSTROPHES.sub('', text)
+    tokens = [ROMAN_NUMERALS.get(t, t) for t in _NON_ALNUM.sub(' ', text).split()]
+
+    # Frasi di edizione ("game of the year")
+    for phrase in EDITION_PHRASES:
+        size = len(phrase)
+        i = 0
+        while i <= len(tokens) - size:
+            if tuple(tokens[i:i + size]) == phrase:
+                del tokens[i:i + size]
+            else:
+                i += 1
+
+    # Coda del titolo: edizione, piattaforma, regione ("... Deluxe Edition Steam Key EU")
+    while len(tokens) > 1 and (
+        tokens[-1] in STORE_TOKENS or tokens[-1] in EDITION_TOKENS or tokens[-1] == 'edition'
+    ):
+        tokens.pop()
+
+    if len(tokens) > 1 and tokens[0] == 'the':
+        tokens.pop(0)
+
+    return tokens
+
+
+def normalize_title(title: str) -> str:
+    """Slug canonico di un titolo (es: "baldurs-gate-3")"""
+    return '-'.join(tokenize(title))
+
+
+def normalize_platform(platform: str) -> str:
+    """Famiglia di piattaforma canonica (es: "Uplay" → "ubisoft")"""
+    key = (platform or 'steam').strip().lower()
+    return PLATFORM_FAMILIES.get(key, _NON_ALNUM.sub('', key) or 'steam')
+
+
+class CanonicalIndex:
+    """
+    Indice alias titolo store → ID canonico
+
+    Lookup in memoria O(1) sul percorso caldo; gli alias imparati e quelli
+    manuali sono persistiti su Redis e ricaricati all'avvio. I nuovi alias
+    imparati restano in memoria fino a flush() (una HSET a fine ingest).
+    """
+
+    def __init__(self, client, prefix: str):
+        """
+        Args:
+            client: Client Redis (o LocalStore)
+            prefix: Prefisso chiavi del bot
+        """
+        self.client = client
+        self.legacy_key = f"{prefix}alias:titles"
+        self.learned_key = f"{prefix}alias:titles:v{NORMALIZATION_VERSION}"
+        self.manual_key = f"{prefix}alias:manual"
+
+        self._titles: Dict[str, str] = {}
+        self._manual: Dict[str, str] = {}
+        # Alias imparati non ancora scritti su Redis
+        self._pending: Dict[str, str] = {}
+        self.reload()
+
+    def reload(self):
+        """Ricarica gli alias da Redis"""
+        try:
+            self._manual = dict(self.client.hgetall(self.manual_key))
+            self._titles = dict(self.client.hgetall(self.learned_key))
+            self._titles.update(self._pending)
+            # Alias calcolati con la normalizzazione precedente: solo una cache
+            self.client.delete(self.legacy_key)
+        except Exception as e:
+            logger.error(f"❌ Errore caricamento alias: {e}")
+
+    def flush(self) -> int:
+        """
+        Scrive su Redis gli alias imparati dall'ultimo flush (una sola HSET)
+
+        Returns:
+            Alias scritti
+        """
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        try:
+            self.client.hset(self.learned_key, mapping=pending)
+        except Exception as e:
+            # Riprova al prossimo flush
+            self._pending.update(pending)
+            logger.debug(f"Alias non persistiti ({len(pending)}): {e}")
+            return 0
+        return len(pending)
+
+    def resolve_title(self, title: str, source: str = '') -> str:
+        """
+        Risolve il titolo di uno store nel suo slug canonico
+
+        Args:
+            title: Titolo dello store
+            source: Fonte (solo per l'indice persistente)
+
+        Returns:
+            Slug canonico
+        """
+        field = f"{source}|{title}"
+        canonical = self._titles.get(field)
+        if canonical is not None:
+            return canonical
+
+        slug = normalize_title(title)
+        canonical = self._manual.get(slug, slug)
+        self._titles[field] = canonical
+        self._pending[field] = canonical
+        return canonical
+
+    def product_id(self, deal: Dict) -> str:
+        """
+        ID prodotto canonico di un'offerta (titolo + famiglia piattaforma)
+
+        Returns:
+            ID (es: "baldurs-gate-3-steam")
+        """
+        title = self.resolve_title(deal.get('title', ''), deal.get('source', ''))
+        return f"{title}-{normalize_platform(deal.get('platform', ''))}"
+
+    def lookup_product_id(self, title: str, platform: str = '') -> str:
+        """
+        ID prodotto di un titolo scritto da un utente (es. comando /alert)
+
+        Applica gli alias manuali ma non impara nulla: l'input degli utenti
+        non finisce nell'indice persistente degli store.
+        """
+        slug = normalize_title(title)
+        return f"{self._manual.get(slug, slug)}-{normalize_platform(platform)}"
+
+    def add_alias(self, title: str, canonical_title: str) -> str:
+        """
+        Registra un alias manuale (es: "GTA V" → "Grand Theft Auto V")
+
+        Returns:
+            Slug canonico assegnato
+        """
+        slug = normalize_title(title)
+        canonical = normalize_title(canonical_title)
+        self._manual[slug] = canonical
+        self.client.hset(self.manual_key, slug, canonical)
+
+        # Aggiorna gli alias imparati che puntavano al vecchio slug
+        stale = [field for field, value in self._titles.items() if value == slug]
+        for field in stale:
+            self._titles[field] = canonical
+            self._pending.pop(field, None)
+        if stale:
+            self.client.hset(self.learned_key, mapping={f: canonical for f in stale})
+
+        logger.info(f"🔗 Alias registrato: {slug} → {canonical}")
+        return canonical
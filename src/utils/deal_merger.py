@@ -0,0 +1,108 @@
+"""
+Deal Merger
+Unisce le offerte dello stesso prodotto provenienti da store diversi
+
+Un solo passaggio con dizionario per ID canonico: resta l'offerta più
+conveniente, le altre diventano prezzi alternativi da mostrare nel post.
+"""
+
+import logging
+from typing import Dict, List
+
+from utils.canonical import CanonicalIndex
+
+logger = logging.getLogger(__name__)
+
+# Venditori GAMIVO sotto questa valutazione vengono penalizzati
+MIN_SELLER_RATING = 98.5
+# Penalità per ogni punto di rating mancante
+SELLER_PENALTY_PER_POINT = 0.02
+# Regioni utilizzabili da un utente italiano senza restrizioni
+OK_REGIONS = {'global', 'europe', 'eu', 'italy', 'it', 'worldwide'}
+REGION_PENALTY = 0.15
+
+
+def effective_price(deal: Dict) -> float:
+    """
+    Prezzo "reale" per il confronto tra store
+
+    Per GAMIVO il prezzo viene maggiorato se il venditore ha un rating
+    basso o se la chiave è limitata a una regione non europea.
+
+    Args:
+        deal: Dati dell'offerta
+
+    Returns:
+        Prezzo pesato
+    """
+    price = float(deal.get('discounted_price', float('inf')))
+
+    if deal.get('source') == 'gamivo':
+        rating = deal.get('seller_rating')
+        if rating is not None and rating < MIN_SELLER_RATING:
+            price *= 1 + (MIN_SELLER_RATING - rating) * SELLER_PENALTY_PER_POINT
+
+        region = (deal.get('region') or 'Global').lower()
+        if region not in OK_REGIONS:
+            price *= 1 + REGION_PENALTY
+
+    return price
+
+
+def _alternative(deal: Dict) -> Dict:
+    """Riassunto di un'offerta alternativa per la visualizzazione"""
+    alternative = {
+        'source': deal.get('source'),
+        'price': deal.get('discounted_price'),
+        'url': deal.get('url'),
+    }
+    if deal.get('region'):
+        alternative['region'] = deal['region']
+    if deal.get('seller_rating') is not None:
+        alternative['seller_rating'] = deal['seller_rating']
+    return alternative
+
+
+class DealMerger:
+    """Raggruppa le offerte per prodotto canonico e tiene la migliore"""
+
+    def __init__(self, identity: CanonicalIndex):
+        self.identity = identity
+
+    def merge(self, deals: List[Dict]) -> List[Dict]:
+        """
+        Unisce le offerte duplicate tra store
+
+        Args:
+            deals: Offerte di tutte le fonti
+
+        Returns:
+            Una offerta per prodotto, con 'alternatives' ordinate per prezzo
+        """
+        best: Dict[str, Dict] = {}
+        best_price: Dict[str, float] = {}
+
+        for deal in deals:
+            product_id = self.identity.product_id(deal)
+            deal['product_id'] = product_id
+            price = effective_price(deal)
+
+            current = best.get(product_id)
+            if current is None:
+                deal['alternatives'] = []
+                best[product_id] = deal
+                best_price[product_id] = price
+            elif price < best_price[product_id]:
+                deal['alternatives'] = current.pop('alternatives') + [_alternative(current)]
+                best[product_id] = deal
+                best_price[product_id] = price
+            else:
+                current['alternatives'].append(_alternative(deal))
+
+        merged = list(best.values())
+        for deal in merged:
+            deal['alternatives'].sort(key=lambda alt: alt.get('price') or 0)
+
+        if len(merged) < len(deals):
+            logger.info(f"🔀 Merge cross-store: {len(deals)} → {len(merged)} offerte")
+        return merged
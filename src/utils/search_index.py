@@ -0,0 +1,227 @@
+"""
+Deal Search Index
+Indice in memoria delle offerte correnti per /search (prefissi + trigrammi)
+
+- Prefissi: "witch" trova "The Witcher 3" mentre l'utente scrive
+- Trigrammi: tollera errori di battitura ("cyberpnuk" → "Cyberpunk 2077")
+- Termini indicizzati: parole del titolo, slug canonico (alias inclusi) e
+  famiglia di piattaforma
+
+update() riceve il risultato di ogni scraping e modifica solo le offerte
+nuove, sparite o con titolo cambiato: le risposte arrivano dalla memoria
+senza scraping e senza letture da Redis.
+"""
+
+import re
+import unicodedata
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.canonical import ROMAN_NUMERALS, normalize_platform, normalize_title
+
+logger = logging.getLogger(__name__)
+
+# Prefissi indicizzati fino a questa lunghezza (oltre si verifica sul termine)
+MAX_PREFIX = 12
+# Somiglianza minima a trigrammi per una parola con errori
+MIN_SIMILARITY = 0.5
+
+_APOSTROPHES = re.compile(r"['’`´]")
+_WORDS = re.compile(r'[a-z0-9]+')
+
+
+def words(text: str) -> List[str]:
+    """Parole normalizzate (accenti, maiuscole, apostrofi, numeri romani)"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    text = _APOSTROPHES.sub('', text).replace('&', ' and ')
+    return [ROMAN_NUMERALS.get(w, w) for w in _WORDS.findall(text)]
+
+
+def trigrams(term: str) -> Set[str]:
+    """Trigrammi di una parola con padding ("  ab " stile pg_trgm)"""
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _default_key(deal: Dict) -> str:
+    return deal.get('product_id') or (
+        f"{normalize_title(deal.get('title', ''))}-{normalize_platform(deal.get('platform', ''))}"
+    )
+
+
+class DealSearchIndex:
+    """Indice prefissi/trigrammi aggiornato in modo incrementale"""
+
+    def __init__(self, key: Callable[[Dict], str] = None):
+        """
+        Args:
+            key: Funzione ID offerta (default: 'product_id' del merge)
+        """
+        self.key = key or _default_key
+        self.deals: Dict[str, Dict] = {}
+        self.version = 0
+
+        self._terms: Dict[str, Tuple[str, ...]] = {}
+        self._prefixes: Dict[str, Set[str]] = defaultdict(set)
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._ranked: Optional[List[Dict]] = None
+
+    def __len__(self) -> int:
+        return len(self.deals)
+
+    # ==========================================
+    # AGGIORNAMENTO
+    # ==========================================
+
+    def _deal_terms(self, deal_id: str, deal: Dict) -> Tuple[str, ...]:
+        terms = dict.fromkeys(words(deal.get('title', '')))
+        # Slug canonico (contiene anche gli alias risolti) e piattaforma
+        terms.update(dict.fromkeys(t for t in deal_id.split('-') if t))
+        terms[normalize_platform(deal.get('platform', ''))] = None
+        return tuple(terms)
+
+    def _add(self, deal_id: str, terms: Tuple[str, ...]):
+        self._terms[deal_id] = terms
+        for term in terms:
+            for size in range(1, min(len(term), MAX_PREFIX) + 1):
+                self._prefixes[term[:size]].add(deal_id)
+            for gram in trigrams(term):
+                self._trigrams[gram].add(deal_id)
+
+    def _remove(self, deal_id: str):
+        for term in self._terms.pop(deal_id, ()):
+            for size in range(1, min(len(term), MAX_PREFIX) + 1):
+                postings = self._prefixes.get(term[:size])
+                if postings is not None:
+                    postings.discard(deal_id)
+                    if not postings:
+                        del self._prefixes[term[:size]]
+            for gram in trigrams(term):
+                postings = self._trigrams.get(gram)
+                if postings is not None:
+                    postings.discard(deal_id)
+                    if not postings:
+                        del self._trigrams[gram]
+
+    def update(self, deals: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Allinea l'indice all'ultimo scraping
+
+        Args:
+            deals: Tutte le offerte correnti (unite e valutate)
+
+        Returns:
+            Conteggi {'added', 'removed', 'changed'}
+        """
+        fresh = {}
+        for deal in deals:
+            fresh[self.key(deal)] = deal
+
+        stats = {'added': 0, 'removed': 0, 'changed': 0}
+        for deal_id in [d for d in self.deals if d not in fresh]:
+            self._remove(deal_id)
+            del self.deals[deal_id]
+            stats['removed'] += 1
+
+        for deal_id, deal in fresh.items():
+            terms = self._deal_terms(deal_id, deal)
+            if deal_id not in self.deals:
+                self._add(deal_id, terms)
+                stats['added'] += 1
+            elif terms != self._terms[deal_id]:
+                self._remove(deal_id)
+                self._add(deal_id, terms)
+                stats['changed'] += 1
+            # Prezzo/score aggiornati anche se i termini non cambiano
+            self.deals[deal_id] = deal
+
+        self._ranked = None
+        self.version += 1
+        logger.info(f"🔎 Indice ricerca: {len(self.deals)} offerte "
+                    f"(+{stats['added']} -{stats['removed']} ~{stats['changed']})")
+        return stats
+
+    # ==========================================
+    # RICERCA
+    # ==========================================
+
+    def _match_term(self, term: str) -> Dict[str, float]:
+        """Punteggio per offerta di una parola della query"""
+        if len(term) <= MAX_PREFIX:
+            exact = self._prefixes.get(term, ())
+        else:
+            exact = [d for d in self._prefixes.get(term[:MAX_PREFIX], ())
+                     if any(t.startswith(term) for t in self._terms[d])]
+        scores = {deal_id: 1.0 for deal_id in exact}
+
+        # Parole corte: solo prefisso (i trigrammi darebbero troppo rumore)
+        if len(term) < 4:
+            return scores
+
+        grams = trigrams(term)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for deal_id in self._trigrams.get(gram, ()):
+                shared[deal_id] += 1
+        for deal_id, count in shared.items():
+            similarity = count / len(grams)
+            if similarity >= MIN_SIMILARITY and deal_id not in scores:
+                scores[deal_id] = similarity * 0.8
+        return scores
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Offerte che corrispondono alla query, le più pertinenti prima
+
+        Ogni parola deve corrispondere (per prefisso o quasi uguale);
+        a pari pertinenza vince il BrislyScore.
+
+        Args:
+            query: Testo dell'utente
+            limit: Risultati massimi
+
+        Returns:
+            Offerte ordinate
+        """
+        terms = list(dict.fromkeys(words(query)))
+        if not terms:
+            return []
+
+        total: Dict[str, float] = {}
+        for i, term in enumerate(terms):
+            scores = self._match_term(term)
+            if i == 0:
+                total = scores
+            else:
+                total = {d: s + scores[d] for d, s in total.items() if d in scores}
+            if not total:
+                return []
+
+        ranked = sorted(
+            total,
+            key=lambda d: (total[d], self.deals[d].get('brislyscore', 0)),
+            reverse=True
+        )
+        return [self.deals[d] for d in ranked[:limit]]
+
+    def top(self, limit: int = 10, where: Callable[[Dict], bool] = None) -> List[Dict]:
+        """
+        Migliori offerte correnti per BrislyScore
+
+        Args:
+            limit: Risultati massimi
+            where: Filtro opzionale (es. piattaforma)
+        """
+        if self._ranked is None:
+            self._ranked = sorted(self.deals.values(), key=lambda d: d.get('brislyscore', 0), reverse=True)
+        if where is None:
+            return self._ranked[:limit]
+        result = []
+        for deal in self._ranked:
+            if where(deal):
+                result.append(deal)
+                if len(result) == limit:
+                    break
+        return result